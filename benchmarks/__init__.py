@@ -0,0 +1,15 @@
+"""Benchmarks for the autograder hot paths.
+
+Run from the repository root::
+
+    python -m benchmarks --output bench.json
+    python -m benchmarks --baseline bench.json
+
+The first command measures end-to-end ``test_autograder`` latency for the
+``examples/`` autograders and for synthetic larger ones, ``build_zip``
+throughput, and the per-call cost of ``getScriptOutput``,
+``count_regex_matches``, ``run_flake8`` and ``check_coverage``.  The second
+compares a new run against a saved baseline and exits with a non-zero
+status if any benchmark got slower by more than the tolerance.
+
+"""
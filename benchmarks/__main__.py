@@ -0,0 +1,200 @@
+"""Command line entry point for the benchmark suite.
+
+usage: python -m benchmarks [-h] [--output OUTPUT] [--baseline BASELINE]
+                            [--tolerance TOLERANCE] [--quick] [--only ONLY]
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+from . import synthetic
+
+
+def measure(func, repeat=5, number=1):
+    """Time func, returning per-call statistics in seconds.
+
+    Args:
+        func: Callable with no arguments.
+        repeat (int): Number of timing samples.
+        number (int): Calls per sample.
+
+    """
+    func()  # Warm up caches and imports.
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) / number)
+    return {
+        "median": statistics.median(samples),
+        "min": min(samples),
+        "max": max(samples),
+        "samples": repeat,
+        "calls_per_sample": number,
+    }
+
+
+def prepare_grading_base(workspace, build_utils):
+    """Lay out an unpacked autograder the way Gradescope does."""
+    base = Path(workspace) / 'grading'
+    source = base / 'source'
+    autograder = synthetic.EXAMPLES / 'hello_world_w_coverage'
+    zip_path = Path(workspace) / 'coverage.zip'
+    build_utils.build_zip(str(autograder), str(zip_path))
+    with zipfile.ZipFile(zip_path) as zip_obj:
+        zip_obj.extractall(source)
+    shutil.copytree(autograder / 'sample', base / 'submission')
+    synthetic.big_source_file(base / 'submission' / 'big_student_file.py')
+    os.makedirs(base / 'results')
+    return base
+
+
+def autograder_folders(workspace, quick):
+    folders = {path.name: path for path in sorted(synthetic.EXAMPLES.iterdir())
+               if (path / 'config.ini').exists()}
+    if not quick:
+        for name, path in synthetic.create_all(workspace).items():
+            folders[name] = path
+    return folders
+
+
+def run_benchmarks(workspace, quick=False, only=None):
+    """Run every benchmark and return a name -> statistics dictionary."""
+    base = prepare_base_env(workspace)
+    from jmu_gradescope_utils import build_utils, utils, run_utils
+    from jmu_gradescope_utils.jmu_test_case import _JmuTestCase
+    from jmu_gradescope_utils.coverage_utils import check_coverage
+
+    prepare_grading_base(workspace, build_utils)
+    run_utils.setup_autograder()
+    # run_tests.py runs from the source folder, which puts it on sys.path.
+    os.chdir(base / 'source')
+    sys.path.insert(0, str(base / 'source'))
+
+    repeat = 3 if quick else 5
+    benchmarks = {}
+    test_case = _JmuTestCase()
+    benchmarks['getScriptOutput'] = (
+        lambda: test_case.getScriptOutput('hello_world.py', ''), repeat, 3)
+    benchmarks['count_regex_matches'] = (
+        lambda: utils.count_regex_matches(r'\s*(for|while).*:',
+                                          'big_student_file.py'), repeat, 3)
+    benchmarks['run_flake8'] = (
+        lambda: utils.run_flake8('hello_world.py'), repeat, 1)
+    benchmarks['check_coverage'] = (
+        lambda: check_coverage(['hello_world.py'], print_feedback=False),
+        repeat, 1)
+
+    for name, folder in autograder_folders(workspace, quick).items():
+        zip_path = os.path.join(workspace, f'{name}.zip')
+        benchmarks[f'build_zip:{name}'] = (
+            lambda folder=folder, zip_path=zip_path:
+            build_utils.build_zip(str(folder), zip_path), repeat, 1)
+        benchmarks[f'test_autograder:{name}'] = (
+            lambda folder=folder:
+            build_utils.test_autograder(str(folder), str(folder / 'sample')),
+            1 if quick else 3, 1)
+
+    results = {}
+    for name, (func, bench_repeat, number) in benchmarks.items():
+        if only is not None and only not in name:
+            continue
+        with contextlib.redirect_stdout(io.StringIO()):
+            results[name] = measure(func, bench_repeat, number)
+        print(f"{name:<40} {results[name]['median'] * 1000:>10.2f} ms",
+              file=sys.stderr)
+    return results
+
+
+def prepare_base_env(workspace):
+    # utils reads JMU_GRADESCOPE_BASE when it is first imported, so this
+    # has to happen before anything from jmu_gradescope_utils is imported.
+    base = Path(workspace) / 'grading'
+    os.environ['JMU_GRADESCOPE_BASE'] = str(base)
+    return base
+
+
+def compare(results, baseline, tolerance):
+    """Compare median timings against a baseline.
+
+    Returns:
+        list: Names of benchmarks that are slower than the baseline by more
+        than the tolerance (a fraction, e.g. 0.2 for 20%).
+
+    """
+    regressions = []
+    print(f"{'Benchmark':<40} {'Baseline ms':>12} {'Current ms':>12} {'Change':>8}")
+    for name, stats in results.items():
+        if name not in baseline:
+            print(f"{name:<40} {'-':>12} {stats['median'] * 1000:>12.2f}")
+            continue
+        old = baseline[name]['median']
+        new = stats['median']
+        change = (new - old) / old if old > 0 else 0.0
+        flag = ''
+        if change > tolerance:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f"{name:<40} {old * 1000:>12.2f} {new * 1000:>12.2f} "
+              f"{change:>+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the autograder hot paths.")
+    parser.add_argument('--output', '-o',
+                        help="Write the results to this JSON file.")
+    parser.add_argument('--baseline', '-b',
+                        help="Compare against results saved with --output.")
+    parser.add_argument('--tolerance', '-t', type=float, default=0.2,
+                        help="Allowed slowdown before a benchmark counts as a "
+                             "regression (default 0.2 = 20%%).")
+    parser.add_argument('--quick', action='store_true',
+                        help="Fewer repetitions and no synthetic autograders.")
+    parser.add_argument('--only',
+                        help="Only run benchmarks whose name contains this.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.CRITICAL)
+    workspace = tempfile.mkdtemp(prefix='jmu_bench_')
+    cwd = os.getcwd()
+    try:
+        results = run_benchmarks(workspace, quick=args.quick, only=args.only)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workspace, ignore_errors=True)
+
+    document = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "benchmarks": results,
+    }
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(document, f, indent=4)
+
+    if args.baseline is not None:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)["benchmarks"]
+        regressions = compare(results, baseline, args.tolerance)
+        if len(regressions) > 0:
+            print(f"{len(regressions)} benchmark(s) regressed.")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Check that importing the library stays within an import-time budget.
+
+usage: python -m benchmarks.import_time [--repeat N]
+
+Each statement in ``BUDGETS`` is timed in a fresh interpreter started with
+``python -X importtime`` and compared to its budget.  The median over
+several runs is used so that one slow start does not cause a failure.  For
+statements over budget the slowest imports reported by ``-X importtime``
+are listed.  Exits with a non-zero status if any statement is over budget.
+
+The statement is timed directly rather than read from the ``-X importtime``
+output because modules loaded lazily through ``importlib.import_module``
+do not appear there.
+"""
+import argparse
+import re
+import statistics
+import subprocess
+import sys
+
+# Statement -> budget in seconds
+BUDGETS = {
+    'import jmu_gradescope_utils': 0.02,
+    'from jmu_gradescope_utils import JmuTestCase, required': 0.1,
+    'import jmu_gradescope_utils.build_utils': 0.15,
+}
+
+TIMER = "import time as _t; _s = _t.perf_counter(); {}; print(_t.perf_counter() - _s)"
+
+LINE_RE = re.compile(r'import time:\s+(\d+) \|\s+\d+ \|(\s*\S+)\s*$')
+
+
+def import_time(statement):
+    """Time statement in a fresh interpreter.
+
+    Returns:
+        tuple: (seconds, list of (self seconds, module) from -X importtime)
+
+    """
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c',
+                           TIMER.format(statement)],
+                          stderr=subprocess.PIPE, stdout=subprocess.PIPE,
+                          text=True, check=True)
+    modules = []
+    for line in proc.stderr.splitlines():
+        match = LINE_RE.match(line)
+        if match:
+            modules.append((int(match.group(1)) / 1e6, match.group(2)))
+    return float(proc.stdout), modules
+
+
+def check_budgets(repeat=5):
+    """Measure every statement in BUDGETS.
+
+    Returns:
+        dict: statement -> (median seconds, budget seconds, modules from the
+        last run)
+
+    """
+    results = {}
+    for statement, budget in BUDGETS.items():
+        times = []
+        for _ in range(repeat):
+            seconds, modules = import_time(statement)
+            times.append(seconds)
+        results[statement] = (statistics.median(times), budget, modules)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check import-time budgets.")
+    parser.add_argument('--repeat', '-r', type=int, default=5,
+                        help="Number of fresh interpreters per statement.")
+    args = parser.parse_args()
+
+    over_budget = 0
+    for statement, (seconds, budget, modules) in check_budgets(args.repeat).items():
+        status = 'ok'
+        if seconds > budget:
+            status = 'OVER BUDGET'
+            over_budget += 1
+        print(f"{seconds * 1000:8.1f} ms / {budget * 1000:6.1f} ms  "
+              f"{status:<12} {statement}")
+        if seconds > budget:
+            for self_time, module in sorted(modules, reverse=True)[:5]:
+                print(f"{'':>12}{self_time * 1000:8.1f} ms  {module.strip()}")
+    sys.exit(1 if over_budget > 0 else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Generators for synthetic autograder folders that are larger than the examples."""
+import os
+import shutil
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+EXAMPLES = ROOT / 'examples'
+
+ECHO_SCRIPT = '''"""Echo each line of input in upper case."""
+
+
+def main():
+    """Read lines until EOF."""
+    while True:
+        try:
+            line = input()
+        except EOFError:
+            break
+        print(line.upper())
+
+
+if __name__ == "__main__":
+    main()
+'''
+
+TEST_HEADER = '''from gradescope_utils.autograder_utils.decorators import weight
+from jmu_gradescope_utils import JmuTestCase
+
+
+class {name}(JmuTestCase):
+'''
+
+IO_TEST = '''
+    @weight(1)
+    def test_case_{index:04d}(self):
+        """Echo case {index}."""
+        self.assertOutputEqual('echo.py', {string_in!r}, {expected!r})
+'''
+
+TRIVIAL_TEST = '''
+    @weight(1)
+    def test_trivial_{index:04d}(self):
+        """Trivial test {index}."""
+        self.assertEqual({index}, {index})
+'''
+
+
+def _write_common(folder, code_files):
+    folder.mkdir(parents=True)
+    (folder / 'sample').mkdir()
+    (folder / 'scaffolding').mkdir()
+    (folder / 'tests').mkdir()
+    shutil.copytree(EXAMPLES / 'hello_world' / 'configurations',
+                    folder / 'configurations')
+    with open(folder / 'config.ini', 'w') as f:
+        f.write(f"[SUBMIT]\ncode: {', '.join(code_files)}\ntests:\n")
+    with open(folder / 'sample' / 'echo.py', 'w') as f:
+        f.write(ECHO_SCRIPT)
+
+
+def many_io_cases(folder, cases=100):
+    """An autograder with one script and many stdin/stdout test methods."""
+    folder = Path(folder)
+    _write_common(folder, ['echo.py'])
+    with open(folder / 'tests' / 'test_echo.py', 'w') as f:
+        f.write(TEST_HEADER.format(name='TestEcho'))
+        for index in range(cases):
+            string_in = "\n".join(f"line {index} {j}" for j in range(10)) + "\n"
+            f.write(IO_TEST.format(index=index, string_in=string_in,
+                                   expected=string_in.upper()))
+    return folder
+
+
+def many_files(folder, modules=20, tests_per_module=10, scaffolding_files=200):
+    """An autograder with many test modules and many small scaffolding files."""
+    folder = Path(folder)
+    _write_common(folder, ['echo.py'])
+    for module in range(modules):
+        path = folder / 'tests' / f'test_module_{module:03d}.py'
+        with open(path, 'w') as f:
+            f.write(TEST_HEADER.format(name=f'TestModule{module:03d}'))
+            for index in range(tests_per_module):
+                f.write(TRIVIAL_TEST.format(index=index))
+    for index in range(scaffolding_files):
+        with open(folder / 'scaffolding' / f'data_{index:04d}.txt', 'w') as f:
+            f.write(f"data file {index}\n" * 20)
+    return folder
+
+
+def big_scaffolding(folder, megabytes=20):
+    """An autograder with a few large scaffolding data files."""
+    folder = Path(folder)
+    _write_common(folder, ['echo.py'])
+    with open(folder / 'tests' / 'test_echo.py', 'w') as f:
+        f.write(TEST_HEADER.format(name='TestEcho'))
+        f.write(IO_TEST.format(index=0, string_in="a\n", expected="A\n"))
+    line = "0123456789" * 10 + "\n"
+    lines_per_mb = (1 << 20) // len(line)
+    for index in range(4):
+        with open(folder / 'scaffolding' / f'big_{index}.txt', 'w') as f:
+            for _ in range(megabytes * lines_per_mb // 4):
+                f.write(line)
+    return folder
+
+
+def big_source_file(path, functions=500):
+    """Write a long, loop heavy Python file for the regex benchmarks."""
+    with open(path, 'w') as f:
+        f.write('"""Synthetic student file."""\n')
+        for index in range(functions):
+            f.write(f'\n\ndef func_{index}(values):\n'
+                    f'    """Sum values."""\n'
+                    f'    total = 0  # running total\n'
+                    f'    for value in values:\n'
+                    f'        if value > {index}:\n'
+                    f'            total += value\n'
+                    f'    while total > 100:\n'
+                    f'        total -= 100\n'
+                    f'    return total\n')
+    return path
+
+
+SYNTHETIC = {
+    'many_io_cases': many_io_cases,
+    'many_files': many_files,
+    'big_scaffolding': big_scaffolding,
+}
+
+
+def create_all(workspace):
+    """Create every synthetic autograder below workspace.
+
+    Returns:
+        dict: Mapping from autograder name to folder.
+
+    """
+    folders = {}
+    for name, generate in SYNTHETIC.items():
+        folders[name] = generate(os.path.join(workspace, name))
+    return folders
@@ -33,5 +33,6 @@ class TestHelloWorld(JmuTestCase):
     @weight(4)
     def test_functionality(self):
         """Test hello_func."""
-        import hello_world
-        self.assertEquals(hello_world.hello_func(), "Hello World")
+        value, output = self.callWithIO('hello_world', 'hello_func', timeout=2)
+        self.assertEqual(value, "Hello World")
+        self.assertEqual(output, "", "hello_func should return the greeting, not print it.")
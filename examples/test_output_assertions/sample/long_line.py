@@ -0,0 +1 @@
+print("ab" * 35000)
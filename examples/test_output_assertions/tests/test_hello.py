@@ -71,3 +71,9 @@ class TestHelloWorld(JmuTestCase):
                 'assertNotIn must be broken, "orld" should have been considered to be in "Hello World!" and so asserting not in should have failed, but this error means it didnt'
             )
         print("Correct output not containing:\n" + expected_not_in)
+
+    @weight(1)
+    def test_output_long_line(self):
+        """long_line.py output equal to a file with a 70,000 character line."""
+        self.assertOutputEqual("long_line.py", "no_input.txt",
+                               "long_line_expected.txt", from_files=True)
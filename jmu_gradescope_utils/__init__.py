@@ -1,3 +1,57 @@
-from jmu_gradescope_utils.jmu_test_case import *
-from jmu_gradescope_utils.utils import *
-from jmu_gradescope_utils.coverage_utils import *
+"""Python Gradescope utilities.
+
+The public names below are loaded lazily: importing the package is cheap,
+and a submodule (and whatever it depends on, e.g. ``coverage``) is only
+imported the first time one of its names is used.
+
+"""
+import importlib
+
+_EXPORTS = {
+    'JmuTestCase': 'jmu_test_case',
+    'OrderAllTestsMeta': 'jmu_test_case',
+    'required': 'jmu_test_case',
+    'test_compare': 'jmu_test_case',
+    'GRADESCOPE_BASE': 'utils',
+    'SUBMISSION_BASE': 'utils',
+    'SOURCE_BASE': 'utils',
+    'full_submission_path': 'utils',
+    'full_source_path': 'utils',
+    'count_regex_matches': 'utils',
+    'run_flake8': 'utils',
+    'run_flake8_docstring': 'utils',
+    'replace_variables': 'utils',
+    'check_submitted_files': 'utils',
+    'suppress_IO': 'utils',
+    'IOContext': 'utils',
+    'get_gradescope_base': 'coverage_utils',
+    'run_student_tests': 'coverage_utils',
+    'check_coverage': 'coverage_utils',
+    'guarded_import': 'import_utils',
+}
+
+_SUBMODULES = {
+    'analytics_utils', 'batch_utils', 'build_utils', 'call_utils',
+    'compare_utils', 'compile_utils', 'complexity_utils', 'convert_utils',
+    'course_utils', 'coverage_utils', 'diff_utils', 'import_utils',
+    'jmu_test_case', 'memory_utils', 'perf_utils', 'profile_utils',
+    'reference_utils', 'remove_comments', 'results_utils', 'run_utils',
+    'shard_utils', 'timing_utils', 'utils', 'watch_utils',
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module('.' + name, __name__)
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module('.' + _EXPORTS[name], __name__)
+    value = getattr(module, name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS) | _SUBMODULES)
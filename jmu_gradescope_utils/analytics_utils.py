@@ -0,0 +1,369 @@
+"""Statistics over many ``results.json`` files.
+
+A :class:`ResultsTable` reads results files one at a time and keeps only
+the columns needed for statistics, each in a compact ``array.array``: one
+row per test result, with test names stored once and referred to by
+index.  A semester of submissions (tens of thousands of files) fits in a
+few megabytes and is summarized in seconds.
+
+:func:`summarize` computes, for every test, the pass rate, the average
+score and percentiles of the score and running time, and how often the
+test timed out or was skipped for lack of time.  :func:`score_distribution`
+describes the total scores.  The rows and the summaries can be written to
+CSV files for further analysis in a spreadsheet.
+
+"""
+import array
+import csv
+import json
+import math
+from pathlib import Path
+
+# Percentiles reported for scores and running times.
+PERCENTILES = (50, 90, 99)
+
+# Codes stored in the status column.
+STATUSES = ('passed', 'failed', 'other')
+
+_NAN = float('nan')
+
+
+def percentile(sorted_values, q):
+    """Return the q-th percentile (0 to 100) of a sorted sequence.
+
+    Values between ranks are interpolated linearly.  Returns NaN for an
+    empty sequence.
+    """
+    if len(sorted_values) == 0:
+        return _NAN
+    rank = (len(sorted_values) - 1) * q / 100
+    low = math.floor(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+def find_results_files(paths):
+    """Yield the results files among paths, searching folders recursively.
+
+    Folders are searched for ``results.json`` files (and the
+    ``results.json.txt`` files saved by ``test_autograder``).
+    """
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            for found in sorted(path.rglob('results.json*')):
+                if found.name in ('results.json', 'results.json.txt'):
+                    yield found
+        else:
+            yield path
+
+
+def _check_shape(results):
+    """Raise ValueError unless results is shaped like a results.json file."""
+    if not isinstance(results, dict):
+        raise ValueError("not a results document (expected a JSON object)")
+    tests = results.get("tests", [])
+    if not isinstance(tests, list):
+        raise ValueError("'tests' is not a list")
+    for number, test in enumerate(tests, 1):
+        if not isinstance(test, dict):
+            raise ValueError(f"test {number} is not a JSON object")
+        extra_data = test.get("extra_data") or {}
+        if not isinstance(extra_data, dict):
+            raise ValueError(f"extra_data of test {number} is not a JSON object")
+        if not isinstance(extra_data.get("performance") or {}, dict):
+            raise ValueError(f"performance data of test {number} is not a JSON object")
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return _NAN
+
+
+class ResultsTable:
+    """Test results from many runs, stored column by column.
+
+    Attributes:
+        sources (list): The file each run was read from.
+        total_scores (array.array): The total score of each run.
+        test_ids (list): Key of each distinct test: its ``test_id`` if the
+            results recorded one, otherwise its name.
+        test_names (list): Display name of each distinct test.
+        run (array.array): Per row, the index of the run in ``sources``.
+        test (array.array): Per row, the index of the test in ``test_ids``.
+        score (array.array): Per row, the score (NaN if not scored).
+        max_score (array.array): Per row, the maximum score (NaN if none).
+        status (array.array): Per row, an index into ``STATUSES``.
+        wall_time (array.array): Per row, the running time in seconds from
+            the performance data (NaN if not recorded).
+        timed_out (array.array): Per row, 1 if the test ran out of time.
+        skipped (array.array): Per row, 1 if the test was skipped because
+            the autograder ran out of time.
+        problems (list): (path, reason) for each file that couldn't be read.
+
+    """
+
+    def __init__(self):
+        self.sources = []
+        self.total_scores = array.array('d')
+        self.test_ids = []
+        self.test_names = []
+        self._test_index = {}
+        self.run = array.array('I')
+        self.test = array.array('I')
+        self.score = array.array('d')
+        self.max_score = array.array('d')
+        self.status = array.array('B')
+        self.wall_time = array.array('d')
+        self.timed_out = array.array('B')
+        self.skipped = array.array('B')
+        self.problems = []
+
+    def __len__(self):
+        return len(self.run)
+
+    def _test_number(self, key, name):
+        number = self._test_index.get(key)
+        if number is None:
+            number = len(self.test_ids)
+            self._test_index[key] = number
+            self.test_ids.append(key)
+            self.test_names.append(name)
+        return number
+
+    def add(self, results, source=None):
+        """Add the tests of one results document (a parsed results.json).
+
+        Raises:
+            ValueError: If results is not shaped like a results document.
+                Nothing is added in that case.
+
+        """
+        _check_shape(results)
+        run = len(self.sources)
+        self.sources.append(str(source) if source is not None else str(run))
+        tests = results.get("tests", [])
+        total = results.get("score")
+        if total is None:
+            total = sum(score for score in (_number(test.get("score")) for test in tests)
+                        if not math.isnan(score))
+        self.total_scores.append(_number(total))
+        for test in tests:
+            extra_data = test.get("extra_data") or {}
+            name = test.get("name", "?")
+            self.run.append(run)
+            self.test.append(self._test_number(extra_data.get("test_id", name), name))
+            self.score.append(_number(test.get("score")))
+            self.max_score.append(_number(test.get("max_score")))
+            status = test.get("status")
+            self.status.append(STATUSES.index(status) if status in STATUSES[:2] else 2)
+            performance = extra_data.get("performance") or {}
+            self.wall_time.append(_number(performance.get("wall_time")))
+            self.timed_out.append(1 if extra_data.get("timed_out") else 0)
+            self.skipped.append(1 if extra_data.get("skipped") else 0)
+
+    def add_file(self, path):
+        """Read one results file.  Unreadable files are recorded in
+        ``problems`` and otherwise skipped."""
+        try:
+            with open(path, 'r') as f:
+                results = json.load(f)
+            self.add(results, path)
+        except (OSError, ValueError) as e:
+            self.problems.append((str(path), str(e)))
+
+    @classmethod
+    def from_files(cls, paths):
+        """Build a table from results files and folders containing them."""
+        table = cls()
+        for path in find_results_files(paths):
+            table.add_file(path)
+        return table
+
+    def rows_by_test(self):
+        """Return, for each test, an array of the indices of its rows."""
+        counts = [0] * len(self.test_ids)
+        for test in self.test:
+            counts[test] += 1
+        groups = [array.array('I', [0]) * count for count in counts]
+        filled = [0] * len(self.test_ids)
+        for row, test in enumerate(self.test):
+            groups[test][filled[test]] = row
+            filled[test] += 1
+        return groups
+
+    def write_csv(self, path):
+        """Write one CSV line per row of the table."""
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["source", "test_id", "name", "score", "max_score",
+                             "status", "wall_time", "timed_out", "skipped"])
+            for row in range(len(self)):
+                test = self.test[row]
+                writer.writerow([self.sources[self.run[row]], self.test_ids[test],
+                                 self.test_names[test], _cell(self.score[row]),
+                                 _cell(self.max_score[row]),
+                                 STATUSES[self.status[row]],
+                                 _cell(self.wall_time[row]), self.timed_out[row],
+                                 self.skipped[row]])
+
+
+def _cell(value):
+    """Format a number for CSV, leaving missing values empty."""
+    if isinstance(value, float) and math.isnan(value):
+        return ""
+    return value
+
+
+def _present(column, rows):
+    return sorted(value for value in (column[row] for row in rows)
+                  if not math.isnan(value))
+
+
+class TestSummary:
+    """Statistics for one test over all runs.
+
+    Percentile attributes are dictionaries from each of ``PERCENTILES`` to
+    a value (NaN if the test has no such data).
+    """
+
+    __slots__ = ('test_id', 'name', 'runs', 'passed', 'pass_rate',
+                 'mean_score', 'max_score', 'score_percentiles',
+                 'mean_time', 'time_percentiles', 'max_time', 'timeouts',
+                 'timeout_rate', 'skipped')
+
+    def as_row(self):
+        """Return the summary as a flat dictionary, e.g. for CSV."""
+        row = {}
+        for name in self.__slots__:
+            value = getattr(self, name)
+            if isinstance(value, dict):
+                prefix = name.replace('_percentiles', '')
+                for q, result in value.items():
+                    row[f"{prefix}_p{q}"] = _cell(result)
+            else:
+                row[name] = _cell(value)
+        return row
+
+
+def summarize(table, percentiles=PERCENTILES):
+    """Compute a TestSummary for every test in table, in order of first
+    appearance."""
+    summaries = []
+    for test, rows in enumerate(table.rows_by_test()):
+        summary = TestSummary()
+        summary.test_id = table.test_ids[test]
+        summary.name = table.test_names[test]
+        summary.runs = len(rows)
+        summary.passed = sum(1 for row in rows if table.status[row] == 0)
+        summary.pass_rate = summary.passed / len(rows) if len(rows) else _NAN
+        scores = _present(table.score, rows)
+        summary.mean_score = sum(scores) / len(scores) if scores else _NAN
+        max_scores = _present(table.max_score, rows)
+        summary.max_score = max_scores[-1] if max_scores else _NAN
+        summary.score_percentiles = {q: percentile(scores, q) for q in percentiles}
+        times = _present(table.wall_time, rows)
+        summary.mean_time = sum(times) / len(times) if times else _NAN
+        summary.time_percentiles = {q: percentile(times, q) for q in percentiles}
+        summary.max_time = times[-1] if times else _NAN
+        summary.timeouts = sum(table.timed_out[row] for row in rows)
+        summary.timeout_rate = summary.timeouts / len(rows) if len(rows) else _NAN
+        summary.skipped = sum(table.skipped[row] for row in rows)
+        summaries.append(summary)
+    return summaries
+
+
+def score_distribution(table, bins=10, percentiles=PERCENTILES):
+    """Describe the distribution of total scores.
+
+    Returns:
+        dict: ``count``, ``mean``, ``min``, ``max``, one ``p<q>`` entry per
+        percentile, and ``histogram``: a list of (low, high, count) for
+        ``bins`` equal-width bins between the lowest and highest score.
+
+    """
+    scores = sorted(score for score in table.total_scores if not math.isnan(score))
+    result = {"count": len(scores)}
+    if len(scores) == 0:
+        result["histogram"] = []
+        return result
+    low, high = scores[0], scores[-1]
+    result.update({"mean": sum(scores) / len(scores), "min": low, "max": high})
+    for q in percentiles:
+        result[f"p{q}"] = percentile(scores, q)
+    width = (high - low) / bins or 1.0
+    counts = [0] * bins
+    for score in scores:
+        counts[min(bins - 1, int((score - low) / width))] += 1
+    result["histogram"] = [(low + i * width, low + (i + 1) * width, count)
+                           for i, count in enumerate(counts)]
+    return result
+
+
+def write_summary_csv(summaries, path):
+    """Write one CSV line per TestSummary."""
+    rows = [summary.as_row() for summary in summaries]
+    with open(path, 'w', newline='') as f:
+        if len(rows) == 0:
+            return
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def _seconds(value):
+    return "-" if math.isnan(value) else f"{value:.3f}"
+
+
+def format_report(table, summaries, limit=10):
+    """Format the main statistics as text.
+
+    Args:
+        table (ResultsTable): The results.
+        summaries (list): ``summarize(table)``.
+        limit (int): Number of tests in the slowest and most often timed
+            out lists.
+
+    Returns:
+        str: The report.
+
+    """
+    distribution = score_distribution(table)
+    lines = [f"{len(table.sources)} runs, {len(table)} test results, "
+             f"{len(summaries)} tests"]
+    if distribution["count"] > 0:
+        lines.append("Total score: mean {mean:.2f}, min {min:g}, median "
+                     "{p50:g}, max {max:g}".format(**distribution))
+    lines.append("")
+    lines.append(f"{'Test':<40} {'Runs':>6} {'Passed':>7} {'Mean':>7} "
+                 f"{'Median s':>9} {'p90 s':>8} {'Timeouts':>8}")
+    for summary in summaries:
+        mean = "-" if math.isnan(summary.mean_score) else f"{summary.mean_score:.2f}"
+        lines.append(f"{summary.name[:40]:<40} {summary.runs:>6} "
+                     f"{summary.pass_rate:>7.0%} {mean:>7} "
+                     f"{_seconds(summary.time_percentiles.get(50, _NAN)):>9} "
+                     f"{_seconds(summary.time_percentiles.get(90, _NAN)):>8} "
+                     f"{summary.timeouts:>8}")
+
+    timed = [s for s in summaries if not math.isnan(s.time_percentiles.get(90, _NAN))]
+    if timed:
+        lines.append("")
+        lines.append("Slowest tests (90th percentile):")
+        for summary in sorted(timed, key=lambda s: s.time_percentiles[90],
+                              reverse=True)[:limit]:
+            lines.append(f"  {_seconds(summary.time_percentiles[90]):>8}  {summary.name}")
+    timeouts = [s for s in summaries if s.timeouts > 0]
+    if timeouts:
+        lines.append("")
+        lines.append("Tests that timed out most often:")
+        for summary in sorted(timeouts, key=lambda s: s.timeout_rate,
+                              reverse=True)[:limit]:
+            lines.append(f"  {summary.timeout_rate:>8.1%}  {summary.name}")
+    if table.problems:
+        lines.append("")
+        lines.append(f"{len(table.problems)} files could not be read:")
+        for path, problem in table.problems[:limit]:
+            lines.append(f"  {path}: {problem}")
+    return "\n".join(lines)
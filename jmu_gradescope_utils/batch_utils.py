@@ -0,0 +1,223 @@
+"""Run a script on many inputs without starting a process for each one.
+
+A ``ScriptWorker`` starts one Python process for a script and keeps it
+running.  Each input sent to the worker is run by executing the script's
+(once compiled) code in a fresh ``__main__`` namespace with ``sys.stdin``,
+``sys.stdout`` and ``sys.stderr`` replaced by in-memory files, so running
+the script again costs little more than the work the script itself does.
+Modules from the source folder that the script imports are removed again
+after each run, so module level state does not carry over from one input to
+the next.
+
+Inputs are sent in batches, one JSON line per batch, and the results come
+back the same way.  The worker talks to its parent over copies of its
+original stdin and stdout; the real file descriptors 0 and 1 are pointed at
+``os.devnull`` so that a script writing to them directly can't disturb the
+exchange.
+
+"""
+import builtins
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import traceback
+
+from . import perf_utils
+from . import timing_utils
+from . import utils
+
+# Inputs sent to a worker at once.
+BATCH_SIZE = 25
+
+# Most rounds of input shrinking after a difference is found.
+SHRINK_ROUNDS = 50
+
+
+class ScriptWorker:
+    """A long-lived process that runs one script on many inputs.
+
+    Args:
+        filename (str): The script, in the source folder.
+        args (str): Command line arguments for every run.
+
+    """
+
+    def __init__(self, filename, args=""):
+        self.filename = filename
+        # Not a pipe: nothing reads it while the worker runs.
+        self.stderr = tempfile.TemporaryFile()
+        self.proc = subprocess.Popen(
+            [sys.executable, '-m', 'jmu_gradescope_utils.batch_utils',
+             filename] + args.split(),
+            cwd=utils.full_source_path(), stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE, stderr=self.stderr)
+        perf_utils.count_child_process()
+
+    def send(self, inputs):
+        """Start running the script on a batch of inputs."""
+        request = json.dumps({"inputs": inputs}) + "\n"
+        self.proc.stdin.write(request.encode())
+        self.proc.stdin.flush()
+
+    def receive(self):
+        """Wait for the results of the batch sent last.
+
+        Returns:
+            list: One (stdout, error) pair per input.  error is None if
+            the script finished normally, otherwise the traceback or
+            anything it wrote to stderr.
+
+        """
+        line = self.proc.stdout.readline()
+        if len(line) == 0:
+            self.proc.wait()
+            self.stderr.seek(0)
+            raise RuntimeError(f"The worker for {self.filename} stopped:\n"
+                               + self.stderr.read().decode(errors='replace'))
+        return [tuple(result) for result in json.loads(line)]
+
+    def run(self, inputs):
+        """Run the script on a batch of inputs and return the results."""
+        self.send(inputs)
+        return self.receive()
+
+    def close(self):
+        """Stop the worker process."""
+        if self.proc.poll() is None:
+            self.proc.kill()
+        self.proc.wait()
+        for stream in (self.proc.stdin, self.proc.stdout, self.stderr):
+            stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class DeadlineGuard:
+    """Kill worker processes when the current test runs out of time.
+
+    Reading from a worker blocks, so a timer kills the workers at the
+    deadline; the blocked read then fails and :attr:`timed_out` tells the
+    caller why.
+    """
+
+    def __init__(self, *workers):
+        self.workers = workers
+        self.timed_out = threading.Event()
+        self.timer = None
+
+    def _expire(self):
+        self.timed_out.set()
+        for worker in self.workers:
+            if worker.proc.poll() is None:
+                worker.proc.kill()
+
+    def __enter__(self):
+        if timing_utils.remaining() is not None:
+            self.timer = threading.Timer(timing_utils.remaining(), self._expire)
+            self.timer.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.timer is not None:
+            self.timer.cancel()
+
+
+def shrink_input(text, fails, max_rounds=SHRINK_ROUNDS):
+    """Remove lines from a failing input for as long as it still fails.
+
+    Each round tries removing every block of ``chunk`` consecutive lines,
+    keeps the first candidate that still fails and otherwise halves
+    ``chunk``.  The candidates of a round are checked as one batch.
+
+    Args:
+        text (str): An input that fails.
+        fails: Function mapping a list of inputs to a list of booleans,
+            True for the inputs that still fail.
+        max_rounds (int): Upper bound on the number of batches checked.
+
+    Returns:
+        str: The smallest failing input found.
+
+    """
+    lines = text.splitlines(keepends=True)
+    chunk = max(1, len(lines) // 2)
+    for _ in range(max_rounds):
+        if len(lines) <= 1:
+            break
+        candidates = [lines[:start] + lines[start + chunk:]
+                      for start in range(0, len(lines), chunk)]
+        results = fails(["".join(candidate) for candidate in candidates])
+        for candidate, failed in zip(candidates, results):
+            if failed:
+                lines = candidate
+                chunk = min(chunk, max(1, len(lines) // 2))
+                break
+        else:
+            if chunk == 1:
+                break
+            chunk //= 2
+    return "".join(lines)
+
+
+def _run_once(code, path, argv, text):
+    """Run compiled script code on one input in this process."""
+    modules = set(sys.modules)
+    folder = os.path.dirname(path)
+    saved = sys.stdin, sys.stdout, sys.stderr, sys.argv
+    out = io.StringIO()
+    err = io.StringIO()
+    error = None
+    sys.stdin = io.StringIO(text)
+    sys.stdout = out
+    sys.stderr = err
+    sys.argv = list(argv)
+    try:
+        exec(code, {'__name__': '__main__', '__file__': path,
+                    '__builtins__': builtins})
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            error = str(e.code)
+    except BaseException as e:
+        # Leave out this function's frame.
+        error = "".join(traceback.format_exception(type(e), e,
+                                                   e.__traceback__.tb_next))
+    finally:
+        sys.stdin, sys.stdout, sys.stderr, sys.argv = saved
+        for name in set(sys.modules) - modules:
+            module_file = getattr(sys.modules[name], '__file__', None) or ''
+            if module_file.startswith(folder):
+                del sys.modules[name]
+    if error is None and len(err.getvalue()) > 0:
+        error = err.getvalue()
+    return out.getvalue(), error
+
+
+def serve(filename, args):
+    """Entry point of a worker: run filename on each batch read from stdin."""
+    protocol_in = os.fdopen(os.dup(0), 'r')
+    protocol_out = os.fdopen(os.dup(1), 'w')
+    null = os.open(os.devnull, os.O_RDWR)
+    os.dup2(null, 0)
+    os.dup2(null, 1)
+    sys.path.insert(0, os.getcwd())
+    path = os.path.join(os.getcwd(), filename)
+    with open(path, 'r') as f:
+        code = compile(f.read(), filename, 'exec')
+    for line in protocol_in:
+        inputs = json.loads(line)["inputs"]
+        results = [_run_once(code, path, [filename] + args, text)
+                   for text in inputs]
+        protocol_out.write(json.dumps(results) + "\n")
+        protocol_out.flush()
+
+
+if __name__ == "__main__":
+    serve(sys.argv[1], sys.argv[2:])
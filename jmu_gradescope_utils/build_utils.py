@@ -4,12 +4,36 @@ import logging
 import zipfile
 import shutil
 import os
-import pkg_resources
+import importlib.resources
 from pathlib import Path
 import tempfile
 import subprocess
 import traceback
 import sys
+import json
+import configparser
+import base64
+import hashlib
+import re
+from . import reference_utils
+from . import run_utils
+from . import shard_utils
+
+# Seconds between checks of the cancel event while run_tests.py runs.
+CANCEL_POLL_INTERVAL = 0.2
+
+
+def _data_path(*parts):
+    """Return the location of a file in the package's data folder."""
+    path = importlib.resources.files('jmu_gradescope_utils') / 'data'
+    for part in parts:
+        path = path / part
+    return path
+
+
+def _cancelled(cancel):
+    return cancel is not None and cancel.is_set()
+
 
 def create_template(folder):
     path = Path(folder)
@@ -17,9 +41,7 @@ def create_template(folder):
         logging.error(f"Cannot create folder {path.name} already exists.")
         return False
 
-    source = pkg_resources.resource_filename('jmu_gradescope_utils',
-                                             os.path.join('data', 'template'))
-    shutil.copytree(source, path)
+    shutil.copytree(_data_path('template'), path)
     # Can't have empty folders in the template...
     (path / 'scaffolding').mkdir(exist_ok=True)
     logging.info(f'Created {path}')
@@ -27,7 +49,21 @@ def create_template(folder):
 
 
 def test_autograder(autograder_folder, sample_folder,
-                    delete_tmp_folder=True):
+                    delete_tmp_folder=True, cancel=None):
+    """Run the autograder against a sample submission in a temporary folder.
+
+    Args:
+        autograder_folder (str): The autograder folder.
+        sample_folder (str): Folder containing the sample submission.
+        delete_tmp_folder (bool): Remove the temporary folder afterwards.
+        cancel (threading.Event): If this is set while the tests are
+            running, run_tests.py is killed and no results are returned.
+
+    Returns:
+        tuple: Location of a copy of results.json (None if the tests could
+        not be run) and the return code of run_tests.py.
+
+    """
     return_loc = None
     return_code = 1
     try:
@@ -36,7 +72,8 @@ def test_autograder(autograder_folder, sample_folder,
 
         zip_location = tmpdir / 'tmp.zip'
         logging.info(f"Creating zip file {str(zip_location)} for testing...")
-        build_zip(autograder_folder, zip_location)
+        if not build_zip(autograder_folder, zip_location, cancel=cancel):
+            return return_loc, return_code
 
         logging.info("Unzipping into the test folder...")
 
@@ -56,7 +93,16 @@ def test_autograder(autograder_folder, sample_folder,
                              stdout=subprocess.PIPE,
                              stderr=subprocess.PIPE,
                              env=my_env)
-        stdout, stderr = p.communicate()
+        while True:
+            try:
+                stdout, stderr = p.communicate(timeout=CANCEL_POLL_INTERVAL)
+                break
+            except subprocess.TimeoutExpired:
+                if _cancelled(cancel):
+                    p.kill()
+                    p.communicate()
+                    logging.warning("Testing cancelled.")
+                    return return_loc, return_code
         return_code = p.returncode
         # Raise an exception if there was a problem so we can see the stack.
         if len(stdout) > 0:
@@ -71,6 +117,25 @@ def test_autograder(autograder_folder, sample_folder,
         return_loc = Path(tempfile.mkdtemp()) / 'results.json.txt'
         shutil.copy(tmpdir / 'results' / 'results.json', return_loc)
 
+        with open(return_loc, 'r') as f:
+            results = json.load(f)
+
+        # Autograders that split their tests across workers use these
+        # timings (included by build_zip) to balance the workers.  A run
+        # that recorded none (for example because the sample solution
+        # failed the syntax check) keeps the previous ones.
+        if _uses_workers(autograder_folder):
+            timings_path = Path(autograder_folder) / shard_utils.TIMINGS_FILE
+            timings = shard_utils.timings_from_results(results)
+            names = [entry.get("name") for entry in results.get("tests", [])]
+            if len(timings) == 0 or names == [run_utils.SYNTAX_CHECK]:
+                logging.warning(f"No test timings were recorded; "
+                                f"{timings_path} was not updated.")
+            else:
+                with open(timings_path, 'w') as f:
+                    json.dump(timings, f, indent=4)
+                logging.info(f"Saved test timings to {timings_path}")
+
     except:
         logging.error(f"Error testing autograder:\n {traceback.format_exc()}")
 
@@ -81,7 +146,114 @@ def test_autograder(autograder_folder, sample_folder,
         return return_loc, return_code
 
 
-def build_zip(autograder_folder, zip_location):
+def _uses_workers(autograder_folder):
+    config = configparser.ConfigParser()
+    config.read(Path(autograder_folder) / 'config.ini')
+    # Parsed as run_tests parses it when grading.
+    return int(run_utils.get_float_setting(config, 'RUN', 'workers', 1)) > 1
+
+
+def _normalize_name(name):
+    return re.sub(r'[-_.]+', '_', name).lower()
+
+
+def _record_hash(data):
+    digest = hashlib.sha256(data).digest()
+    return 'sha256=' + base64.urlsafe_b64encode(digest).rstrip(b'=').decode()
+
+
+def build_self_wheel(dest_folder):
+    """Package the installed jmu_gradescope_utils as a wheel.
+
+    The wheel is assembled directly from the installed package files, so
+    this works whether or not the source tree is available.
+
+    Args:
+        dest_folder (str): Folder where the wheel will be written.
+
+    Returns:
+        Path: Location of the new wheel.
+
+    """
+    import importlib.metadata
+    name = 'jmu_gradescope_utils'
+    try:
+        version = importlib.metadata.version(name)
+        requires = importlib.metadata.requires(name) or []
+    except importlib.metadata.PackageNotFoundError:
+        version, requires = '0.0', []
+
+    dist_info = f'{name}-{version}.dist-info'
+    metadata = f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n"
+    metadata += "".join(f"Requires-Dist: {req}\n" for req in requires)
+    wheel_info = ("Wheel-Version: 1.0\nGenerator: jmu_gradescope_utils\n"
+                  "Root-Is-Purelib: true\nTag: py3-none-any\n")
+
+    files = {}
+    package_path = Path(__file__).resolve().parent
+    for path in sorted(package_path.glob('**/*')):
+        if path.is_file() and '__pycache__' not in path.parts:
+            arcname = Path(name) / path.relative_to(package_path)
+            files[arcname.as_posix()] = path.read_bytes()
+    files[f'{dist_info}/METADATA'] = metadata.encode()
+    files[f'{dist_info}/WHEEL'] = wheel_info.encode()
+
+    record = "".join(f"{arcname},{_record_hash(data)},{len(data)}\n"
+                     for arcname, data in files.items())
+    record += f"{dist_info}/RECORD,,\n"
+    files[f'{dist_info}/RECORD'] = record.encode()
+
+    wheel_path = Path(dest_folder) / f'{name}-{version}-py3-none-any.whl'
+    with zipfile.ZipFile(wheel_path, 'w', zipfile.ZIP_DEFLATED) as wheel:
+        for arcname, data in files.items():
+            wheel.writestr(arcname, data)
+    return wheel_path
+
+
+def _add_wheelhouse(zip_file, wheelhouse):
+    """Add the wheels in wheelhouse, plus this package, to the zip file."""
+    import importlib.metadata
+    wheels = sorted(Path(wheelhouse).glob('*.whl'))
+    available = {_normalize_name(path.name.split('-')[0]) for path in wheels}
+    for path in wheels:
+        logging.info(f"Adding {path.name} to wheelhouse")
+        zip_file.write(path, arcname=os.path.join('wheelhouse', path.name))
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        self_wheel = build_self_wheel(tmpdir)
+        logging.info(f"Adding {self_wheel.name} to wheelhouse")
+        zip_file.write(self_wheel,
+                       arcname=os.path.join('wheelhouse', self_wheel.name))
+
+    # pip install --no-index fails on the server if anything is missing, so
+    # point it out now.
+    for requirement in importlib.metadata.requires('jmu_gradescope_utils') or []:
+        if 'extra ==' in requirement:
+            continue
+        match = re.match(r'[A-Za-z0-9._-]+', requirement)
+        if match and _normalize_name(match.group()) not in available:
+            logging.warning(f"No wheel for {match.group()} in {wheelhouse}; "
+                            f"setup.sh will not be able to install it.")
+
+
+def build_zip(autograder_folder, zip_location, wheelhouse=None, cancel=None):
+    """Build an uploadable autograder zip file.
+
+    Args:
+        autograder_folder (str): The autograder folder.
+        zip_location (str): Where to write the zip file.
+        wheelhouse (str): Optional folder of ``.whl`` files.  If provided,
+            these wheels and a wheel of jmu_gradescope_utils itself are
+            bundled into the zip, and setup.sh installs from them with
+            ``--no-index`` instead of downloading packages.
+        cancel (threading.Event): If this is set before the zip file is
+            finished, the partial zip file is discarded and any existing
+            zip file is left in place.
+
+    Returns:
+        bool: True if the zip file was created.
+
+    """
     # These just need to be copied in.
     files_to_copy = ['run_autograder', 'setup.sh', 'run_tests.py']
 
@@ -90,6 +262,7 @@ def build_zip(autograder_folder, zip_location):
     config_files = ['flake8.cfg', 'docstring.cfg', 'requirements.txt']
 
     # if autograder.zip already exists for this hw, back it up
+    bak_location = None
     if os.path.exists(zip_location):
         bak_location = zip_location + '.bak'
         shutil.copy(zip_location, bak_location)
@@ -102,13 +275,13 @@ def build_zip(autograder_folder, zip_location):
     if config_path.exists():
         zip_file.write(config_path, 'config.ini')
         tests_path = Path(autograder_folder) / 'tests'
-        test_files = tests_path.glob('*')
+        test_files = list(tests_path.glob('*'))
     else:
         code_files = []
         test_files = []
         for filename in os.listdir(autograder_folder):
             if filename.startswith("test_") or filename.endswith("_test.py"):
-                test_files.append(Path(filename))
+                test_files.append(Path(autograder_folder) / filename)
             elif filename.endswith(".py"):
                 code_files.append(filename)
         code_files = ", ".join(code_files)
@@ -117,6 +290,8 @@ def build_zip(autograder_folder, zip_location):
 
     # Set up the official tests folder...
     for path in test_files:
+        if _cancelled(cancel):
+            break
         logging.info(f"Adding {path.name} to zip file")
         zip_file.write(path, arcname=os.path.join('tests', path.name))
     zip_file.writestr(os.path.join('tests', '__init__.py'), '')
@@ -124,14 +299,34 @@ def build_zip(autograder_folder, zip_location):
     # Add scaffolding code
     scaffold_path = Path(autograder_folder) / 'scaffolding'
     for path in scaffold_path.glob('**/*'):
+        if _cancelled(cancel):
+            break
         lname = str(path).split(str(scaffold_path) + os.sep)[1]
         logging.info(f"Adding  {lname} to zip file")
         zip_file.write(path, arcname=lname)
 
+    # Add the outputs of the reference solution for the inputs the tests
+    # declare
+    outputs_ok = True
+    if not _cancelled(cancel):
+        outputs_ok = reference_utils.add_reference_outputs(
+            zip_file, autograder_folder, test_files, cancel=cancel)
+
+    # Add test timings recorded by test_autograder
+    timings_path = Path(autograder_folder) / shard_utils.TIMINGS_FILE
+    if timings_path.exists():
+        logging.info(f"Adding {timings_path.name} to zip file")
+        zip_file.write(timings_path, arcname=timings_path.name)
+
+    if wheelhouse is not None and not _cancelled(cancel):
+        _add_wheelhouse(zip_file, wheelhouse)
+
     # Add the files that just need to be added...
     for file_name in files_to_copy:
-        path = pkg_resources.resource_filename('jmu_gradescope_utils',
-                                               os.path.join('data', file_name))
+        data_name = file_name
+        if file_name == 'setup.sh' and wheelhouse is not None:
+            data_name = 'setup_wheelhouse.sh'
+        path = _data_path(data_name)
         logging.info(f"Adding {file_name} to zip file")
         zip_file.write(path, arcname=file_name)
 
@@ -142,13 +337,23 @@ def build_zip(autograder_folder, zip_location):
             logging.info(f"Adding user provided {file_name} to zip file")
             zip_file.write(path, arcname=file_name)
         else:
-            source = os.path.join('data', 'template', 'configurations', file_name)
-            path = pkg_resources.resource_filename('jmu_gradescope_utils', source)
+            path = _data_path('template', 'configurations', file_name)
             logging.warning(f"{file_name} not provided. Adding default to zip file.")
             zip_file.write(path, arcname=file_name)
 
     zip_file.close()
+    if _cancelled(cancel) or not outputs_ok:
+        os.remove(zip_location)
+        if bak_location is not None:
+            shutil.copy(bak_location, zip_location)
+        if _cancelled(cancel):
+            logging.warning("Building the zip file was cancelled.")
+        else:
+            logging.error("Could not record the reference outputs; "
+                          "the zip file was not created.")
+        return False
     logging.info(f'Zip file {zip_location} created.')
+    return True
 
 
 if __name__ == "__main__":
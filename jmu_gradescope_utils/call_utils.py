@@ -0,0 +1,156 @@
+"""Call student functions in-process with captured I/O and a time limit.
+
+:func:`call_with_io` runs a function with ``sys.stdin`` fed from a string
+and ``sys.stdout`` captured, and gives up on it after a timeout, so that a
+function that hangs fails only the test that called it.  The call runs
+either
+
+* on a worker thread (the default): cheap, and the function sees and
+  changes the same objects as the test.  A thread that runs past its
+  timeout is sent a ``TimeLimitExceeded`` exception, which stops Python
+  code at its next bytecode boundary but can't interrupt a blocking call
+  into C; or
+* in a forked child process (``isolate=True``): the child is simply killed
+  when it runs out of time, and nothing the function does affects the
+  test process.  The return value (or exception) must be picklable, and
+  changes the function makes to its arguments are not seen by the caller.
+
+"""
+import ctypes
+import os
+import pickle
+import select
+import signal
+import threading
+import time
+import traceback
+
+from . import timing_utils
+from . import utils
+
+# Seconds a timed-out worker thread is given to stop after it has been
+# sent an exception.
+STOP_GRACE = 0.1
+
+
+class CallTimeout(timing_utils.TimeLimitExceeded):
+    """Raised when a call does not finish within its timeout."""
+
+
+def _stop_thread(thread, exception=timing_utils.TimeLimitExceeded):
+    """Raise an exception (TimeLimitExceeded by default) inside a running
+    thread."""
+    ctypes.pythonapi.PyThreadState_SetAsyncExc(
+        ctypes.c_ulong(thread.ident), ctypes.py_object(exception))
+
+
+def _call_in_thread(func, args, kwargs, stdin, timeout):
+    outcome = {}
+
+    def target():
+        try:
+            outcome['value'] = func(*args, **kwargs)
+        except BaseException as e:
+            outcome['error'] = e
+
+    context = utils.IOContext(stdin)
+    thread = threading.Thread(target=target, daemon=True)
+    with context:
+        thread.start()
+        try:
+            thread.join(timeout)
+        finally:
+            # Also reached if the test's own alarm interrupts the wait.
+            if thread.is_alive():
+                _stop_thread(thread)
+                thread.join(STOP_GRACE)
+                outcome = {'timeout': True}
+    return outcome, context.output
+
+
+def _call_in_child(func, args, kwargs, stdin, timeout):
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        # The child: run the call, send back the outcome and leave without
+        # running any of the parent's cleanup.
+        os.close(read_fd)
+        try:
+            context = utils.IOContext(stdin)
+            try:
+                with context:
+                    outcome = {'value': func(*args, **kwargs)}
+            except BaseException as e:
+                outcome = {'error': e}
+            try:
+                data = pickle.dumps((outcome, context.output))
+            except Exception:
+                if 'error' in outcome:
+                    e = outcome['error']
+                    text = "".join(traceback.format_exception(type(e), e,
+                                                              e.__traceback__))
+                else:
+                    text = "The return value can't be sent back from the child process."
+                data = pickle.dumps(({'error': RuntimeError(text)}, context.output))
+            with os.fdopen(write_fd, 'wb') as f:
+                f.write(data)
+        finally:
+            os._exit(0)
+
+    os.close(write_fd)
+    chunks = []
+    end = None if timeout is None else time.monotonic() + timeout
+    try:
+        while True:
+            wait = None if end is None else max(0.0, end - time.monotonic())
+            ready, _, _ = select.select([read_fd], [], [], wait)
+            if len(ready) == 0:
+                return {'timeout': True}, ""
+            chunk = os.read(read_fd, 1 << 16)
+            if len(chunk) == 0:
+                break
+            chunks.append(chunk)
+    finally:
+        os.close(read_fd)
+        # The child has either sent everything or is out of time.
+        os.kill(pid, signal.SIGKILL)
+        os.waitpid(pid, 0)
+    if len(chunks) == 0:
+        return {'error': RuntimeError("The function ended the process.")}, ""
+    return pickle.loads(b"".join(chunks))
+
+
+def call_with_io(func, args=(), kwargs=None, stdin="", timeout=None,
+                 isolate=False):
+    """Call func with the given input on stdin, capturing its output.
+
+    Args:
+        func: The function to call.
+        args (tuple): Positional arguments.
+        kwargs (dict): Keyword arguments.
+        stdin (str): Text the function reads from ``sys.stdin``.
+        timeout (float): Seconds to wait for the call (None to wait as long
+            as it takes).
+        isolate (bool): Run the call in a forked child process instead of
+            on a thread.  Falls back to a thread where ``os.fork`` is not
+            available.
+
+    Returns:
+        tuple: The return value, and the output written to ``sys.stdout``.
+
+    Raises:
+        CallTimeout: If the call did not finish in time.
+        Exception: Whatever the function raised.
+
+    """
+    kwargs = kwargs or {}
+    if isolate and hasattr(os, 'fork'):
+        outcome, output = _call_in_child(func, args, kwargs, stdin, timeout)
+    else:
+        outcome, output = _call_in_thread(func, args, kwargs, stdin, timeout)
+    if 'timeout' in outcome:
+        raise CallTimeout(f"{getattr(func, '__name__', 'The function')}() did "
+                          f"not finish within {timeout:.1f} seconds.")
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['value'], output
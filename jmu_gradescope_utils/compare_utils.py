@@ -0,0 +1,236 @@
+"""Tolerant, line by line output comparators.
+
+A comparator decides whether a line of script output matches a line of
+expected output.  Comparators can be combined with ``+``::
+
+    from jmu_gradescope_utils.compare_utils import (
+        IgnoreTrailingWhitespace, IgnoreCase, FloatTolerance)
+
+    self.assertOutputEqual('stats.py', '', expected,
+                           comparator=IgnoreTrailingWhitespace()
+                           + IgnoreCase() + FloatTolerance(1e-3))
+
+Comparators only ever look at one line of each output at a time, so they
+can be applied to output while it is still being read.  Lines are compared
+without their line endings, so a missing newline at the end of the output
+is not reported.
+
+"""
+import math
+import re
+
+
+class LineComparator:
+    """Compare lines exactly.  Base class for the other comparators."""
+
+    description = "exactly"
+
+    def normalize(self, line):
+        """Return line as it should be compared, or None to skip it."""
+        return line
+
+    def lines_equal(self, actual, expected):
+        """Compare two normalized lines."""
+        return actual == expected
+
+    def normalized_lines(self, lines):
+        """Yield (line number, raw line, normalized line) for kept lines.
+
+        Args:
+            lines: Lines, with or without their line endings.
+
+        """
+        for number, line in enumerate(lines, 1):
+            normalized = self.normalize(line.rstrip('\r\n'))
+            if normalized is not None:
+                yield number, line, normalized
+
+    def contains(self, lines, expected):
+        """Return True if expected appears in the output lines.
+
+        A single line of expected text may appear anywhere inside an output
+        line.  Several lines of expected text have to match complete,
+        consecutive output lines.
+
+        Args:
+            lines: The output, as an iterable of lines.
+            expected (str): The text to look for.
+
+        """
+        wanted = [normalized for _, _, normalized
+                  in self.normalized_lines(expected.splitlines())]
+        if len(wanted) == 0:
+            return True
+        if len(wanted) == 1:
+            return any(self.line_contains(normalized, wanted[0])
+                       for _, _, normalized in self.normalized_lines(lines))
+        window = []
+        for _, _, normalized in self.normalized_lines(lines):
+            window.append(normalized)
+            if len(window) > len(wanted):
+                window.pop(0)
+            if (len(window) == len(wanted)
+                    and all(self.lines_equal(a, e) for a, e in zip(window, wanted))):
+                return True
+        return False
+
+    def line_contains(self, line, fragment):
+        """Return True if fragment appears in a normalized output line."""
+        return fragment in line
+
+    def __add__(self, other):
+        return Chain(self, other)
+
+    def __repr__(self):
+        return f"{type(self).__name__}()"
+
+
+class Chain(LineComparator):
+    """Several comparators applied one after another."""
+
+    def __init__(self, *comparators):
+        self.comparators = []
+        for comparator in comparators:
+            if isinstance(comparator, Chain):
+                self.comparators.extend(comparator.comparators)
+            else:
+                self.comparators.append(comparator)
+        # Look these up once instead of on every line.
+        self._normalizers = [c.normalize for c in self.comparators
+                             if type(c).normalize is not LineComparator.normalize]
+        self._equals = [c for c in self.comparators
+                        if type(c).lines_equal is not LineComparator.lines_equal]
+        self.description = ", ".join(c.description for c in self.comparators)
+
+    def normalize(self, line):
+        for normalize in self._normalizers:
+            line = normalize(line)
+            if line is None:
+                return None
+        return line
+
+    def lines_equal(self, actual, expected):
+        if len(self._equals) == 0:
+            return actual == expected
+        return all(c.lines_equal(actual, expected) for c in self._equals)
+
+    def line_contains(self, line, fragment):
+        if len(self._equals) == 0:
+            return fragment in line
+        return all(c.line_contains(line, fragment) for c in self._equals)
+
+    def __repr__(self):
+        return " + ".join(repr(c) for c in self.comparators)
+
+
+class IgnoreTrailingWhitespace(LineComparator):
+    """Ignore spaces and tabs at the ends of lines."""
+
+    description = "ignoring trailing whitespace"
+
+    def normalize(self, line):
+        return line.rstrip()
+
+
+class IgnoreWhitespace(LineComparator):
+    """Treat any run of whitespace as a single space; ignore leading and
+    trailing whitespace."""
+
+    description = "ignoring differences in whitespace"
+
+    def normalize(self, line):
+        return " ".join(line.split())
+
+
+class IgnoreCase(LineComparator):
+    """Compare lines without regard to case."""
+
+    description = "ignoring case"
+
+    def normalize(self, line):
+        return line.casefold()
+
+
+class IgnoreBlankLines(LineComparator):
+    """Skip lines that are empty or contain only whitespace."""
+
+    description = "ignoring blank lines"
+
+    def normalize(self, line):
+        if len(line) == 0 or line.isspace():
+            return None
+        return line
+
+
+class FloatTolerance(LineComparator):
+    """Compare numbers that contain a decimal point or exponent approximately.
+
+    The text between numbers must match exactly.
+
+    Args:
+        rel_tol (float): Relative tolerance, as for ``math.isclose``.
+        abs_tol (float): Absolute tolerance, as for ``math.isclose``.
+
+    """
+
+    NUMBER = re.compile(r'[-+]?(?:\d+\.\d*|\.\d+|\d+(?=[eE]))(?:[eE][-+]?\d+)?')
+
+    def __init__(self, rel_tol=1e-6, abs_tol=1e-9):
+        self.rel_tol = rel_tol
+        self.abs_tol = abs_tol
+        self._patterns = {}
+        self.description = f"allowing floating point differences up to {rel_tol:g}"
+
+    def _numbers_close(self, actual, expected):
+        return math.isclose(float(actual), float(expected),
+                            rel_tol=self.rel_tol, abs_tol=self.abs_tol)
+
+    def lines_equal(self, actual, expected):
+        if actual == expected:
+            return True
+        # Walk the numbers in both lines in step instead of building
+        # normalized copies of them.
+        actual_pos = expected_pos = 0
+        actual_numbers = self.NUMBER.finditer(actual)
+        for expected_match in self.NUMBER.finditer(expected):
+            actual_match = next(actual_numbers, None)
+            if actual_match is None:
+                return False
+            if (actual[actual_pos:actual_match.start()]
+                    != expected[expected_pos:expected_match.start()]):
+                return False
+            if not self._numbers_close(actual_match.group(), expected_match.group()):
+                return False
+            actual_pos = actual_match.end()
+            expected_pos = expected_match.end()
+        if next(actual_numbers, None) is not None:
+            return False
+        return actual[actual_pos:] == expected[expected_pos:]
+
+    def _fragment_pattern(self, fragment):
+        """A regex that finds fragment with any numbers in place of its own."""
+        if fragment not in self._patterns:
+            parts = []
+            position = 0
+            for match in self.NUMBER.finditer(fragment):
+                parts.append(re.escape(fragment[position:match.start()]))
+                parts.append('(' + self.NUMBER.pattern + ')')
+                position = match.end()
+            parts.append(re.escape(fragment[position:]))
+            # The lookahead finds overlapping matches.
+            self._patterns[fragment] = (re.compile('(?=(' + ''.join(parts) + '))'),
+                                        self.NUMBER.findall(fragment))
+        return self._patterns[fragment]
+
+    def line_contains(self, line, fragment):
+        if fragment in line:
+            return True
+        pattern, numbers = self._fragment_pattern(fragment)
+        for match in pattern.finditer(line):
+            found = match.groups()[1:]
+            if all(self._numbers_close(a, e) for a, e in zip(found, numbers)):
+                return True
+        return False
+
+    def __repr__(self):
+        return f"FloatTolerance(rel_tol={self.rel_tol!r}, abs_tol={self.abs_tol!r})"
@@ -0,0 +1,90 @@
+"""Byte-compile the autograder source folder before the tests run.
+
+``setup_autograder`` compiles the student's files, the scaffolding and the
+official tests once, in parallel, so that test modules and scripts run by
+``getScriptOutput`` load cached bytecode instead of recompiling the source
+every time.  Syntax errors found along the way are saved to
+``syntax_errors.json`` in the source folder so that ``run_tests`` can
+report them as a single failure rather than one failure per test.
+
+"""
+import compileall
+import json
+import os
+import py_compile
+import traceback
+from pathlib import Path
+
+SYNTAX_ERRORS_FILE = 'syntax_errors.json'
+
+# getScriptOutput rewrites submitted files in place (with variable
+# substitutions), often several times within the same second, so the
+# default mtime based check could pick up stale bytecode.  Hash based pycs
+# are checked against the current source every time they are loaded.
+INVALIDATION_MODE = py_compile.PycInvalidationMode.CHECKED_HASH
+
+
+def _syntax_error(path, base):
+    """Return a student readable message if path does not compile."""
+    with open(path, 'rb') as f:
+        source = f.read()
+    try:
+        compile(source, os.path.relpath(path, base), 'exec')
+    except (SyntaxError, ValueError) as e:
+        return "".join(traceback.format_exception_only(type(e), e)).rstrip()
+    return None
+
+
+def compile_sources(source_base):
+    """Byte-compile every Python file below source_base.
+
+    Args:
+        source_base (str): The autograder source folder.
+
+    Returns:
+        dict: Mapping from the path (relative to source_base) of each file
+        that failed to compile to its error message.
+
+    """
+    if compileall.compile_dir(str(source_base), quiet=2, workers=0,
+                              invalidation_mode=INVALIDATION_MODE):
+        return {}
+
+    # Only reached when something failed: compile the files again here to
+    # find out which ones, and why.
+    errors = {}
+    for path in sorted(Path(source_base).rglob('*.py')):
+        message = _syntax_error(path, source_base)
+        if message is not None:
+            errors[str(path.relative_to(source_base))] = message
+    return errors
+
+
+def save_syntax_errors(source_base, errors):
+    """Record the errors from compile_sources, clearing any earlier record."""
+    path = Path(source_base) / SYNTAX_ERRORS_FILE
+    if len(errors) > 0:
+        with open(path, 'w') as f:
+            json.dump(errors, f, indent=4)
+    elif path.exists():
+        path.unlink()
+
+
+def load_syntax_errors(source_base):
+    """Return the errors saved by save_syntax_errors (empty if none)."""
+    try:
+        with open(Path(source_base) / SYNTAX_ERRORS_FILE, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def format_syntax_errors(errors):
+    """Describe the errors from compile_sources for the student."""
+    lines = ["The following files could not be run because they contain "
+             "syntax errors.  No other tests were run.", ""]
+    for name, message in errors.items():
+        lines.append(f"{name}:")
+        lines.append(message)
+        lines.append("")
+    return "\n".join(lines)
@@ -0,0 +1,180 @@
+"""Time student code at several input sizes and estimate how it grows.
+
+:func:`measure` times a function at a series of input sizes: each size
+gets a few untimed warm-up calls, then ``repeats`` timed samples with the
+garbage collector turned off.  A sample is long enough (several calls for
+fast functions) to be well above the timer's resolution, and the median
+sample is used, so a few samples slowed down by other work on a shared
+machine don't matter.
+
+:func:`growth_exponents` compares the timings with each complexity class
+``g(n)`` in :data:`CLASSES`.  If the code is in that class, ``t(n) / g(n)``
+levels off as n grows; if it grows faster, ``t(n) / g(n)`` keeps
+growing.  The growth is measured as the slope of ``log(t(n) / g(n))``
+against ``log n``, estimated with the Theil-Sen method (the median of the
+slopes between all pairs of sizes), which ignores outliers.  A slope of
+0.5 means that relative to the class, the time grows like ``sqrt(n)``.
+
+Fixed costs make small inputs look relatively slow, so code can only look
+*better* than it is; use sizes large enough that the work dominates.
+Classes whose ratio over the sizes used is smaller than the tolerance,
+such as ``n`` and ``n log n``, can't be told apart.
+
+"""
+import gc
+import math
+import statistics
+import time
+
+# Complexity classes from slowest to fastest growing.
+CLASSES = {
+    '1': lambda n: 1.0,
+    'log n': lambda n: math.log2(max(n, 2)),
+    'n': lambda n: float(n),
+    'n log n': lambda n: n * math.log2(max(n, 2)),
+    'n^2': lambda n: float(n) ** 2,
+    'n^3': lambda n: float(n) ** 3,
+}
+
+# Accepted spellings of the class names.
+_ALIASES = {'logn': 'log n', 'nlogn': 'n log n', 'n**2': 'n^2', 'n²': 'n^2',
+            'n**3': 'n^3', 'n³': 'n^3'}
+
+# Slope of log(t / g(n)) against log n above which code is considered to
+# grow faster than the class g.
+TOLERANCE = 0.3
+
+# Timed samples per input size.
+REPEATS = 5
+
+# Untimed calls before the samples of each size.
+WARMUP = 1
+
+# Seconds a single timing sample should at least take.
+MIN_SAMPLE_TIME = 0.002
+
+# Most calls made for a single timing sample.
+MAX_CALLS_PER_SAMPLE = 1000
+
+
+def class_name(name):
+    """Normalize a complexity class such as ``'O(n log n)'`` to a key of
+    CLASSES.
+
+    Raises:
+        ValueError: If name is not a known class.
+
+    """
+    key = name.strip()
+    if key.startswith('O(') and key.endswith(')'):
+        key = key[2:-1].strip()
+    key = ' '.join(key.split())
+    key = _ALIASES.get(key.replace(' ', ''), key)
+    if key not in CLASSES:
+        raise ValueError(f"Unknown complexity class {name!r}; use one of "
+                         f"{', '.join('O(' + c + ')' for c in CLASSES)}.")
+    return key
+
+
+def check_sizes(sizes):
+    """Check that sizes can show how a running time grows.
+
+    Raises:
+        ValueError: Unless there are at least two different positive sizes.
+
+    """
+    if any(n <= 0 for n in sizes):
+        raise ValueError(f"Input sizes must be positive, not {list(sizes)!r}.")
+    if len(set(sizes)) < 2:
+        raise ValueError(f"At least two different input sizes are needed to "
+                         f"measure growth, not {list(sizes)!r}.")
+
+
+def theil_sen_slope(xs, ys):
+    """Return the median of the slopes between all pairs of points."""
+    slopes = [(ys[j] - ys[i]) / (xs[j] - xs[i])
+              for i in range(len(xs)) for j in range(i + 1, len(xs))
+              if xs[j] != xs[i]]
+    return statistics.median(slopes)
+
+
+def _time_sample(run, make_args, n, calls):
+    inputs = [make_args(n) for _ in range(calls)]
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for args in inputs:
+            run(args)
+        return (time.perf_counter() - start) / calls
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def measure(run, make_args, sizes, repeats=REPEATS, warmup=WARMUP):
+    """Time run at each input size.
+
+    Args:
+        run: Function of one argument, the input made by make_args, that
+            runs the code being timed.
+        make_args: Function mapping a size n to a new input.  It is called
+            for every timed call, outside the timing, so the code may
+            change its input.
+        sizes (list): The input sizes.
+        repeats (int): Timed samples per size.
+        warmup (int): Untimed calls per size.
+
+    Returns:
+        list: The median seconds per call at each size.
+
+    """
+    times = []
+    for n in sizes:
+        for _ in range(warmup):
+            run(make_args(n))
+        # Enough calls per sample to be well above the timer's resolution.
+        single = _time_sample(run, make_args, n, 1)
+        calls = 1
+        if single < MIN_SAMPLE_TIME:
+            calls = min(MAX_CALLS_PER_SAMPLE,
+                        math.ceil(MIN_SAMPLE_TIME / max(single, 1e-9)))
+        samples = [single] if calls == 1 else []
+        while len(samples) < repeats:
+            samples.append(_time_sample(run, make_args, n, calls))
+        times.append(statistics.median(samples))
+    return times
+
+
+def growth_exponents(sizes, times):
+    """Return, for each class, how much faster than it the times grow.
+
+    Returns:
+        dict: Class name to the Theil-Sen slope of ``log(t(n) / g(n))``
+        against ``log n``.
+
+    """
+    xs = [math.log(n) for n in sizes]
+    exponents = {}
+    for name, g in CLASSES.items():
+        ys = [math.log(max(t, 1e-12) / g(n)) for n, t in zip(sizes, times)]
+        exponents[name] = theil_sen_slope(xs, ys)
+    return exponents
+
+
+def observed_class(exponents, tolerance=TOLERANCE):
+    """Return the slowest growing class the times don't clearly outgrow."""
+    for name, exponent in exponents.items():
+        if exponent <= tolerance:
+            return name
+    return None
+
+
+def format_table(sizes, times, allowed):
+    """Format timings as a table with the time per unit of the allowed class."""
+    g = CLASSES[allowed]
+    header = f"O({allowed})"
+    lines = [f"{'n':>10}  {'seconds':>12}  {'seconds / ' + header:>20}"]
+    for n, t in zip(sizes, times):
+        lines.append(f"{n:>10}  {t:>12.6f}  {t / g(n):>20.4g}")
+    return "\n".join(lines)
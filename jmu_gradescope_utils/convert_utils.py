@@ -0,0 +1,60 @@
+"""Convert autograder folders from the .1 format to the .2 format.
+
+A .1 autograder keeps its tests, configuration files and scaffolding in an
+``autograder/`` subfolder; see the README for the .2 layout.
+
+"""
+import logging
+import shutil
+from pathlib import Path
+import os
+
+
+def is_old_format(folder):
+    """Return True if folder is an autograder in the .1 format."""
+    path = Path(folder)
+    return (path / 'autograder').is_dir() and not (path / 'config.ini').exists()
+
+
+def convert_autograder(folder, backup=True):
+    """Convert a .1 format autograder folder in place.
+
+    Args:
+        folder (str): The autograder folder.
+        backup (bool): Copy the original folder to ``<folder>_backup`` first.
+
+    """
+    path = Path(folder)
+    if backup:
+        shutil.copytree(folder, os.path.normpath(folder) + '_backup')
+        
+    (path / 'configurations').mkdir()
+    (path / 'scaffolding').mkdir()
+    (path / 'tests').mkdir()
+    
+    for item in (path / 'autograder'/ 'tests').glob('*'):
+        if item.name != '__init__.py': # no need for this
+            shutil.copy(item, path / 'tests')
+
+    config_files = ['docstring.cfg', 'flake8.cfg', 'requirements.txt']
+    for f in config_files:
+        try:
+            shutil.copy(path / 'autograder' / f, path /'configurations' /f)
+        except FileNotFoundError:
+            logging.warning(f'{f} not in original autograder {path.name}.')
+
+    for item in (path / 'autograder').glob('*.py'):
+        if item.name != 'run_tests.py': # no need for this
+            shutil.copy(item, path / 'scaffolding')
+
+    # config.ini file lists are comma separated.
+    sample_files = sorted(item.name for item in (path / 'sample').glob('*.py'))
+    code = [name for name in sample_files if not name.startswith('test')]
+    tests = [name for name in sample_files if name.startswith('test')]
+    with open(path / 'config.ini', 'w') as f:
+        f.write('[SUBMIT]\n')
+        f.write('code: ' + ', '.join(code))
+        f.write('\ntests: ' + ', '.join(tests))
+        f.write('\n')
+
+    shutil.rmtree(path / 'autograder')
@@ -0,0 +1,183 @@
+"""Convert and build every autograder in a course repository.
+
+:func:`discover` finds the autograder folders below a root folder,
+:func:`make_plan` decides what has to be done for each of them (convert
+from the .1 format, build the zip file, or nothing because the zip file is
+newer than every input file) and :func:`run_plan` carries the plan out on a
+pool of worker threads.
+
+"""
+import concurrent.futures
+import logging
+import os
+import time
+from pathlib import Path
+
+from . import build_utils
+from . import convert_utils
+from . import reference_utils
+from . import shard_utils
+
+CONVERT = 'convert+build'
+BUILD = 'build'
+SKIP = 'skip'
+
+
+class PlanItem:
+    """What to do with one autograder folder, and how it went."""
+
+    def __init__(self, folder, action, zip_location, reason=''):
+        self.folder = folder
+        self.action = action
+        self.zip_location = zip_location
+        self.reason = reason
+        self.status = 'planned'
+        self.seconds = 0.0
+        self.message = ''
+
+
+def is_autograder(folder):
+    """Return True if folder is an autograder in either format."""
+    folder = Path(folder)
+    return (folder / 'config.ini').exists() or convert_utils.is_old_format(folder)
+
+
+def discover(root):
+    """Find the autograder folders below root.
+
+    Folders are not searched below an autograder folder, and hidden folders
+    and the ``*_backup`` copies made by convert_autograder are ignored.
+
+    Returns:
+        list: Autograder folders, sorted by path.
+
+    """
+    found = []
+    for dirpath, dirnames, _ in os.walk(root):
+        if is_autograder(dirpath):
+            found.append(Path(dirpath))
+            dirnames[:] = []
+            continue
+        dirnames[:] = sorted(name for name in dirnames
+                             if not name.startswith('.')
+                             and not name.endswith('_backup')
+                             and name != '__pycache__')
+    return sorted(found)
+
+
+def default_zip_location(folder):
+    """The zip file location used by build_autograder.py."""
+    folder = Path(folder).resolve()
+    return folder / ('autograder_' + folder.name + '.zip')
+
+
+# The parts of an autograder folder that build_zip reads.
+ZIP_INPUTS = ('config.ini', 'tests', 'scaffolding', 'configurations',
+              reference_utils.REFERENCE_FOLDER, shard_utils.TIMINGS_FILE)
+
+
+def newest_input(folder):
+    """Return the newest modification time of the files that go in the zip."""
+    newest = 0
+    for name in ZIP_INPUTS:
+        path = Path(folder) / name
+        if path.is_file():
+            newest = max(newest, path.stat().st_mtime_ns)
+        elif path.is_dir():
+            for child in path.glob('**/*'):
+                if child.is_file() and '__pycache__' not in child.parts:
+                    newest = max(newest, child.stat().st_mtime_ns)
+    return newest
+
+
+def make_plan(folders, force=False):
+    """Decide what to do with each autograder folder.
+
+    Args:
+        folders (list): Autograder folders, e.g. from discover.
+        force (bool): Build folders even if their zip file is up to date.
+
+    Returns:
+        list: One PlanItem per folder.
+
+    """
+    plan = []
+    for folder in folders:
+        zip_location = default_zip_location(folder)
+        if convert_utils.is_old_format(folder):
+            plan.append(PlanItem(folder, CONVERT, zip_location, 'old format'))
+        elif not zip_location.exists():
+            plan.append(PlanItem(folder, BUILD, zip_location, 'no zip file'))
+        elif force:
+            plan.append(PlanItem(folder, BUILD, zip_location, 'forced'))
+        elif newest_input(folder) > zip_location.stat().st_mtime_ns:
+            plan.append(PlanItem(folder, BUILD, zip_location, 'changed'))
+        else:
+            plan.append(PlanItem(folder, SKIP, zip_location, 'up to date'))
+    return plan
+
+
+def _carry_out(item):
+    start = time.perf_counter()
+    try:
+        if item.action == CONVERT:
+            convert_utils.convert_autograder(str(item.folder))
+        if build_utils.build_zip(str(item.folder), str(item.zip_location)):
+            item.status = 'ok'
+        else:
+            item.status = 'failed'
+    except Exception as e:
+        item.status = 'failed'
+        item.message = f"{type(e).__name__}: {e}"
+        logging.error(f"{item.folder}: {item.message}")
+    item.seconds = time.perf_counter() - start
+    return item
+
+
+def run_plan(plan, workers=None):
+    """Convert and build the folders in plan concurrently.
+
+    Args:
+        plan (list): PlanItems from make_plan.  Their status, seconds and
+            message are filled in.
+        workers (int): Number of worker threads (default: chosen by
+            ``concurrent.futures.ThreadPoolExecutor``).
+
+    Returns:
+        list: The plan.
+
+    """
+    for item in plan:
+        if item.action == SKIP:
+            item.status = 'skipped'
+    todo = [item for item in plan if item.action != SKIP]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(_carry_out, todo))
+    return plan
+
+
+def format_plan(plan, root=None, results=False):
+    """Format a plan (or, with results=True, its outcome) as a table."""
+    def name(item):
+        return str(item.folder.relative_to(root)) if root else str(item.folder)
+
+    width = max([len(name(item)) for item in plan] + [len('Folder')])
+    if results:
+        lines = [f"{'Folder':<{width}}  {'Action':<13}  {'Status':<7}  "
+                 f"{'Seconds':>7}  {'Zip KB':>8}"]
+        for item in plan:
+            size = ''
+            if item.status == 'ok' or item.status == 'skipped':
+                size = f"{item.zip_location.stat().st_size / 1024:.0f}"
+            lines.append(f"{name(item):<{width}}  {item.action:<13}  "
+                         f"{item.status:<7}  {item.seconds:>7.2f}  {size:>8}")
+        counts = {}
+        for item in plan:
+            counts[item.status] = counts.get(item.status, 0) + 1
+        lines.append(", ".join(f"{count} {status}"
+                               for status, count in sorted(counts.items())))
+    else:
+        lines = [f"{'Folder':<{width}}  {'Action':<13}  Reason"]
+        for item in plan:
+            lines.append(f"{name(item):<{width}}  {item.action:<13}  {item.reason}")
+    return "\n".join(lines)
@@ -3,12 +3,12 @@ import unittest
 import json
 import os
 import tempfile
-import sys
-import importlib
 import logging
 import traceback
 from pathlib import Path
-from coverage import Coverage
+from . import import_utils
+from . import perf_utils
+from . import timing_utils
 
 def get_gradescope_base():
     if 'JMU_GRADESCOPE_BASE' in os.environ:
@@ -16,6 +16,16 @@ def get_gradescope_base():
     else:
         return '/autograder'
 
+class _DeadlineTestResult(unittest.TestResult):
+    """TestResult that stops the run once the current deadline has passed."""
+
+    def stopTest(self, test):
+        super().stopTest(test)
+        if timing_utils.expired():
+            self.stop()
+
+
+@perf_utils.instrumented
 def run_student_tests(print_feedback=True, show_traces=True,
                       success_required=True):
     """Run a suite of student submitted tests.
@@ -40,12 +50,15 @@ def run_student_tests(print_feedback=True, show_traces=True,
         source_base = os.path.join(get_gradescope_base(), 'source')
         suite = unittest.defaultTestLoader.discover('student_tests',
                                                     top_level_dir=source_base)
-        result = unittest.TestResult()
+        result = _DeadlineTestResult()
         suite.run(result)
+    except timing_utils.TimeLimitExceeded:
+        raise
     except:
         logging.error(f"Error running student tests:\n {traceback.format_exc()}")
 
     logging.info("Tests have run.")
+    timing_utils.check_deadline("Running your tests")
 
     succeeded = len(result.failures) == 0 and len(result.errors) == 0
 
@@ -74,6 +87,7 @@ def run_student_tests(print_feedback=True, show_traces=True,
     return succeeded
 
 
+@perf_utils.instrumented
 def check_coverage(checked_files, branch=False, target_percentage=100.0,
                    print_feedback=True,
                    show_details=True, success_required=True):
@@ -102,7 +116,10 @@ def check_coverage(checked_files, branch=False, target_percentage=100.0,
 
     """
     logging.info("Checking coverage...")
-    
+    # Imported here because coverage is slow to import and most tests
+    # never need it.
+    from coverage import Coverage
+
     source_base = os.path.join(get_gradescope_base(), 'source')
     try:
         # Run the tests while checking coverage...
@@ -112,10 +129,7 @@ def check_coverage(checked_files, branch=False, target_percentage=100.0,
         # Make sure the tested modules are imported during coverage
         # monitoring so that the definition lines are covered.
         for name in checked_files:
-            module = Path(name).stem
-            if module in sys.modules:
-                del sys.modules[module]
-            importlib.import_module(module)
+            import_utils.guarded_import(Path(name).stem, reload=True)
 
         run_student_tests(print_feedback=False, success_required=False)
         cov.stop()
@@ -128,13 +142,18 @@ def check_coverage(checked_files, branch=False, target_percentage=100.0,
         os.close(fd)
         os.remove(tmp_json)
 
+        # Files under the current directory are reported with relative
+        # paths.
+        files = {os.path.abspath(name): value
+                 for name, value in data['files'].items()}
+
         adequate_coverage = True
         full_coverage = True
         for checked_file in checked_files:
             checked_file = os.path.join(source_base, checked_file)
-            if data['files'][checked_file]['summary']['percent_covered'] < target_percentage:
+            if files[checked_file]['summary']['percent_covered'] < target_percentage:
                 adequate_coverage = False
-            if data['files'][checked_file]['summary']['percent_covered_display'] != '100':
+            if files[checked_file]['summary']['percent_covered_display'] != '100':
                 full_coverage = False
 
         # Get the coverage report in table form.
@@ -147,6 +166,9 @@ def check_coverage(checked_files, branch=False, target_percentage=100.0,
             os.close(fd)
             os.remove(tmp_report)
 
+    except (timing_utils.TimeLimitExceeded, import_utils.ImportFailed):
+        cov.stop()
+        raise
     except:
         logging.error(f"Error running student tests:\n {traceback.format_exc()}")
 
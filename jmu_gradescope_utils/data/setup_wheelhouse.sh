@@ -0,0 +1,12 @@
+#!/usr/bin/env bash
+
+# Installs everything from the wheelhouse bundled into the autograder zip,
+# so building the image does not need to download any Python packages.
+
+if ! command -v pip3 > /dev/null; then
+    apt-get install -y python3 python3-pip python3-dev
+fi
+
+pip3 install --no-index --find-links /autograder/source/wheelhouse -r /autograder/source/requirements.txt
+
+pip3 install --no-index --find-links /autograder/source/wheelhouse jmu_gradescope_utils
@@ -0,0 +1,300 @@
+"""Short, readable failure messages for mismatched script output.
+
+``unittest`` builds the message for a failed ``assertEqual`` on two strings
+with ``difflib``, which takes quadratic time for long outputs and produces
+a message as long as the output itself.  The functions here find the first
+differing line in a single pass, then show a few numbered lines of context
+on each side with whitespace made visible, and never produce more than
+``MAX_MESSAGE_CHARS`` characters.
+
+"""
+import collections
+
+# Lines of context shown before and after the first difference.
+CONTEXT_LINES = 3
+
+# Visible characters shown per line; longer lines are cut around the
+# first difference.
+MAX_LINE_CHARS = 120
+
+# Upper bound on the length of a formatted message.
+MAX_MESSAGE_CHARS = 4000
+
+# Characters compared at once when looking for the first difference.
+COMPARE_CHUNK = 256
+
+# Characters shown in place of whitespace.
+VISIBLE = {' ': '·', '\t': '→', '\r': '\\r', '\n': '¶'}
+
+LEGEND = "(· is a space, → is a tab, ¶ is the end of a line)"
+
+
+def iter_lines(text):
+    """Split text into lines, keeping the newline at the end of each line.
+
+    Unlike ``str.splitlines`` only ``\\n`` ends a line, so a stray ``\\r``
+    is reported as a difference rather than hidden.
+    """
+    start = 0
+    while start < len(text):
+        end = text.find('\n', start)
+        if end == -1:
+            yield text[start:]
+            return
+        yield text[start:end + 1]
+        start = end + 1
+
+
+def visible(text):
+    """Replace whitespace in text with visible characters."""
+    if not any(char in text for char in VISIBLE):
+        return text
+    return "".join(VISIBLE.get(char, char) for char in text)
+
+
+def first_difference(actual, expected):
+    """Return the index of the first character that differs (or None)."""
+    if actual == expected:
+        return None
+    # Compare chunk by chunk, so that most character comparisons happen in
+    # C, then find the difference within the first chunk that differs.
+    # Each character is compared at most twice.
+    start = 0
+    while (actual[start:start + COMPARE_CHUNK]
+           == expected[start:start + COMPARE_CHUNK]):
+        start += COMPARE_CHUNK
+    end = min(len(actual), len(expected), start + COMPARE_CHUNK)
+    for index in range(start, end):
+        if actual[index] != expected[index]:
+            return index
+    return end
+
+
+class Mismatch:
+    """The first place where two outputs differ, with surrounding lines.
+
+    Attributes:
+        actual_line (int): 1-based number of the first differing actual line.
+        expected_line (int): 1-based number of the first differing expected
+            line.
+        column (int): 0-based index of the first differing character in
+            those lines.
+        actual (list): (line number, text) pairs around the difference.  The
+            text is None past the end of the output.
+        expected (list): The same for the expected output.
+        description (str): How the lines were compared, if not exactly.
+        as_compared (bool): True if the lines of at least one side are
+            shown after the comparator normalized them, because the column
+            refers to the normalized text.
+
+    """
+
+    def __init__(self, actual_line, expected_line, column, actual, expected):
+        self.actual_line = actual_line
+        self.expected_line = expected_line
+        self.column = column
+        self.actual = actual
+        self.expected = expected
+        self.description = None
+        self.as_compared = False
+
+
+def _take(numbered, count):
+    """Return up to count more (number, line) pairs from an iterator."""
+    lines = []
+    for pair in numbered:
+        lines.append(pair)
+        if len(lines) == count:
+            break
+    return lines
+
+
+def _numbered(lines, first=1):
+    for number, line in enumerate(lines, first):
+        yield number, line, line
+
+
+def find_mismatch(actual, expected, context=CONTEXT_LINES, comparator=None):
+    """Find the first line where two outputs differ.
+
+    Runs in time linear in the length of the common prefix.  Only
+    ``context`` lines of each output are kept in memory, so actual and
+    expected may be (lazy) iterables of lines as well as strings.
+
+    Args:
+        actual: The script output, as a string or an iterable of lines
+            that end with ``\\n``.
+        expected: The expected output, in the same form.
+        context (int): Lines to keep before and after the difference.
+        comparator (LineComparator): Compare lines with this comparator
+            from :mod:`jmu_gradescope_utils.compare_utils` instead of
+            exactly.
+
+    Returns:
+        Mismatch: None if the outputs are the same.
+
+    """
+    first = 1
+    if (comparator is None and isinstance(actual, str)
+            and isinstance(expected, str)):
+        # Skip straight to the lines just before the first difference.
+        index = first_difference(actual, expected)
+        if index is None:
+            return None
+        start = actual.rfind('\n', 0, index) + 1
+        for _ in range(context):
+            if start == 0:
+                break
+            start = actual.rfind('\n', 0, start - 1) + 1
+        first = actual.count('\n', 0, start) + 1
+        actual = actual[start:]
+        expected = expected[start:]
+    if isinstance(actual, str):
+        actual = iter_lines(actual)
+    if isinstance(expected, str):
+        expected = iter_lines(expected)
+    if comparator is None:
+        actual = _numbered(actual, first)
+        expected = _numbered(expected, first)
+        equal = str.__eq__
+    else:
+        actual = comparator.normalized_lines(actual)
+        expected = comparator.normalized_lines(expected)
+        equal = comparator.lines_equal
+
+    actual_before = collections.deque(maxlen=context)
+    expected_before = collections.deque(maxlen=context)
+    actual_number = expected_number = first - 1
+    while True:
+        actual_item = next(actual, None)
+        expected_item = next(expected, None)
+        if actual_item is None and expected_item is None:
+            return None
+        if (actual_item is None or expected_item is None
+                or not equal(actual_item[2], expected_item[2])):
+            break
+        actual_number = actual_item[0]
+        expected_number = expected_item[0]
+        actual_before.append(actual_item)
+        expected_before.append(expected_item)
+
+    actual_key = actual_item[2] if actual_item is not None else ''
+    expected_key = expected_item[2] if expected_item is not None else ''
+    column = first_difference(actual_key, expected_key) or 0
+    sides = []
+    as_compared = False
+    for item, before, rest, number in [(actual_item, actual_before, actual, actual_number),
+                                       (expected_item, expected_before, expected,
+                                        expected_number)]:
+        # The column is an offset into the normalized line, so show a side
+        # as compared if the comparator changed its differing line.
+        normalized = (comparator is not None and item is not None
+                      and item[2] != item[1].rstrip('\r\n'))
+        as_compared = as_compared or normalized
+        shown = 2 if normalized else 1
+        lines = [(pair[0], pair[shown]) for pair in before]
+        if item is None:
+            sides.append((number + 1, lines + [(number + 1, None)]))
+        else:
+            after = [(pair[0], pair[shown]) for pair in _take(rest, context)]
+            sides.append((item[0], lines + [(item[0], item[shown])] + after))
+    mismatch = Mismatch(sides[0][0], sides[1][0], column, sides[0][1], sides[1][1])
+    if comparator is not None:
+        mismatch.description = comparator.description
+        mismatch.as_compared = as_compared
+    return mismatch
+
+
+def _show_line(text, start):
+    """Visible form of text, cut to MAX_LINE_CHARS starting near start."""
+    shown = visible(text[start:start + MAX_LINE_CHARS])
+    if start > 0:
+        shown = '…' + shown
+    if len(text) > start + MAX_LINE_CHARS:
+        shown += '…'
+    return shown
+
+
+def _format_side(title, lines, mark_line, column, start):
+    width = len(str(max(number for number, _ in lines)))
+    result = [title]
+    for number, text in lines:
+        marker = '>' if number == mark_line else ' '
+        prefix = f"{marker} {number:>{width}} | "
+        if text is None:
+            result.append(prefix + "(end of output)")
+            continue
+        result.append(prefix + _show_line(text, start))
+        if number == mark_line:
+            offset = len(visible(text[start:column])) + (1 if start > 0 else 0)
+            result.append(" " * (len(prefix) + offset) + "^")
+    return result
+
+
+def format_mismatch(mismatch, max_chars=MAX_MESSAGE_CHARS):
+    """Describe a Mismatch for the student.
+
+    Returns:
+        str: A message of at most max_chars characters.
+
+    """
+    start = max(0, mismatch.column - MAX_LINE_CHARS // 2)
+    if mismatch.actual_line == mismatch.expected_line:
+        where = f"line {mismatch.actual_line}"
+    else:
+        where = (f"line {mismatch.actual_line} of the output "
+                 f"(line {mismatch.expected_line} of the expected output)")
+    how = f" ({mismatch.description})" if mismatch.description else ""
+    if mismatch.as_compared:
+        how = f" ({mismatch.description}; lines are shown as compared)"
+    lines = [f"Output does not match the expected output{how}. "
+             f"First difference at {where}, column {mismatch.column + 1}:", ""]
+    lines.extend(_format_side("Expected:", mismatch.expected,
+                              mismatch.expected_line, mismatch.column, start))
+    lines.append("")
+    lines.extend(_format_side("Actual:", mismatch.actual,
+                              mismatch.actual_line, mismatch.column, start))
+    lines.append("")
+    lines.append(LEGEND)
+    return truncate("\n".join(lines), max_chars)
+
+
+def truncate(text, max_chars=MAX_MESSAGE_CHARS):
+    """Cut text to at most max_chars characters, saying so if it was cut."""
+    if len(text) <= max_chars:
+        return text
+    note = f"\n... ({len(text) - max_chars} more characters not shown)"
+    return text[:max(0, max_chars - len(note))] + note
+
+
+def preview(text, max_chars=MAX_MESSAGE_CHARS // 2):
+    """Show (the start of) a possibly long output with visible whitespace."""
+    lines = []
+    length = 0
+    for number, line in enumerate(iter_lines(text), 1):
+        shown = f"{number:>4} | {_show_line(line, 0)}"
+        length += len(shown) + 1
+        if length > max_chars:
+            lines.append("     ... (rest not shown)")
+            break
+        lines.append(shown)
+    if len(lines) == 0:
+        lines.append("     (no output)")
+    return "\n".join(lines)
+
+
+def describe_location(text, index, context=CONTEXT_LINES):
+    """Show the lines of text around the character at index."""
+    line_number = text.count('\n', 0, index) + 1
+    line_start = text.rfind('\n', 0, index) + 1
+    column = index - line_start
+    window = []
+    for number, line in enumerate(iter_lines(text), 1):
+        if number > line_number + context:
+            break
+        if number >= line_number - context:
+            window.append((number, line))
+    start = max(0, column - MAX_LINE_CHARS // 2)
+    lines = [f"Line {line_number}, column {column + 1}:"]
+    lines.extend(_format_side("", window, line_number, column, start)[1:])
+    return "\n".join(lines)
@@ -0,0 +1,220 @@
+"""Import student modules without letting them hang the grader.
+
+A student module with an infinite loop or an ``input()`` call at the top
+level blocks the whole test run as soon as a test imports it.
+:func:`guarded_import` first imports the module in a short-lived child
+process with stdin closed and a time limit.  Only if that succeeds is the
+module imported in the grading process; otherwise the test fails with an
+explanation.  Verdicts are cached by the hash of the module's source, so
+each version of a file is probed only once per run.
+
+:class:`ModuleSnapshot` undoes the imports made by a block of code, so
+that module level state in student modules does not leak from one test to
+the next.
+
+"""
+import hashlib
+import importlib
+import importlib.abc
+import importlib.machinery
+import importlib.util
+import os
+import re
+import subprocess
+import sys
+import time
+
+from . import perf_utils
+from . import timing_utils
+from . import utils
+
+# Seconds a module may take to import in the probe.
+PROBE_TIMEOUT = 5.0
+
+# Code run by the probe process.
+_PROBE = "import importlib, sys; importlib.import_module(sys.argv[1])"
+
+# Traceback frames from the probe itself rather than the student's code.
+_PROBE_FRAME = re.compile(r'  File "(?:<string>|<frozen [^>]*>|[^"]*importlib[^"]*)", '
+                          r'line \d+, in \S+\n(?:    .*\n)*')
+
+# Source hash -> None (imports cleanly) or the reason it doesn't.
+_verdicts = {}
+
+
+class ImportFailed(AssertionError):
+    """Raised for a student module that can't safely be imported."""
+
+
+def _source_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+@perf_utils.instrumented
+def probe_import(name, timeout=PROBE_TIMEOUT):
+    """Import a module in a child process and report what went wrong.
+
+    Args:
+        name (str): The module name.
+        timeout (float): Seconds the import may take.  It never gets more
+            than the time left for the test.
+
+    Returns:
+        str: None if the module imported cleanly, otherwise a message for
+        the student.
+
+    """
+    if timing_utils.remaining() is not None:
+        timeout = min(timeout, timing_utils.remaining())
+    proc = subprocess.Popen([sys.executable, '-c', _PROBE, name],
+                            cwd=utils.full_source_path(),
+                            stdin=subprocess.DEVNULL,
+                            stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE)
+    perf_utils.count_child_process()
+    try:
+        _, stderr = proc.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.communicate()
+        return (f"Importing {name} did not finish within {timeout:.1f} "
+                f"seconds.  Code at the top level of a module runs when "
+                f"the module is imported; check for loops there, or move "
+                f"the code into a function or under "
+                f"if __name__ == '__main__':")
+    if proc.returncode == 0:
+        return None
+    stderr_text = stderr.decode(errors='replace')
+    stderr_text = stderr_text.replace(utils.full_source_path() + "/", '')
+    stderr_text = _PROBE_FRAME.sub('', stderr_text)
+    if 'EOFError' in stderr_text:
+        return (f"{name} reads input when it is imported.  Move the code "
+                f"that calls input() into a function or under "
+                f"if __name__ == '__main__':\n\n{stderr_text}")
+    return f"Error while importing {name}:\n\n{stderr_text}"
+
+
+def is_student_module(module):
+    """Return True for modules loaded from the source folder other than
+    the instructor tests."""
+    module_file = getattr(module, '__file__', None) or ''
+    return (module_file.startswith(utils.full_source_path() + os.sep)
+            and not module_file.startswith(utils.full_source_path('tests') + os.sep))
+
+
+class _TimedLoader(importlib.abc.Loader):
+    """Wrap a loader to record how long executing each module takes."""
+
+    def __init__(self, loader):
+        self.loader = loader
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        start = time.perf_counter()
+        try:
+            self.loader.exec_module(module)
+        finally:
+            perf_utils.record_call('import ' + module.__name__,
+                                   time.perf_counter() - start)
+
+    def __getattr__(self, name):
+        # get_source, get_filename, etc. for tracebacks and coverage.
+        return getattr(self.loader, name)
+
+
+class _TimedFinder(importlib.abc.MetaPathFinder):
+    """Find student modules as usual, but time their execution."""
+
+    def find_spec(self, name, path=None, target=None):
+        spec = importlib.machinery.PathFinder.find_spec(name, path, target)
+        if (spec is not None and spec.origin is not None and spec.loader is not None
+                and spec.origin.startswith(utils.full_source_path() + os.sep)
+                and not spec.origin.startswith(utils.full_source_path('tests') + os.sep)):
+            spec.loader = _TimedLoader(spec.loader)
+            return spec
+        return None
+
+
+class ModuleSnapshot:
+    """Context manager that undoes the imports made inside it.
+
+    On exit, ``sys.path`` is restored, student modules imported inside the
+    block are removed from ``sys.modules`` (so the next import runs them
+    again) and modules that were already imported get back their
+    ``sys.modules`` entries and the global variables they had on entry.
+    Globals are restored shallowly: a list that was changed in place stays
+    changed.  Other modules, such as the standard library, are left alone,
+    so restoring is cheap.
+
+    While the snapshot is active, the time spent executing student modules
+    is recorded in the test's performance data as ``import <name>`` calls,
+    which shows what giving each test fresh imports costs.
+    """
+
+    def __enter__(self):
+        self.modules = dict(sys.modules)
+        self.path = list(sys.path)
+        self.namespaces = {name: dict(module.__dict__)
+                           for name, module in self.modules.items()
+                           if is_student_module(module)}
+        self.finder = _TimedFinder()
+        sys.meta_path.insert(0, self.finder)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.finder in sys.meta_path:
+            sys.meta_path.remove(self.finder)
+        for name, module in list(sys.modules.items()):
+            if name not in self.modules and is_student_module(module):
+                del sys.modules[name]
+        for name, module in self.modules.items():
+            if sys.modules.get(name) is not module:
+                sys.modules[name] = module
+        sys.path[:] = self.path
+        for name, namespace in self.namespaces.items():
+            module_dict = self.modules[name].__dict__
+            module_dict.clear()
+            module_dict.update(namespace)
+
+
+def guarded_import(name, reload=False):
+    """Import a student module, failing cleanly if importing it blocks.
+
+    Modules that are not in the source folder (the standard library and
+    installed packages) are imported directly.
+
+    Args:
+        name (str): The module name, e.g. ``'hello_world'``.
+        reload (bool): Import the module again even if it has already been
+            imported.
+
+    Returns:
+        module: The imported module.
+
+    Raises:
+        ImportFailed: If the module hangs, reads input or raises an
+            exception when it is imported.
+
+    """
+    if name in sys.modules and not reload:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    origin = getattr(spec, 'origin', None) or ''
+    if spec is not None and origin.startswith(utils.full_source_path() + os.sep):
+        key = _source_hash(origin)
+        verdict = _verdicts.get(key)
+        if key not in _verdicts:
+            remaining = timing_utils.remaining()
+            verdict = probe_import(name)
+            # A probe cut short by the test's deadline proves nothing
+            # about later tests.
+            if verdict is None or remaining is None or remaining >= PROBE_TIMEOUT:
+                _verdicts[key] = verdict
+        if verdict is not None:
+            raise ImportFailed(verdict)
+    if reload:
+        sys.modules.pop(name, None)
+    return importlib.import_module(name)
@@ -15,8 +15,21 @@ import subprocess
 import os
 import shutil
 import re
+import io
+import random
+import threading
+import time
+from contextlib import contextmanager
 from functools import wraps
 from . import utils
+from . import batch_utils
+from . import call_utils
+from . import diff_utils
+from . import import_utils
+from . import memory_utils
+from . import perf_utils
+from . import reference_utils
+from . import timing_utils
 import sys
 from importlib import import_module
 
@@ -70,6 +83,9 @@ def required():
                 raise e.__class__(str(e) + "\n This test was required.  All of the following tests will fail automatically.")
             return result
 
+        # Lets the runner keep the tests of a class with required tests
+        # together when splitting the suite across workers.
+        wrapper.__required__ = True
         return wrapper
 
     return decorator
@@ -92,6 +108,50 @@ class OrderAllTestsMeta(type):
         return type.__new__(cls, name, bases, local)
 
 
+# Characters of a script's input shown in failure messages.  Test classes
+# can change this by setting ``input_preview_chars``.
+INPUT_PREVIEW_CHARS = 500
+
+# Functions listed in profiling feedback.  Test classes can change this by
+# setting ``profile_functions``.
+PROFILE_FUNCTIONS = 10
+
+
+@contextmanager
+def _substituted_script(filename, variables):
+    """Replace a submitted script in the source folder with a copy that has
+    variables substituted, restoring the original afterwards."""
+    tmpdir = None
+    try:
+        tmpdir, new_file_name = utils.replace_variables(filename, variables)
+
+        # Make a clean backup of the original submission:
+        shutil.copy(utils.full_submission_path(filename),
+                    os.path.join(tmpdir, "__tmp_backup.py"))
+
+        # Replace the original submission in source:
+        shutil.copy(new_file_name, utils.full_source_path(filename))
+        yield
+    finally:
+        if tmpdir is not None:
+            # Restore the original submission in source:
+            shutil.copy(os.path.join(tmpdir, "__tmp_backup.py"),
+                        utils.full_source_path(filename))
+            shutil.rmtree(tmpdir)
+
+
+def _clean_stderr(stderr_text):
+    stderr_text = utils.strip_runpy_frames(stderr_text)
+    return stderr_text.replace(utils.full_source_path() + "/", '')
+
+
+def _diverges(actual, expected, comparator=None):
+    """Compare two (stdout, error) results from batch_utils workers."""
+    return (actual[1] is not None
+            or diff_utils.find_mismatch(actual[0], expected[0],
+                                        comparator=comparator) is not None)
+
+
 class _JmuTestCase(unittest.TestCase):
     """Additional useful assertions for grading.
 
@@ -101,6 +161,82 @@ class _JmuTestCase(unittest.TestCase):
     # counts the number of dynamic modules created
     module_count = 0
 
+    # Characters of script input quoted in failure messages.
+    input_preview_chars = INPUT_PREVIEW_CHARS
+
+    # Set to True in a test class to give each test method fresh imports of
+    # the student modules (see import_utils.ModuleSnapshot).
+    isolate_modules = False
+
+    # Set to True in a test class to run student code that is too slow
+    # again under cProfile and show where the time went (see profile_utils).
+    profile_feedback = False
+
+    # Functions listed in profiling feedback.
+    profile_functions = PROFILE_FUNCTIONS
+
+    def run(self, result=None):
+        if getattr(result, 'fork_tests', False):
+            return result.runForked(self, self._runInProcess)
+        return self._runInProcess(result)
+
+    def _runInProcess(self, result):
+        if not self.isolate_modules:
+            return super().run(result)
+        with import_utils.ModuleSnapshot():
+            return super().run(result)
+
+    def describeInput(self, string_in, from_file=False):
+        """Describe script input for a failure message.
+
+        Only the first ``input_preview_chars`` characters are shown, and
+        only that much of an input file is read.
+
+        Args:
+            string_in (str): The input, or the name of a file in the
+                scaffolding folder if from_file is True.
+            from_file (bool): Interpret string_in as a file name.
+
+        Returns:
+            str: A message such as ``Input was: 'Bob\\n'``.
+
+        """
+        limit = self.input_preview_chars
+        if from_file:
+            with open(utils.full_source_path(string_in), 'r',
+                      errors='replace') as f:
+                shown = f.read(limit + 1)
+            label = "Input (from {}) was".format(string_in)
+        else:
+            shown = string_in[:limit + 1]
+            label = "Input was"
+        message = "{}: '{}'".format(label, shown[:limit].encode('unicode_escape').decode())
+        if len(shown) > limit:
+            message += " ... (only the first {} characters are shown)".format(limit)
+        return message
+
+    def _profileReport(self, report):
+        """Format a profiling report for the end of a failure message."""
+        if len(report) == 0:
+            return ""
+        return "\n\n" + report
+
+    def _profileCall(self, func, args, kwargs, stdin=""):
+        """Call a function that was too slow again under the profiler, for
+        at most ``profile_utils.PROFILE_TIME`` seconds, and describe where
+        its time went."""
+        from . import profile_utils
+        profiled = profile_utils.ProfiledCall(func)
+        try:
+            call_utils.call_with_io(profiled, args, kwargs, stdin=stdin,
+                                    timeout=profile_utils.PROFILE_TIME)
+        except Exception:
+            # Only the profile is wanted; the first call already failed.
+            pass
+        return self._profileReport(profiled.report(utils.full_source_path(),
+                                                   self.profile_functions))
+
+    @perf_utils.instrumented
     def getScriptOutput(self, filename, string_in, variables=None, args="",
                         msg=None, processor=None, only_output=False, from_file=False):
         """Get output for the provided Python script.
@@ -117,7 +253,12 @@ class _JmuTestCase(unittest.TestCase):
                 process the script output before it is returned.
             only_output (bool): Return only the stdout (rather than also the stderr).
             from_file (bool): Interpret string_in as a file name rather than a string.
-                The file should be stored in the scaffolding folder.
+                The file should be stored in the scaffolding folder.  It is
+                opened as the script's stdin rather than read into memory.
+
+        If the test class sets ``profile_feedback`` and the script runs out
+        of time, it is run again under ``cProfile`` and the time limit
+        message shows where it spent its time.
 
         Returns:
             dict: keys include 'stdout', and 'msg' as well as 'stderr' if there
@@ -126,31 +267,57 @@ class _JmuTestCase(unittest.TestCase):
             as well as the inputs to the script.
 
         """
-        tmpdir = None
-        try:
-            tmpdir, new_file_name = utils.replace_variables(filename,
-                                                            variables)
-
-            # Make a clean backup of the original submission:
-            shutil.copy(utils.full_submission_path(filename),
-                        os.path.join(tmpdir, "__tmp_backup.py"))
-
-            # Replace the original submission in source:
-            shutil.copy(new_file_name, utils.full_source_path(filename))
-
-            command = [sys.executable, utils.full_source_path(filename)]
+        with _substituted_script(filename, variables):
+            command = utils.script_command(filename)
             command.extend(args.split())
 
-            proc = subprocess.Popen(command,
-                                    stdin=subprocess.PIPE,
-                                    stdout=subprocess.PIPE,
-                                    stderr=subprocess.PIPE)
-
             if from_file:
-                with open(utils.full_source_path(string_in), 'r') as f:
-                    string_in = f.read()
+                stdin = open(utils.full_source_path(string_in), 'rb')
+                string_in_bytes = None
+            else:
+                stdin = subprocess.PIPE
+                string_in_bytes = string_in.encode()
+
+            try:
+                proc = subprocess.Popen(command,
+                                        cwd=utils.full_source_path(),
+                                        stdin=stdin,
+                                        stdout=subprocess.PIPE,
+                                        stderr=subprocess.PIPE)
+            finally:
+                if from_file:
+                    # The child has its own copy of the descriptor.
+                    stdin.close()
+            perf_utils.count_child_process()
 
-            actual, stderr = proc.communicate(input=string_in.encode())
+            try:
+                actual, stderr = proc.communicate(input=string_in_bytes,
+                                                  timeout=timing_utils.remaining())
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.communicate()
+                report = ""
+                if self.profile_feedback:
+                    from . import profile_utils
+                    if from_file:
+                        with open(utils.full_source_path(string_in), 'rb') as stdin:
+                            report = profile_utils.profile_script(
+                                command, utils.full_source_path(), stdin,
+                                cwd=utils.full_source_path(),
+                                top=self.profile_functions)
+                    else:
+                        report = profile_utils.profile_script(
+                            command, utils.full_source_path(), string_in_bytes,
+                            cwd=utils.full_source_path(),
+                            top=self.profile_functions)
+                raise timing_utils.TimeLimitExceeded(
+                    "{} did not finish within the autograder time limit.\n"
+                    "{}{}".format(filename, self.describeInput(string_in, from_file),
+                                  self._profileReport(report)))
+            except BaseException:
+                proc.kill()
+                proc.wait()
+                raise
             actual_text = actual.decode()
 
             if processor:
@@ -160,24 +327,112 @@ class _JmuTestCase(unittest.TestCase):
             stderr_text = stderr.decode()
 
             if len(stderr) > 0:
-                stderr_text = stderr_text.replace(utils.full_source_path() + "/", '')
+                stderr_text = _clean_stderr(stderr_text)
                 err_msg = "Error during script execution:\n{}".format(stderr_text)
                 out_msg = "\nOutput before failure:\n{}".format(actual_text)
                 return {"stdout": actual_text, "stderr": stderr_text, "msg": err_msg + out_msg}
 
-            show_in = string_in.encode('unicode_escape').decode()
-            message = "Input was: '{}'".format(show_in)
+            message = self.describeInput(string_in, from_file)
             if len(args) > 0:
                 message += "\nCommand line arguments: {}".format(args)
             if msg is not None:
                 message += "\n" + msg
             return {"stdout": actual_text, "msg": message}
-        finally:
-            if tmpdir is not None:
-                # Restore the original submission in source:
-                shutil.copy(os.path.join(tmpdir, "__tmp_backup.py"),
-                            utils.full_source_path(filename))
-                shutil.rmtree(tmpdir)
+
+    @perf_utils.instrumented
+    def _streamOutputMismatch(self, filename, input_file, expected_file,
+                              variables=None, args="", msg=None,
+                              comparator=None):
+        """Compare a script's output to a file while the script runs.
+
+        The script reads its input from input_file.  Its stdout is compared
+        line by line with expected_file as it is produced, and the script is
+        killed as soon as the first difference is found, including output
+        beyond the end of the expected file.
+
+        Returns:
+            dict: 'mismatch' (a :class:`~jmu_gradescope_utils.diff_utils.Mismatch`
+            or None), 'stopped' (True if the script was killed early) and
+            'msg', plus 'stderr' if there was any output on stderr.
+
+        """
+        with _substituted_script(filename, variables):
+            command = utils.script_command(filename)
+            command.extend(args.split())
+            with open(utils.full_source_path(input_file), 'rb') as stdin, \
+                    tempfile.TemporaryFile() as stderr_file:
+                proc = subprocess.Popen(command,
+                                        cwd=utils.full_source_path(),
+                                        stdin=stdin,
+                                        stdout=subprocess.PIPE,
+                                        stderr=stderr_file)
+                perf_utils.count_child_process()
+
+                # Reading stdout blocks, so a timer enforces the deadline.
+                timed_out = threading.Event()
+
+                def kill_at_deadline():
+                    timed_out.set()
+                    proc.kill()
+
+                timer = None
+                if timing_utils.remaining() is not None:
+                    timer = threading.Timer(timing_utils.remaining(), kill_at_deadline)
+                    timer.start()
+                try:
+                    stdout = io.TextIOWrapper(proc.stdout, encoding='utf-8',
+                                              errors='replace', newline='\n')
+                    with open(utils.full_source_path(expected_file), 'r') as expected:
+                        # Whole lines, however long, so that each is
+                        # compared with a whole expected line.
+                        mismatch = diff_utils.find_mismatch(stdout, expected,
+                                                            comparator=comparator)
+                    stopped = mismatch is not None and proc.poll() is None
+                    if stopped:
+                        proc.kill()
+                    proc.wait()
+                except BaseException:
+                    proc.kill()
+                    proc.wait()
+                    raise
+                finally:
+                    if timer is not None:
+                        timer.cancel()
+                    proc.stdout.close()
+
+                if timed_out.is_set():
+                    raise timing_utils.TimeLimitExceeded(
+                        "{} did not finish within the autograder time limit.\n"
+                        "{}".format(filename, self.describeInput(input_file, True)))
+
+                stderr_file.seek(0)
+                stderr_text = stderr_file.read().decode(errors='replace')
+
+        message = self.describeInput(input_file, True)
+        if len(args) > 0:
+            message += "\nCommand line arguments: {}".format(args)
+        if msg is not None:
+            message += "\n" + msg
+        result = {"mismatch": mismatch, "stopped": stopped, "msg": message}
+        if len(stderr_text) > 0 and not stopped:
+            result["stderr"] = _clean_stderr(stderr_text)
+            result["msg"] = "Error during script execution:\n" + result["stderr"]
+        return result
+
+    def _assertStreamedOutput(self, filename, input_file, expected_file,
+                              variables=None, args="", msg=None,
+                              comparator=None):
+        """Fail at the first difference between the output and expected_file."""
+        result = self._streamOutputMismatch(filename, input_file, expected_file,
+                                            variables=variables, args=args,
+                                            msg=msg, comparator=comparator)
+        if "stderr" in result:
+            self.fail(result["msg"])
+        if result["mismatch"] is not None:
+            message = diff_utils.format_mismatch(result["mismatch"])
+            if result["stopped"]:
+                message += "\nThe script was stopped at the first difference."
+            self.fail(message + "\n\n" + result["msg"])
 
     def assertScriptOutputEqual(self, filename, string_in, expected,
                                 variables=None, args="", msg=None,
@@ -188,7 +443,8 @@ class _JmuTestCase(unittest.TestCase):
 
     def assertOutputEqual(self, filename, string_in, expected,
                           variables=None, args="", msg=None,
-                          processor=None, from_files=False):
+                          processor=None, from_files=False,
+                          comparator=None):
         """Assert correct output for the provided Python script.
 
         Args:
@@ -205,11 +461,27 @@ class _JmuTestCase(unittest.TestCase):
                 to the expected output.
             from_files (bool): Interpret string_in and expected as a file names rather
                 than strings.  The files should be stored in the scaffolding folder.
+                Unless a processor is given, the output is compared with the
+                expected file while the script runs, and the script is
+                stopped at the first difference.
+            comparator (LineComparator): Compare the output line by line with
+                a comparator from :mod:`jmu_gradescope_utils.compare_utils`,
+                e.g. ``IgnoreTrailingWhitespace() + FloatTolerance(1e-3)``,
+                instead of exactly.
+
         Raises:
             AssertionError: If the expected output doesn't match the actual
                 output.
 
         """
+        if from_files and processor is None:
+            # Compare while the script runs, stopping it at the first
+            # difference.
+            self._assertStreamedOutput(filename, string_in, expected,
+                                       variables=variables, args=args,
+                                       msg=msg, comparator=comparator)
+            return
+
         result = self.getScriptOutput(filename, string_in, variables=variables,
                                       args=args, msg=msg, processor=processor,
                                       from_file=from_files)
@@ -220,11 +492,61 @@ class _JmuTestCase(unittest.TestCase):
             with open(utils.full_source_path(expected), 'r') as f:
                 expected = f.read()
 
-        self.assertEqual(result["stdout"], expected, result["msg"])
+        mismatch = diff_utils.find_mismatch(result["stdout"], expected,
+                                            comparator=comparator)
+        if mismatch is not None:
+            self.fail(diff_utils.format_mismatch(mismatch) + "\n\n" + result["msg"])
+
+    def assertOutputMatchesReference(self, filename, string_in, variables=None,
+                                     args="", msg=None, from_file=False,
+                                     comparator=None):
+        """Assert that a script prints what the reference solution printed.
+
+        The expected output is not given: it was recorded when the zip file
+        was built, by running the reference solution with the same input.
+        See :mod:`jmu_gradescope_utils.reference_utils` for how the
+        reference solution is found and which arguments can be used.
+
+        Args:
+            filename (str): The name of the Python file to test
+            string_in (str): A string that will be fed to stdin for the script
+            variables (dict): A dictionary mapping from variable names to
+                values. The script will be edited with these
+                substitutions before it is executed.
+            args (str):  Command line arguments that will be passed to the script.
+            msg (str):  Error message that will be printed if the assertion fails.
+            from_file (bool): Interpret string_in as a file name rather than a string.
+                The file should be stored in the scaffolding folder.
+            comparator (LineComparator): Compare the output line by line with
+                a comparator from :mod:`jmu_gradescope_utils.compare_utils`.
+
+        Raises:
+            AssertionError: If the output doesn't match the reference output.
+            LookupError: If no reference output was recorded for this input.
+
+        """
+        key = reference_utils.run_key(filename, string_in, variables, args,
+                                      from_file)
+        expected_file = reference_utils.output_path(key)
+        if not os.path.exists(utils.full_source_path(expected_file)):
+            raise LookupError("No reference output was recorded for {} with "
+                              "this input; rebuild the autograder zip "
+                              "file.".format(filename))
+        if from_file:
+            self._assertStreamedOutput(filename, string_in, expected_file,
+                                       variables=variables, args=args,
+                                       msg=msg, comparator=comparator)
+        else:
+            with open(utils.full_source_path(expected_file), 'r') as f:
+                expected = f.read()
+            self.assertOutputEqual(filename, string_in, expected,
+                                   variables=variables, args=args, msg=msg,
+                                   comparator=comparator)
 
     def assertOutputNotEqual(self, filename, string_in, expected,
                              variables=None, args="", msg=None,
-                             processor=None, from_files=False):
+                             processor=None, from_files=False,
+                             comparator=None):
         """Assert script output is NOT equal to the indicated string.
 
         See :meth:`~jmu_gradescope_utils.jmu_test_case._JmuTestCase.assertOutputEqual` for
@@ -240,11 +562,19 @@ class _JmuTestCase(unittest.TestCase):
             with open(utils.full_source_path(expected), 'r') as f:
                 expected = f.read()
 
-        self.assertNotEqual(result["stdout"], expected, result["msg"])
+        if comparator is None:
+            equal = result["stdout"] == expected
+        else:
+            equal = diff_utils.find_mismatch(result["stdout"], expected,
+                                             comparator=comparator) is None
+        if equal:
+            self.fail("Output should not have been:\n"
+                      + diff_utils.preview(expected) + "\n\n" + result["msg"])
 
     def assertInOutput(self, filename, string_in, expected,
                        variables=None, args="", msg=None,
-                       processor=None, from_files=False):
+                       processor=None, from_files=False,
+                       comparator=None):
         """Assert script output contains the indicated string.
 
         See :meth:`~jmu_gradescope_utils.jmu_test_case._JmuTestCase.assertOutputEqual` for
@@ -260,11 +590,20 @@ class _JmuTestCase(unittest.TestCase):
             with open(utils.full_source_path(expected), 'r') as f:
                 expected = f.read()
 
-        self.assertIn(expected, result["stdout"], result["msg"])
+        if comparator is None:
+            found = expected in result["stdout"]
+        else:
+            found = comparator.contains(diff_utils.iter_lines(result["stdout"]),
+                                        expected)
+        if not found:
+            self.fail("Expected to find:\n" + diff_utils.preview(expected)
+                      + "\n\nin the output:\n" + diff_utils.preview(result["stdout"])
+                      + "\n\n" + result["msg"])
 
     def assertNotInOutput(self, filename, string_in, expected,
                           variables=None, args="", msg=None,
-                          processor=None, from_files=False):
+                          processor=None, from_files=False,
+                          comparator=None):
         """Assert script output does not contain the indicated string.
 
         See :meth:`~jmu_gradescope_utils.jmu_test_case._JmuTestCase.assertOutputEqual` for
@@ -280,7 +619,123 @@ class _JmuTestCase(unittest.TestCase):
             with open(utils.full_source_path(expected), 'r') as f:
                 expected = f.read()
 
-        self.assertNotIn(expected, result["stdout"], result["msg"])
+        if comparator is not None:
+            if comparator.contains(diff_utils.iter_lines(result["stdout"]), expected):
+                self.fail("Output should not contain ({}):\n{}\n\n{}".format(
+                    comparator.description, diff_utils.preview(expected),
+                    result["msg"]))
+            return
+        index = result["stdout"].find(expected)
+        if index != -1:
+            self.fail("Output should not contain:\n" + diff_utils.preview(expected)
+                      + "\n\nbut it was found at "
+                      + diff_utils.describe_location(result["stdout"], index)
+                      + "\n\n" + result["msg"])
+
+    @perf_utils.instrumented
+    def assertMatchesReference(self, filename, reference, input_generator,
+                               n=100, seed=0, args="", msg=None,
+                               comparator=None,
+                               batch_size=batch_utils.BATCH_SIZE):
+        """Assert that a script prints what a reference script prints, for
+        many generated inputs.
+
+        Input number ``i`` is ``input_generator(random.Random(seed + i))``.
+        Both scripts run in long-lived worker processes (see
+        :mod:`jmu_gradescope_utils.batch_utils`) that are sent the inputs
+        in batches, so each input costs no process start.  Testing stops at
+        the first input for which the outputs differ or the script fails.
+        Lines are then removed from that input for as long as the outputs
+        still differ, and the failure message shows the smallest failing
+        input found along with the seed it was generated from.
+
+        Args:
+            filename (str): The name of the Python file to test
+            reference (str): The name of a reference solution in the
+                scaffolding folder.
+            input_generator (func): A function mapping a ``random.Random``
+                to an input string.
+            n (int): Number of inputs to try.
+            seed (int): Seed for the first input.
+            args (str):  Command line arguments that will be passed to both scripts.
+            msg (str):  Error message that will be printed if the assertion fails.
+            comparator (LineComparator): Compare the outputs line by line with
+                a comparator from :mod:`jmu_gradescope_utils.compare_utils`.
+            batch_size (int): Number of inputs sent to the workers at once.
+
+        Raises:
+            AssertionError: If the outputs differ for one of the inputs.
+            RuntimeError: If the reference solution fails for one of the
+                inputs.
+
+        """
+        failure = None
+        seeds = range(seed, seed + min(n, batch_size))
+        with batch_utils.ScriptWorker(filename, args) as student, \
+                batch_utils.ScriptWorker(reference, args) as ref, \
+                batch_utils.DeadlineGuard(student, ref) as guard:
+
+            def run_both(inputs):
+                student.send(inputs)
+                ref.send(inputs)
+                return list(zip(student.receive(), ref.receive()))
+
+            try:
+                for start in range(0, n, batch_size):
+                    seeds = range(seed + start, seed + min(n, start + batch_size))
+                    inputs = [input_generator(random.Random(case_seed))
+                              for case_seed in seeds]
+                    for case_seed, text, (actual, expected) in zip(
+                            seeds, inputs, run_both(inputs)):
+                        if expected[1] is not None:
+                            raise RuntimeError(
+                                "The reference solution {} failed for the input "
+                                "generated with seed {}:\n{}".format(
+                                    reference, case_seed, expected[1]))
+                        if _diverges(actual, expected, comparator):
+                            failure = (case_seed, text, actual, expected)
+                            break
+                    if failure is not None:
+                        break
+            except (RuntimeError, OSError):
+                if guard.timed_out.is_set():
+                    raise timing_utils.TimeLimitExceeded(
+                        "{} did not finish within the autograder time limit "
+                        "on the inputs generated with seeds {} to {}.".format(
+                            filename, seeds[0], seeds[-1]))
+                raise
+            if failure is None:
+                return
+
+            case_seed, text, actual, expected = failure
+            try:
+                smallest = batch_utils.shrink_input(
+                    text, lambda candidates: [
+                        ref_result[1] is None
+                        and _diverges(result, ref_result, comparator)
+                        for result, ref_result in run_both(candidates)])
+                if smallest != text:
+                    actual, expected = run_both([smallest])[0]
+                    text = smallest
+            except (RuntimeError, OSError):
+                # Out of time while shrinking: report the input as generated.
+                pass
+
+        message = ("Output differs from the reference solution for an input "
+                   "generated with seed {}.\n".format(case_seed)
+                   + self.describeInput(text) + "\n\n")
+        if actual[1] is not None:
+            message += ("Error during script execution:\n" + actual[1]
+                        + "\nOutput before failure:\n" + diff_utils.preview(actual[0]))
+        else:
+            message += diff_utils.format_mismatch(
+                diff_utils.find_mismatch(actual[0], expected[0],
+                                         comparator=comparator))
+        if len(args) > 0:
+            message += "\nCommand line arguments: {}".format(args)
+        if msg is not None:
+            message += "\n" + msg
+        self.fail(message)
 
     def assertNoLoops(self, filename, msg=None):
         """ Assert that the provided script has no for or while loops.
@@ -435,6 +890,404 @@ class _JmuTestCase(unittest.TestCase):
                                variables=variables, processor=processor)
         print('Correct output:\n' + expected)
 
+    @perf_utils.instrumented
+    def callWithIO(self, module, func, *args, stdin="", timeout=None,
+                   isolate=False, **kwargs):
+        """Call a function from a student module with captured I/O.
+
+        The call gets ``stdin`` as its input and its output is captured.  It
+        runs on a worker thread (or, with isolate=True, in a forked child
+        process) and fails the test if it does not finish in time; see
+        :mod:`jmu_gradescope_utils.call_utils`.
+
+        Example::
+
+            value, output = self.callWithIO('hello_world', 'greet', 'Bob',
+                                            stdin='3\\n', timeout=2)
+
+        Args:
+            module: A module, or the name of a module to import with
+                :func:`~jmu_gradescope_utils.import_utils.guarded_import`.
+            func: A function, or the name of a function in module.
+            *args: Positional arguments for the function.
+            stdin (str): Text the function reads from ``sys.stdin``.
+            timeout (float): Seconds the call may take.  It never gets more
+                than the time left for the test.
+            isolate (bool): Run the call in a forked child process, which
+                can always be stopped, instead of on a thread.  A call in a
+                child process is not profiled.
+            **kwargs: Keyword arguments for the function.
+
+        If the test class sets ``profile_feedback`` and the call runs out of
+        time, it is called again under ``cProfile`` and the time limit
+        message shows where it spent its time.
+
+        Returns:
+            tuple: The return value, and what the function printed.
+
+        Raises:
+            TimeLimitExceeded: If the call did not finish in time.
+            Exception: Whatever the function raised.
+
+        """
+        if isinstance(module, str):
+            module = import_utils.guarded_import(module)
+        if isinstance(func, str):
+            func = getattr(module, func)
+        if timing_utils.remaining() is not None:
+            if timeout is None:
+                timeout = timing_utils.remaining()
+            timeout = min(timeout, timing_utils.remaining())
+        try:
+            return call_utils.call_with_io(func, args, kwargs, stdin=stdin,
+                                           timeout=timeout, isolate=isolate)
+        except call_utils.CallTimeout as e:
+            report = ""
+            if self.profile_feedback and not isolate:
+                report = self._profileCall(func, args, kwargs, stdin)
+            raise call_utils.CallTimeout("{}\n{}{}".format(
+                e, self.describeInput(stdin), report)) from None
+
+    def assertMemoryBelow(self, max_mb, module, func, *args, msg=None,
+                          **kwargs):
+        """Assert that a call from a student module allocates less than max_mb.
+
+        Memory is measured with ``tracemalloc``, so only memory allocated
+        through Python during the call counts.  The call is stopped as soon
+        as it goes over the limit.  The peak is printed, so students see it
+        in their feedback.
+
+        Example::
+
+            table = self.assertMemoryBelow(2, 'hash_table', 'build', keys)
+
+        Args:
+            max_mb (float): The limit in megabytes.
+            module: A module, or the name of a module to import with
+                :func:`~jmu_gradescope_utils.import_utils.guarded_import`.
+            func: A function, or the name of a function in module.
+            *args: Positional arguments for the function.
+            msg (str): Error message that will be printed if the assertion fails.
+            **kwargs: Keyword arguments for the function.
+
+        Returns:
+            The return value of the call.
+
+        Raises:
+            AssertionError: If the call used too much memory.
+
+        """
+        if isinstance(module, str):
+            module = import_utils.guarded_import(module)
+        if isinstance(func, str):
+            func = getattr(module, func)
+        limit_kb = max_mb * 1024
+        name = getattr(func, '__name__', 'The function')
+        try:
+            value, peak_kb = memory_utils.measure_call(func, args, kwargs,
+                                                       limit_kb=limit_kb)
+        except memory_utils.MemoryLimitExceeded as e:
+            self.fail(self._formatMessage(msg, str(e)))
+        print("Peak memory allocated by {}(): {} (limit {})".format(
+            name, memory_utils.format_kb(peak_kb),
+            memory_utils.format_kb(limit_kb)))
+        if peak_kb > limit_kb:
+            self.fail(self._formatMessage(msg, "{}() allocated {}, more than {}.".format(
+                name, memory_utils.format_kb(peak_kb),
+                memory_utils.format_kb(limit_kb))))
+        return value
+
+    def assertScriptMemoryBelow(self, filename, string_in, max_mb,
+                                variables=None, args="", msg=None,
+                                from_file=False):
+        """Assert that a script's peak memory use is below max_mb.
+
+        The script's peak resident memory is measured, less what a Python
+        interpreter that does nothing needs.  The script's address space is
+        capped well above the limit so that a script that keeps allocating
+        fails quickly.  The peak is printed, so students see it in their
+        feedback.
+
+        Args:
+            filename (str): The name of the Python file to test.
+            string_in (str): A string that will be fed to stdin for the script.
+            max_mb (float): The limit in megabytes.
+            variables (dict): Variable substitutions, as for getScriptOutput.
+            args (str): Command line arguments that will be passed to the script.
+            msg (str): Error message that will be printed if the assertion fails.
+            from_file (bool): Interpret string_in as a file name in the
+                scaffolding folder.
+
+        Returns:
+            str: The script's output.
+
+        Raises:
+            AssertionError: If the script used too much memory or failed.
+
+        """
+        limit_kb = max_mb * 1024
+        with _substituted_script(filename, variables):
+            command = utils.script_command(filename)
+            command.extend(args.split())
+            if from_file:
+                with open(utils.full_source_path(string_in), 'rb') as stdin:
+                    run = memory_utils.run_script(command, stdin,
+                                                  cwd=utils.full_source_path(),
+                                                  timeout=timing_utils.remaining(),
+                                                  limit_kb=limit_kb)
+            else:
+                run = memory_utils.run_script(command, string_in.encode(),
+                                              cwd=utils.full_source_path(),
+                                              timeout=timing_utils.remaining(),
+                                              limit_kb=limit_kb)
+        described = self.describeInput(string_in, from_file)
+        if run.timed_out:
+            raise timing_utils.TimeLimitExceeded(
+                "{} did not finish within the autograder time limit.\n"
+                "{}".format(filename, described))
+        stderr_text = _clean_stderr(run.stderr.decode(errors='replace'))
+        if 'MemoryError' in stderr_text:
+            self.fail(self._formatMessage(msg, "{} ran out of memory: it needed "
+                                          "far more than {}.\n{}".format(
+                                              filename, memory_utils.format_kb(limit_kb),
+                                              described)))
+        if run.returncode != 0:
+            self.fail(self._formatMessage(msg, "Error during script execution:\n"
+                                          "{}\n{}".format(stderr_text, described)))
+        if run.peak_kb is None:
+            print("Memory use of {} can't be measured on this "
+                  "platform.".format(filename))
+            return run.stdout.decode()
+        print("Peak memory used by {}: {} (limit {})".format(
+            filename, memory_utils.format_kb(run.peak_kb),
+            memory_utils.format_kb(limit_kb)))
+        if run.peak_kb > limit_kb:
+            self.fail(self._formatMessage(msg, "{} used {}, more than {}.\n{}".format(
+                filename, memory_utils.format_kb(run.peak_kb),
+                memory_utils.format_kb(limit_kb), described)))
+        return run.stdout.decode()
+
+    def assertRunsWithin(self, seconds, module, func, *args, stdin="",
+                         msg=None, **kwargs):
+        """Assert that a call from a student module takes at most seconds.
+
+        The call runs as with :meth:`callWithIO` and is stopped when it
+        runs out of time, or when the test does.  Its running time is printed, so students see it
+        in their feedback.  If the test class sets ``profile_feedback``, a
+        call that is too slow is made again under ``cProfile`` and the
+        failure message shows where it spent its time.
+
+        Args:
+            seconds (float): The time limit for the call.
+            module: A module, or the name of a module to import with
+                :func:`~jmu_gradescope_utils.import_utils.guarded_import`.
+            func: A function, or the name of a function in module.
+            *args: Positional arguments for the function.
+            stdin (str): Text the function reads from ``sys.stdin``.
+            msg (str): Error message that will be printed if the assertion fails.
+            **kwargs: Keyword arguments for the function.
+
+        Returns:
+            The return value of the call.
+
+        Raises:
+            AssertionError: If the call took too long.
+
+        """
+        if isinstance(module, str):
+            module = import_utils.guarded_import(module)
+        if isinstance(func, str):
+            func = getattr(module, func)
+        name = getattr(func, '__name__', 'The function')
+        # The call never gets more than the time left for the test.
+        timeout = seconds
+        if timing_utils.remaining() is not None:
+            timeout = min(seconds, timing_utils.remaining())
+        message = None
+        start = time.perf_counter()
+        try:
+            value, _ = call_utils.call_with_io(func, args, kwargs, stdin=stdin,
+                                               timeout=timeout)
+        except call_utils.CallTimeout:
+            if timeout < seconds:
+                message = ("{}() did not finish within the autograder time "
+                           "limit.".format(name))
+            else:
+                message = "{}() did not finish within {:.2f} seconds.".format(
+                    name, seconds)
+        else:
+            elapsed = time.perf_counter() - start
+            print("{}() took {:.3f} seconds (limit {:.2f}).".format(
+                name, elapsed, seconds))
+            if elapsed > seconds:
+                message = "{}() took {:.3f} seconds, more than {:.2f}.".format(
+                    name, elapsed, seconds)
+        if message is not None:
+            if self.profile_feedback:
+                message += self._profileCall(func, args, kwargs, stdin)
+            if msg is not None:
+                message += "\n" + msg
+            self.fail(message)
+        return value
+
+    def _assertGrowth(self, what, sizes, times, allowed, tolerance, msg,
+                      profile=None):
+        from . import complexity_utils
+        exponents = complexity_utils.growth_exponents(sizes, times)
+        observed = complexity_utils.observed_class(exponents, tolerance)
+        table = complexity_utils.format_table(sizes, times, allowed)
+        described = "O({})".format(observed) if observed else "faster than O(n^3)"
+        print("Running times of {} (growth looks like {}):\n{}".format(
+            what, described, table))
+        if exponents[allowed] > tolerance:
+            message = ("The running time of {} grows like {}, faster than the "
+                       "allowed O({}).\n\n{}".format(what, described, allowed,
+                                                     table))
+            if profile is not None:
+                message += profile()
+            if msg is not None:
+                message += "\n" + msg
+            self.fail(message)
+
+    @perf_utils.instrumented
+    def assertComplexity(self, module, func, make_args, sizes, allowed,
+                         repeats=None, warmup=None, tolerance=None, msg=None):
+        """Assert that a student function's running time grows no faster
+        than a complexity class.
+
+        The function is timed at each input size and the growth of the
+        times is compared with the allowed class (see
+        :mod:`jmu_gradescope_utils.complexity_utils`).  A table of the
+        timings is printed, and included in the failure message.  If the
+        test class sets ``profile_feedback``, the function is run once more
+        under the profiler at the largest size, for at most
+        ``profile_utils.PROFILE_TIME`` seconds, when the assertion fails, and
+        the failure message also shows where that call spent its time.
+
+        Example::
+
+            self.assertComplexity('sorts', 'merge_sort',
+                                  lambda n: ([random.random() for _ in range(n)],),
+                                  [1000, 2000, 4000, 8000, 16000], 'n log n')
+
+        Args:
+            module: A module (for example one loaded by
+                ``run_with_substitution``), or the name of a module to import
+                with :func:`~jmu_gradescope_utils.import_utils.guarded_import`.
+            func: A function, or the name of a function in module.
+            make_args (func): Maps a size n to a tuple of arguments for the
+                function (any other value is passed as the only argument).
+                It is called for every timed call, so the function may change
+                its arguments.
+            sizes (list): Input sizes, best spread over a factor of 10 or
+                more.
+            allowed (str): The allowed class, for example ``'n'`` or
+                ``'O(n log n)'``.
+            repeats (int): Timed samples per size (default
+                ``complexity_utils.REPEATS``).
+            warmup (int): Untimed calls per size (default
+                ``complexity_utils.WARMUP``).
+            tolerance (float): How much faster than the allowed class, as a
+                power of n, the time may appear to grow (default
+                ``complexity_utils.TOLERANCE``).
+            msg (str): Error message that will be printed if the assertion fails.
+
+        Raises:
+            AssertionError: If the time grows faster than the allowed class.
+            ValueError: If allowed is not a known class, or there are fewer
+                than two different positive sizes.
+
+        """
+        from . import complexity_utils
+        allowed = complexity_utils.class_name(allowed)
+        complexity_utils.check_sizes(sizes)
+        repeats = complexity_utils.REPEATS if repeats is None else repeats
+        warmup = complexity_utils.WARMUP if warmup is None else warmup
+        tolerance = complexity_utils.TOLERANCE if tolerance is None else tolerance
+        if isinstance(module, str):
+            module = import_utils.guarded_import(module)
+        if isinstance(func, str):
+            func = getattr(module, func)
+
+        def make(n):
+            made = make_args(n)
+            return made if isinstance(made, tuple) else (made,)
+
+        def profile():
+            return self._profileCall(func, make(sizes[-1]), {})
+
+        times = complexity_utils.measure(lambda args: func(*args), make,
+                                         sizes, repeats=repeats, warmup=warmup)
+        self._assertGrowth("{}()".format(getattr(func, '__name__', 'the function')),
+                           sizes, times, allowed, tolerance, msg,
+                           profile=profile if self.profile_feedback else None)
+
+    @perf_utils.instrumented
+    def assertScriptComplexity(self, filename, make_input, sizes, allowed,
+                               args="", repeats=None, warmup=None,
+                               tolerance=None, msg=None):
+        """Assert that a script's running time grows no faster than a
+        complexity class.
+
+        Like :meth:`assertComplexity`, but times a script on the input
+        strings made by make_input.  The script runs in a long-lived worker
+        process (see :mod:`jmu_gradescope_utils.batch_utils`), so the times
+        don't include starting Python.  They do include passing the input
+        to the worker, which grows linearly with its length.
+
+        Args:
+            filename (str): The name of the Python file to test.
+            make_input (func): Maps a size n to an input string.
+            sizes (list): Input sizes.
+            allowed (str): The allowed class, for example ``'n'``.
+            args (str): Command line arguments that will be passed to the script.
+            repeats (int): Timed samples per size (default
+                ``complexity_utils.REPEATS``).
+            warmup (int): Untimed runs per size (default
+                ``complexity_utils.WARMUP``).
+            tolerance (float): How much faster than the allowed class, as a
+                power of n, the time may appear to grow (default
+                ``complexity_utils.TOLERANCE``).
+            msg (str): Error message that will be printed if the assertion fails.
+
+        Raises:
+            AssertionError: If the time grows faster than the allowed class,
+                or the script fails.
+            ValueError: If allowed is not a known class, or there are fewer
+                than two different positive sizes.
+
+        """
+        from . import complexity_utils
+        allowed = complexity_utils.class_name(allowed)
+        complexity_utils.check_sizes(sizes)
+        repeats = complexity_utils.REPEATS if repeats is None else repeats
+        warmup = complexity_utils.WARMUP if warmup is None else warmup
+        tolerance = complexity_utils.TOLERANCE if tolerance is None else tolerance
+        failure = []
+
+        with batch_utils.ScriptWorker(filename, args) as worker, \
+                batch_utils.DeadlineGuard(worker) as guard:
+
+            def run(text):
+                _, error = worker.run([text])[0]
+                if error is not None and len(failure) == 0:
+                    failure.append((text, error))
+
+            try:
+                times = complexity_utils.measure(run, make_input, sizes,
+                                                 repeats=repeats, warmup=warmup)
+            except (RuntimeError, OSError):
+                if guard.timed_out.is_set():
+                    raise timing_utils.TimeLimitExceeded(
+                        "{} did not finish within the autograder time "
+                        "limit.".format(filename))
+                raise
+        if len(failure) > 0:
+            text, error = failure[0]
+            self.fail("Error during script execution:\n{}\n{}".format(
+                error, self.describeInput(text)))
+        self._assertGrowth(filename, sizes, times, allowed, tolerance, msg)
+
     def run_with_substitution(self, filename, variables, func):
         """substitute variable values, then load a module and execute the given function `func`"""
         _JmuTestCase.module_count = _JmuTestCase.module_count + 1
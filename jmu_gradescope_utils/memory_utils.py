@@ -0,0 +1,271 @@
+"""Measure, and limit, the memory used by student code.
+
+Two kinds of measurement are available:
+
+* :func:`measure_call` calls a function in the grading process with
+  ``tracemalloc`` running and reports the largest amount of memory Python
+  had allocated at once during the call, not counting what was allocated
+  before it started.  A watchdog thread stops the call with
+  :class:`MemoryLimitExceeded` soon after it goes over its limit, so a
+  runaway allocation can't take the grader down with it.
+* :func:`run_script` runs a script in a child process and reads the child's
+  peak resident set size from ``os.wait4``.  The memory a bare Python
+  interpreter needs is measured once and subtracted, so limits describe
+  the script rather than the interpreter.  The child's address space is
+  capped at a multiple of the limit, so a script that keeps allocating
+  fails with a ``MemoryError`` instead of exhausting the machine.
+
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Not available on Windows.
+    resource = None
+
+from . import call_utils
+from . import perf_utils
+
+# Seconds between the watchdog's checks of traced memory.
+WATCH_INTERVAL = 0.01
+
+# A script's address space is capped at this many times its memory limit,
+# plus ADDRESS_SPACE_HEADROOM, so that only scripts that are clearly over
+# the limit run into it.
+ADDRESS_SPACE_FACTOR = 2
+
+# Bytes of address space allowed on top of the scaled limit, for the
+# interpreter itself.
+ADDRESS_SPACE_HEADROOM = 256 * 1024 * 1024
+
+# Peak RSS in kilobytes of a Python interpreter that does nothing.
+_baseline_kb = None
+
+
+class MemoryLimitExceeded(AssertionError):
+    """Raised in a call that allocates more memory than it is allowed."""
+
+
+def format_kb(kb):
+    """Format a number of kilobytes for a student."""
+    if kb >= 1024:
+        return f"{kb / 1024:.1f} MB"
+    return f"{kb:.0f} KB"
+
+
+def _maxrss_kb(usage):
+    # ru_maxrss is in bytes on macOS and kilobytes everywhere else.
+    if sys.platform == 'darwin':
+        return usage.ru_maxrss // 1024
+    return usage.ru_maxrss
+
+
+class _Watchdog:
+    """Stop the calling thread once traced memory goes over a limit."""
+
+    def __init__(self, limit_bytes, start_bytes):
+        self.limit_bytes = limit_bytes
+        self.start_bytes = start_bytes
+        self.target = threading.current_thread()
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        self.fired = False
+        self.thread = threading.Thread(target=self._watch, daemon=True)
+
+    def _watch(self):
+        while not self.done.wait(WATCH_INTERVAL):
+            current, _ = tracemalloc.get_traced_memory()
+            if current - self.start_bytes > self.limit_bytes:
+                with self.lock:
+                    if not self.done.is_set():
+                        self.fired = True
+                        call_utils._stop_thread(self.target, MemoryLimitExceeded)
+                return
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        with self.lock:
+            self.done.set()
+        self.thread.join()
+
+
+def measure_call(func, args=(), kwargs=None, limit_kb=None):
+    """Call func and measure the memory it allocates.
+
+    If ``tracemalloc`` is already running it is left running; its peak is
+    reset for the call.
+
+    Args:
+        func: The function to call.
+        args (tuple): Positional arguments.
+        kwargs (dict): Keyword arguments.
+        limit_kb (float): Stop the call with ``MemoryLimitExceeded`` once
+            it has allocated more than this many kilobytes.  The check runs
+            every ``WATCH_INTERVAL`` seconds, so the call may briefly go
+            further over.
+
+    Returns:
+        tuple: The return value and the peak number of kilobytes allocated
+        during the call.
+
+    Raises:
+        MemoryLimitExceeded: If the call went over limit_kb.  The peak
+            measured so far is in the exception's ``peak_kb`` attribute.
+        Exception: Whatever the function raised.
+
+    """
+    kwargs = kwargs or {}
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    start_bytes, _ = tracemalloc.get_traced_memory()
+    peak_kb = 0
+    watchdog = None
+    if limit_kb is not None:
+        watchdog = _Watchdog(limit_kb * 1024, start_bytes)
+    try:
+        try:
+            if watchdog is None:
+                value = func(*args, **kwargs)
+            else:
+                with watchdog:
+                    value = func(*args, **kwargs)
+        finally:
+            _, peak_bytes = tracemalloc.get_traced_memory()
+            if not was_tracing:
+                tracemalloc.stop()
+            peak_kb = max(0, peak_bytes - start_bytes) / 1024
+            perf_utils.record_memory(peak_kb)
+    except BaseException:
+        # The student's code may have caught the watchdog's exception.
+        if watchdog is not None and watchdog.fired:
+            error = MemoryLimitExceeded(
+                f"{getattr(func, '__name__', 'The function')}() was stopped "
+                f"after allocating more than {format_kb(limit_kb)}.")
+            error.peak_kb = peak_kb
+            raise error from None
+        raise
+    return value, peak_kb
+
+
+def _address_space_limiter(limit_bytes):
+    def limit():
+        resource.setrlimit(resource.RLIMIT_AS, (limit_bytes, limit_bytes))
+    return limit
+
+
+class ScriptRun:
+    """The outcome of :func:`run_script`.
+
+    Attributes:
+        stdout (bytes): What the script wrote to stdout.
+        stderr (bytes): What the script wrote to stderr.
+        returncode (int): The exit code (negative for a signal).
+        peak_kb (float): Peak resident memory above the interpreter's
+            baseline, in kilobytes.  None where ``os.wait4`` is not
+            available.
+        timed_out (bool): True if the script was killed at its deadline.
+
+    """
+
+    def __init__(self, stdout, stderr, returncode, peak_kb, timed_out):
+        self.stdout = stdout
+        self.stderr = stderr
+        self.returncode = returncode
+        self.peak_kb = peak_kb
+        self.timed_out = timed_out
+
+
+def _wait(proc):
+    """Wait for proc and return its peak RSS in kilobytes (or None)."""
+    if not hasattr(os, 'wait4'):
+        proc.wait()
+        return None
+    _, status, usage = os.wait4(proc.pid, 0)
+    # Popen must not wait for the process again.
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    return _maxrss_kb(usage)
+
+
+def _run(command, stdin, cwd, timeout, limit_bytes):
+    preexec_fn = None
+    if limit_bytes is not None and resource is not None:
+        preexec_fn = _address_space_limiter(limit_bytes)
+    with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err:
+        proc = subprocess.Popen(command, cwd=cwd, stdin=stdin, stdout=out,
+                                stderr=err, preexec_fn=preexec_fn)
+        perf_utils.count_child_process()
+        timer = None
+        expired = threading.Event()
+        if timeout is not None:
+            def expire():
+                expired.set()
+                proc.kill()
+            timer = threading.Timer(timeout, expire)
+            timer.start()
+        try:
+            peak_kb = _wait(proc)
+        except BaseException:
+            proc.kill()
+            proc.wait()
+            raise
+        finally:
+            if timer is not None:
+                timer.cancel()
+        out.seek(0)
+        err.seek(0)
+        return ScriptRun(out.read(), err.read(), proc.returncode, peak_kb,
+                         expired.is_set())
+
+
+def baseline_kb():
+    """Return the peak RSS of a Python interpreter that does nothing."""
+    global _baseline_kb
+    if _baseline_kb is None:
+        run = _run([sys.executable, '-c', 'pass'], subprocess.DEVNULL, None,
+                   None, None)
+        _baseline_kb = run.peak_kb or 0
+    return _baseline_kb
+
+
+@perf_utils.instrumented
+def run_script(command, stdin=b"", cwd=None, timeout=None, limit_kb=None):
+    """Run a command and measure the peak memory of the process.
+
+    Args:
+        command (list): The command, e.g. from ``utils.script_command``.
+        stdin: The input as bytes, or an open binary file.
+        cwd (str): Working directory for the command.
+        timeout (float): Seconds after which the process is killed.
+        limit_kb (float): Memory limit.  The process's address space is
+            capped at ``ADDRESS_SPACE_FACTOR`` times this, plus
+            ``ADDRESS_SPACE_HEADROOM``.
+
+    Returns:
+        ScriptRun: The output, exit code and peak memory of the run.
+
+    """
+    limit_bytes = None
+    if limit_kb is not None:
+        limit_bytes = int(limit_kb * 1024 * ADDRESS_SPACE_FACTOR
+                          + ADDRESS_SPACE_HEADROOM)
+    if isinstance(stdin, bytes):
+        with tempfile.TemporaryFile() as stdin_file:
+            stdin_file.write(stdin)
+            stdin_file.seek(0)
+            run = _run(command, stdin_file, cwd, timeout, limit_bytes)
+    else:
+        run = _run(command, stdin, cwd, timeout, limit_bytes)
+    if run.peak_kb is not None:
+        run.peak_kb = max(0, run.peak_kb - baseline_kb())
+        perf_utils.record_memory(run.peak_kb)
+    return run
@@ -0,0 +1,173 @@
+"""Per-test performance measurements.
+
+The test runner calls :func:`start_test` and :func:`stop_test` around each
+test method.  In between, the expensive library functions
+(``getScriptOutput``, ``run_flake8``, ``run_student_tests`` and
+``check_coverage``) record how often they were called and how long they took.
+The resulting dictionary is stored in the ``extra_data`` of the test's
+``results.json`` entry, which Gradescope does not show to students.
+
+"""
+import functools
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Not available on Windows.
+    resource = None
+
+_current = None
+
+
+def _maxrss_kb(usage):
+    # ru_maxrss is in bytes on macOS and kilobytes everywhere else.
+    if sys.platform == 'darwin':
+        return usage.ru_maxrss // 1024
+    return usage.ru_maxrss
+
+
+class TestMeasurement:
+    """Resource usage accumulated while a single test method runs."""
+
+    def __init__(self):
+        self.calls = {}
+        self.child_processes = 0
+        self.memory_peak_kb = None
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        if resource is not None:
+            self._children = resource.getrusage(resource.RUSAGE_CHILDREN)
+            self._maxrss_kb = _maxrss_kb(resource.getrusage(resource.RUSAGE_SELF))
+
+    def add_call(self, name, seconds):
+        count, total = self.calls.get(name, (0, 0.0))
+        self.calls[name] = (count + 1, total + seconds)
+
+    def finish(self):
+        """Return the measurements as a JSON friendly dictionary.
+
+        ``rss_increase_kb`` is how much the test raised the peak resident
+        memory of the grading process; it is 0 for a test that stayed below
+        the peak of an earlier one.  ``children_max_rss_kb`` is the peak
+        resident memory of the largest child process finished so far in the
+        whole run, not just in this test.  ``memory_peak_kb`` is
+        only present if the test measured the memory used by student code
+        (see :mod:`jmu_gradescope_utils.memory_utils`); it is the largest
+        of those measurements.
+
+        """
+        data = {
+            "wall_time": round(time.perf_counter() - self._wall, 4),
+            "cpu_time": round(time.process_time() - self._cpu, 4),
+            "child_processes": self.child_processes,
+        }
+        if resource is not None:
+            children = resource.getrusage(resource.RUSAGE_CHILDREN)
+            child_cpu = ((children.ru_utime - self._children.ru_utime) +
+                         (children.ru_stime - self._children.ru_stime))
+            data["child_cpu_time"] = round(child_cpu, 4)
+            data["rss_increase_kb"] = max(0, _maxrss_kb(
+                resource.getrusage(resource.RUSAGE_SELF)) - self._maxrss_kb)
+            data["children_max_rss_kb"] = _maxrss_kb(children)
+        if self.memory_peak_kb is not None:
+            data["memory_peak_kb"] = round(self.memory_peak_kb, 1)
+        data["calls"] = {name: {"count": count, "wall_time": round(total, 4)}
+                         for name, (count, total) in self.calls.items()}
+        return data
+
+
+def record_call(name, seconds):
+    """Record a call made on behalf of the current test, if any."""
+    if _current is not None:
+        _current.add_call(name, seconds)
+
+
+def record_memory(peak_kb):
+    """Record the peak memory of code measured for the current test, if any."""
+    if _current is not None:
+        _current.memory_peak_kb = max(peak_kb, _current.memory_peak_kb or 0)
+
+
+def start_test():
+    """Begin measuring a test method."""
+    global _current
+    _current = TestMeasurement()
+
+
+def stop_test():
+    """Finish measuring the current test method.
+
+    Returns:
+        dict: The measurements, or None if no test was being measured.
+
+    """
+    global _current
+    measurement, _current = _current, None
+    if measurement is None:
+        return None
+    return measurement.finish()
+
+
+def count_child_process():
+    """Record that a child process was started on behalf of the current test."""
+    if _current is not None:
+        _current.child_processes += 1
+
+
+def instrumented(func):
+    """Decorator that records the call count and wall time of func."""
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            if _current is not None:
+                _current.add_call(func.__name__, time.perf_counter() - start)
+
+    return wrapper
+
+
+def format_report(results, limit=None):
+    """Format the performance data in a results dictionary as a table.
+
+    Tests are sorted from slowest to fastest.  The memory column is the
+    increase in the grading process's peak memory during each test.
+
+    Args:
+        results (dict): The contents of a ``results.json`` file.
+        limit (int): Maximum number of tests to show (default all).  The
+            total line always covers every test.
+
+    Returns:
+        str: The formatted table, or an empty string if the results do
+        not contain performance data.
+
+    """
+    rows = []
+    for test in results.get("tests", []):
+        perf = test.get("extra_data", {}).get("performance")
+        if perf is not None:
+            rows.append((test.get("name", "?"), perf))
+    if len(rows) == 0:
+        return ""
+    rows.sort(key=lambda row: row[1]["wall_time"], reverse=True)
+
+    lines = [f"{'Test':<40} {'Wall s':>8} {'CPU s':>8} {'Child s':>8} "
+             f"{'Procs':>5} {'+RSS MB':>7}"]
+    total_wall = 0.0
+    for name, perf in rows:
+        total_wall += perf["wall_time"]
+        rss = perf.get("rss_increase_kb", 0)
+        lines.append(f"{name[:40]:<40} {perf['wall_time']:>8.3f} "
+                     f"{perf['cpu_time']:>8.3f} "
+                     f"{perf.get('child_cpu_time', 0.0):>8.3f} "
+                     f"{perf['child_processes']:>5} {rss / 1024:>7.1f}")
+    label = 'Total'
+    if limit is not None and limit < len(rows):
+        lines = lines[:limit + 1]
+        label = f"Total (all {len(rows)} tests)"
+    lines.append(f"{label:<40} {total_wall:>8.3f}")
+    return "\n".join(lines)
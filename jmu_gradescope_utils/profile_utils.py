@@ -0,0 +1,219 @@
+"""Show students where the time went when their code is too slow.
+
+Profiling is turned on for a test class with ``profile_feedback = True``
+(see ``JmuTestCase``).  Student code is still run and timed without the
+profiler, which would slow it down.  When it runs out of time, or fails a
+performance assertion, it is run once more under ``cProfile`` for at most
+``PROFILE_TIME`` seconds, and the failure message ends with a table of the
+functions in the student's files that took the most time::
+
+    Where the time went (your code only):
+      cumulative s     own s     calls  function
+             2.104     2.011         1  sorts.py:12 bubble_sort
+             0.093     0.093     40000  sorts.py:3 swap
+
+* Functions called in the grading process are wrapped in
+  :class:`ProfiledCall`.
+* Scripts are run again by :func:`profile_script`, which starts them
+  through this module (``python -m jmu_gradescope_utils.profile_utils``)
+  with the profiler enabled.  When it stops the script with ``SIGTERM``
+  the profile is written to a file before the script exits, so it is
+  available even though the script never finished.
+
+"""
+import cProfile
+import functools
+import os
+import pstats
+import runpy
+import signal
+import subprocess
+import sys
+import tempfile
+import traceback
+
+# Functions listed in a profiling report.
+TOP_FUNCTIONS = 10
+
+# Seconds code that failed a time limit is run again under the profiler.
+# Short enough to fit in the grace period before the test's alarm.
+PROFILE_TIME = 0.5
+
+# Seconds a script stopped with SIGTERM is given to write its profile.
+DUMP_GRACE = 0.25
+
+
+def is_student_file(filename, source_path):
+    """Return True for files in the source folder other than the tests."""
+    if filename.startswith(('<', '~')):
+        # Frozen modules, code compiled from strings and built-ins.
+        return False
+    path = os.path.abspath(os.path.join(source_path, filename))
+    return (path.startswith(source_path + os.sep)
+            and not path.startswith(os.path.join(source_path, 'tests') + os.sep))
+
+
+def format_report(stats, source_path, top=TOP_FUNCTIONS):
+    """Describe the most time-consuming student functions in a profile.
+
+    Args:
+        stats (pstats.Stats): The profile.
+        source_path (str): The source folder; only functions defined in it
+            (outside its tests folder) are listed.
+        top (int): Most functions listed.
+
+    Returns:
+        str: The report, or an empty string if no student function was
+        profiled.
+
+    """
+    rows = []
+    for (filename, line, name), (_, calls, own, cumulative, _) in stats.stats.items():
+        if is_student_file(filename, source_path):
+            shown = os.path.relpath(os.path.join(source_path, filename), source_path)
+            rows.append((cumulative, own, calls, f"{shown}:{line} {name}"))
+    if len(rows) == 0:
+        return ""
+    rows.sort(reverse=True)
+    lines = ["Where the time went (your code only):",
+             f"  {'cumulative s':>12}  {'own s':>8}  {'calls':>8}  function"]
+    for cumulative, own, calls, where in rows[:top]:
+        lines.append(f"  {cumulative:>12.3f}  {own:>8.3f}  {calls:>8}  {where}")
+    return "\n".join(lines)
+
+
+def load_report(stats_path, source_path, top=TOP_FUNCTIONS):
+    """Format the profile a script wrote to stats_path, then remove the file.
+
+    Returns:
+        str: The report, or an empty string if the script wrote no profile.
+
+    """
+    try:
+        if os.path.getsize(stats_path) == 0:
+            return ""
+        return format_report(pstats.Stats(stats_path), source_path, top)
+    except (OSError, EOFError, TypeError, ValueError):
+        return ""
+    finally:
+        if os.path.exists(stats_path):
+            os.remove(stats_path)
+
+
+class ProfiledCall:
+    """Wrap a function so that its calls run under ``cProfile``.
+
+    The profile accumulates over all calls, including one stopped by an
+    exception raised from another thread when it ran out of time.
+    """
+
+    def __init__(self, func):
+        functools.update_wrapper(self, func)
+        self.func = func
+        self.profiler = cProfile.Profile()
+
+    def __call__(self, *args, **kwargs):
+        self.profiler.enable()
+        try:
+            return self.func(*args, **kwargs)
+        finally:
+            self.profiler.disable()
+
+    def report(self, source_path, top=TOP_FUNCTIONS):
+        """Format the profile; see :func:`format_report`."""
+        try:
+            stats = pstats.Stats(self.profiler)
+        except TypeError:
+            # Nothing was recorded.
+            return ""
+        return format_report(stats, source_path, top)
+
+
+def profiled_command(command, stats_path):
+    """Turn a command from ``utils.script_command`` into one that profiles
+    the script and writes the profile to stats_path when it exits or is
+    sent SIGTERM."""
+    return [command[0], '-m', 'jmu_gradescope_utils.profile_utils',
+            stats_path] + command[1:]
+
+
+def profile_script(command, source_path, stdin=b"", cwd=None,
+                   seconds=PROFILE_TIME, top=TOP_FUNCTIONS):
+    """Run a script under the profiler for at most seconds and describe
+    where its time went.
+
+    Args:
+        command (list): The command, from ``utils.script_command``.
+        source_path (str): The source folder; see :func:`format_report`.
+        stdin: The input as bytes, or an open binary file.
+        cwd (str): Working directory for the command.
+        seconds (float): Seconds after which the script is stopped.
+        top (int): Most functions listed.
+
+    Returns:
+        str: The report, or an empty string if nothing was profiled.
+
+    """
+    stats_fd, stats_path = tempfile.mkstemp(suffix='.prof')
+    os.close(stats_fd)
+    string_in = stdin if isinstance(stdin, bytes) else None
+    try:
+        proc = subprocess.Popen(profiled_command(command, stats_path), cwd=cwd,
+                                stdin=subprocess.PIPE if string_in is not None else stdin,
+                                stdout=subprocess.DEVNULL,
+                                stderr=subprocess.DEVNULL)
+        try:
+            proc.communicate(input=string_in, timeout=seconds)
+        except subprocess.TimeoutExpired:
+            proc.terminate()
+            try:
+                proc.communicate(timeout=DUMP_GRACE)
+            except subprocess.TimeoutExpired:
+                pass
+        finally:
+            proc.kill()
+            proc.wait()
+    except BaseException:
+        os.remove(stats_path)
+        raise
+    return load_report(stats_path, source_path, top)
+
+
+def _run_script(stats_path, target):
+    """Entry point: run a script (``-m name`` or a path) under the profiler."""
+    profiler = cProfile.Profile()
+
+    def dump_and_exit(signum, frame):
+        profiler.disable()
+        profiler.dump_stats(stats_path)
+        try:
+            sys.stdout.flush()
+        finally:
+            os._exit(128 + signum)
+
+    signal.signal(signal.SIGTERM, dump_and_exit)
+    if target[0] == '-m':
+        run = functools.partial(runpy.run_module, target[1],
+                                run_name='__main__', alter_sys=True)
+        sys.argv = [target[1]] + target[2:]
+    else:
+        run = functools.partial(runpy.run_path, target[0], run_name='__main__')
+        sys.argv = list(target)
+        sys.path[0] = os.path.dirname(os.path.abspath(target[0]))
+    profiler.enable()
+    try:
+        run()
+    except SystemExit:
+        raise
+    except BaseException as e:
+        # Leave out this function's frame; utils.strip_runpy_frames removes
+        # the ones from runpy.
+        traceback.print_exception(type(e), e, e.__traceback__.tb_next)
+        sys.exit(1)
+    finally:
+        profiler.disable()
+        profiler.dump_stats(stats_path)
+
+
+if __name__ == "__main__":
+    _run_script(sys.argv[1], sys.argv[2:])
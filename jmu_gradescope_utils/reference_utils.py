@@ -0,0 +1,373 @@
+"""Expected outputs computed from a reference solution at build time.
+
+Instead of writing out the expected output of a script by hand, a test can
+declare only the input::
+
+    FILENAME = 'stats.py'
+    INPUTS = ['1 2 3\\n', '-4 0 4\\n']
+
+    class TestStats(JmuTestCase):
+
+        def test_output(self):
+            for string_in in INPUTS:
+                self.assertOutputMatchesReference(FILENAME, string_in)
+
+        def test_large_input(self):
+            self.assertOutputMatchesReference(FILENAME, 'big.txt',
+                                              from_file=True)
+
+When the zip file is built, :func:`find_runs` reads the test files (without
+importing them) to collect every such call, the reference solution in the
+``reference`` folder of the autograder is run once for each of them, in
+parallel, and the outputs are stored under ``reference_outputs/`` in the
+zip file.  The reference solution itself is not included.  At grading time
+the assertion compares the student's output with the stored output.
+
+To be found, the arguments that describe a run (filename, string_in,
+variables, args and from_file) must be literals, names assigned a literal
+at the top of the test file or earlier in the test method, or loop
+variables of a ``for`` loop over such a value.  Calls that can't be worked
+out are reported when the zip file is built.
+
+"""
+import ast
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from . import utils
+
+# Autograder folder holding the reference solution.  It is not added to
+# the zip file.
+REFERENCE_FOLDER = 'reference'
+
+# Folder in the zip file that holds the recorded outputs.
+OUTPUT_FOLDER = 'reference_outputs'
+
+# Name of the assertion that build_zip looks for in the test files.
+ASSERTION = 'assertOutputMatchesReference'
+
+# The positional parameters of the assertion, in order.
+PARAMETERS = ('filename', 'string_in', 'variables', 'args', 'msg', 'from_file')
+
+# Seconds the reference solution may take for a single run.
+REFERENCE_TIMEOUT = 60
+
+
+class ReferenceRun:
+    """One run of a script: what it is given on stdin and the command line.
+
+    Attributes:
+        filename (str): The script.
+        string_in (str): The input, or the name of a scaffolding file if
+            from_file is True.
+        variables (dict): Variable substitutions, as for getScriptOutput.
+        args (str): Command line arguments.
+        from_file (bool): Read the input from a scaffolding file.
+        location (str): Where the run was declared (test file and line).
+
+    """
+
+    def __init__(self, filename, string_in, variables=None, args="",
+                 from_file=False, location=''):
+        self.filename = filename
+        self.string_in = string_in
+        self.variables = variables
+        self.args = args
+        self.from_file = from_file
+        self.location = location
+
+    @property
+    def key(self):
+        return run_key(self.filename, self.string_in, self.variables,
+                       self.args, self.from_file)
+
+
+def run_key(filename, string_in, variables=None, args="", from_file=False):
+    """Return the name under which the output of a run is stored."""
+    if variables:
+        variables = sorted(variables.items())
+    description = repr((filename, string_in, variables or None, args,
+                        bool(from_file)))
+    return hashlib.sha256(description.encode()).hexdigest()[:24]
+
+
+def output_path(key):
+    """Return the location of a stored output, relative to the source folder."""
+    return OUTPUT_FOLDER + '/' + key + '.txt'
+
+
+class _Unknown(Exception):
+    """Raised for an expression whose value can't be worked out statically."""
+
+
+def _evaluate(node, names):
+    """Evaluate a literal expression, looking names up in names."""
+    if isinstance(node, ast.Constant):
+        return node.value
+    if isinstance(node, ast.Name):
+        if node.id in names:
+            return names[node.id]
+        raise _Unknown(node.id)
+    if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+        items = [_evaluate(item, names) for item in node.elts]
+        return {ast.List: list, ast.Tuple: tuple, ast.Set: set}[type(node)](items)
+    if isinstance(node, ast.Dict) and None not in node.keys:
+        return {_evaluate(key, names): _evaluate(value, names)
+                for key, value in zip(node.keys, node.values)}
+    if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.Add, ast.Mult)):
+        left = _evaluate(node.left, names)
+        right = _evaluate(node.right, names)
+        return left + right if isinstance(node.op, ast.Add) else left * right
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        return -_evaluate(node.operand, names)
+    raise _Unknown(ast.dump(node))
+
+
+def _assign(statement, names):
+    """Record (or forget) the names bound by an assignment."""
+    targets = [target for target in statement.targets
+               if isinstance(target, ast.Name)]
+    try:
+        value = _evaluate(statement.value, names)
+    except _Unknown:
+        for target in targets:
+            names.pop(target.id, None)
+        return
+    for target in targets:
+        names[target.id] = value
+
+
+def _bind(target, value, names):
+    """Bind a loop target (a name or a tuple of names) to value."""
+    if isinstance(target, ast.Name):
+        names[target.id] = value
+    elif (isinstance(target, (ast.Tuple, ast.List))
+          and isinstance(value, (tuple, list)) and len(value) == len(target.elts)):
+        for element, item in zip(target.elts, value):
+            _bind(element, item, names)
+    else:
+        for node in ast.walk(target):
+            if isinstance(node, ast.Name):
+                names.pop(node.id, None)
+
+
+def _calls(node):
+    """Yield the assertion calls in an expression or simple statement."""
+    for child in ast.walk(node):
+        if (isinstance(child, ast.Call) and isinstance(child.func, ast.Attribute)
+                and child.func.attr == ASSERTION):
+            yield child
+
+
+def _make_run(call, names, location):
+    values = {}
+    for parameter, node in zip(PARAMETERS, call.args):
+        values[parameter] = node
+    for keyword in call.keywords:
+        if keyword.arg in PARAMETERS:
+            values[keyword.arg] = keyword.value
+    values.pop('msg', None)
+    if 'filename' not in values or 'string_in' not in values:
+        raise _Unknown('missing arguments')
+    arguments = {parameter: _evaluate(node, names)
+                 for parameter, node in values.items()}
+    return ReferenceRun(location=location, **arguments)
+
+
+def _scan(statements, names, path, runs, problems):
+    """Collect the runs declared in a list of statements."""
+    for statement in statements:
+        if isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef,
+                                  ast.ClassDef)):
+            # Each method starts from the module level names.
+            _scan(statement.body, dict(names), path, runs, problems)
+        elif isinstance(statement, (ast.For, ast.AsyncFor)):
+            try:
+                values = list(_evaluate(statement.iter, names))
+            except (_Unknown, TypeError):
+                # Scan the body once, without the loop variables.
+                inner = dict(names)
+                for target in ast.walk(statement.target):
+                    if isinstance(target, ast.Name):
+                        inner.pop(target.id, None)
+                _scan(statement.body, inner, path, runs, problems)
+                values = []
+            for value in values:
+                inner = dict(names)
+                _bind(statement.target, value, inner)
+                _scan(statement.body, inner, path, runs, problems)
+            _scan(statement.orelse, names, path, runs, problems)
+        elif isinstance(statement, (ast.If, ast.While, ast.With, ast.AsyncWith,
+                                    ast.Try)):
+            for field in ('body', 'orelse', 'finalbody'):
+                _scan(getattr(statement, field, []), names, path, runs, problems)
+            for handler in getattr(statement, 'handlers', []):
+                _scan(handler.body, names, path, runs, problems)
+        else:
+            for call in _calls(statement):
+                location = f"{path.name}:{call.lineno}"
+                try:
+                    runs.append(_make_run(call, names, location))
+                except (_Unknown, TypeError):
+                    problems.append(location)
+            if isinstance(statement, ast.Assign):
+                _assign(statement, names)
+
+
+def find_runs(test_files):
+    """Find the reference runs declared in test files.
+
+    Args:
+        test_files (list): Paths of the test files.
+
+    Returns:
+        tuple: A list of the distinct ReferenceRuns, and a list of the
+        locations (``file:line``) of assertion calls whose arguments could
+        not be worked out.
+
+    """
+    runs = []
+    problems = []
+    for path in test_files:
+        path = Path(path)
+        if path.suffix != '.py':
+            continue
+        tree = ast.parse(path.read_bytes(), str(path))
+        _scan(tree.body, {}, path, runs, problems)
+    distinct = {}
+    for run in runs:
+        distinct.setdefault(run.key, run)
+    return list(distinct.values()), problems
+
+
+class ReferenceFailed(Exception):
+    """The reference solution failed for one of the declared runs."""
+
+
+def run_reference(run, work_folder):
+    """Run the reference solution once and return what it printed.
+
+    Args:
+        run (ReferenceRun): The run.
+        work_folder (Path): A folder holding the scaffolding and the
+            reference solution.  Runs with variable substitutions get a
+            private copy of it.
+
+    Returns:
+        bytes: The output on stdout.
+
+    Raises:
+        ReferenceFailed: If the script fails, prints to stderr or runs
+            for longer than REFERENCE_TIMEOUT seconds.
+
+    """
+    private = None
+    try:
+        if run.variables:
+            private = Path(tempfile.mkdtemp(prefix='jmu_reference_'))
+            shutil.copytree(work_folder, private / 'work')
+            work_folder = private / 'work'
+            script = work_folder / run.filename
+            script.write_text(utils.substitute_variables(script.read_text(),
+                                                         run.variables))
+        command = [sys.executable, run.filename] + run.args.split()
+        if run.from_file:
+            with open(work_folder / run.string_in, 'rb') as stdin:
+                proc = subprocess.run(command, cwd=work_folder, stdin=stdin,
+                                      stdout=subprocess.PIPE,
+                                      stderr=subprocess.PIPE,
+                                      timeout=REFERENCE_TIMEOUT)
+        else:
+            proc = subprocess.run(command, cwd=work_folder,
+                                  input=run.string_in.encode(),
+                                  stdout=subprocess.PIPE,
+                                  stderr=subprocess.PIPE,
+                                  timeout=REFERENCE_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        raise ReferenceFailed(f"{run.location}: {run.filename} did not finish "
+                              f"within {REFERENCE_TIMEOUT} seconds")
+    except OSError as e:
+        raise ReferenceFailed(f"{run.location}: {e}")
+    finally:
+        if private is not None:
+            shutil.rmtree(private, ignore_errors=True)
+    if proc.returncode != 0 or len(proc.stderr) > 0:
+        raise ReferenceFailed(f"{run.location}: {run.filename} failed:\n"
+                              + proc.stderr.decode(errors='replace'))
+    return proc.stdout
+
+
+def add_reference_outputs(zip_file, autograder_folder, test_files,
+                          workers=None, cancel=None):
+    """Run the reference solution for the declared runs; store the outputs.
+
+    Args:
+        zip_file (zipfile.ZipFile): The zip file being built.
+        autograder_folder (str): The autograder folder.
+        test_files (list): Paths of the test files.
+        workers (int): Number of runs at a time (default: chosen by
+            ``concurrent.futures.ThreadPoolExecutor``).
+        cancel (threading.Event): Stop starting new runs when this is set.
+
+    Returns:
+        bool: False if the outputs could not all be computed.
+
+    """
+    # Only needed when building; the tests import this module too.
+    import concurrent.futures
+    runs, problems = find_runs(test_files)
+    for location in problems:
+        logging.error(f"{location}: the arguments of {ASSERTION} must be "
+                      f"literals or names assigned literals.")
+    if len(runs) == 0:
+        return len(problems) == 0
+
+    reference = Path(autograder_folder) / REFERENCE_FOLDER
+    if not reference.is_dir():
+        logging.error(f"The tests use {ASSERTION}, but there is no "
+                      f"reference solution in {reference}.")
+        return False
+
+    logging.info(f"Running the reference solution for {len(runs)} input(s)...")
+    ok = len(problems) == 0
+    with tempfile.TemporaryDirectory(prefix='jmu_reference_') as tmpdir:
+        work_folder = Path(tmpdir) / 'work'
+        scaffolding = Path(autograder_folder) / 'scaffolding'
+        if scaffolding.is_dir():
+            shutil.copytree(scaffolding, work_folder)
+        shutil.copytree(reference, work_folder, dirs_exist_ok=True)
+
+        def compute(run):
+            if cancel is not None and cancel.is_set():
+                return None
+            return run_reference(run, work_folder)
+
+        index = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [(run, pool.submit(compute, run)) for run in runs]
+            for run, future in futures:
+                try:
+                    output = future.result()
+                except ReferenceFailed as e:
+                    logging.error(str(e))
+                    ok = False
+                    continue
+                if output is None:
+                    ok = False
+                    continue
+                zip_file.writestr(output_path(run.key), output)
+                index[run.key] = {"location": run.location,
+                                  "filename": run.filename,
+                                  "args": run.args,
+                                  "from_file": run.from_file}
+    zip_file.writestr(os.path.join(OUTPUT_FOLDER, 'index.json'),
+                      json.dumps(index, indent=4))
+    logging.info(f"Added {len(index)} reference output(s) to zip file")
+    return ok
@@ -0,0 +1,410 @@
+"""Crash-safe writing of the Gradescope results.json file.
+
+``JSONTestRunner`` from ``gradescope_utils`` only writes ``results.json``
+after the entire suite has finished, so a run that is killed part way
+through (Gradescope time limit, runaway student code) leaves the student
+with nothing.  ``IncrementalJSONTestRunner`` rewrites the file after each
+test finishes.  Every intermediate file is a complete, valid document: tests
+that have not run yet are listed with a score of zero and an explanatory
+message.
+
+With ``fork_tests=True`` each ``JmuTestCase`` method runs in a child
+process forked from the runner, so a test that crashes, exits or changes
+global state can't affect the tests after it.  The child starts from a copy
+of everything the runner has already imported, so this costs far less
+than starting a new interpreter per test.
+
+"""
+import io
+import json
+import os
+import pickle
+import select
+import signal
+import tempfile
+import time
+import traceback
+import unittest
+
+from gradescope_utils.autograder_utils.json_test_runner import (
+    JSONTestResult, JSONTestRunner)
+
+from . import perf_utils
+from . import timing_utils
+
+NOT_RUN_MESSAGE = ("This test did not run because the autograder stopped "
+                   "before reaching it.")
+
+CRASH_MESSAGE = ("This test stopped the grading process unexpectedly "
+                 "(exit status {}).")
+
+FORK_ERROR_MESSAGE = ("This test could not be graded because of an error in "
+                      "the grading process:")
+
+# Seconds a forked test may run when there is no time budget, after
+# which the child is killed.
+FORK_TIMEOUT = 600
+
+FORK_TIMEOUT_MESSAGE = ("This test did not finish within the autograder time "
+                        "limit and was stopped.")
+
+
+def atomic_write(path, text):
+    """Replace the contents of a file so readers never see a partial write.
+
+    The text is written to a temporary file in the same folder which is then
+    renamed over the destination.
+
+    Args:
+        path (str): The file to write.
+        text (str): The new contents of the file.
+
+    """
+    folder = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=folder, prefix='.tmp_', suffix='.json')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def iter_tests(suite):
+    """Yield the individual test cases contained in a (nested) test suite."""
+    for test in suite:
+        if isinstance(test, unittest.TestSuite):
+            yield from iter_tests(test)
+        else:
+            yield test
+
+
+class IncrementalResultsWriter:
+    """Periodically write the partial contents of a results dictionary.
+
+    Finished test entries are JSON encoded exactly once and cached, so each
+    write only joins strings.  Writes are skipped while the time since the
+    previous write is short compared to how long that write took, which
+    keeps writing below ``max_overhead`` of the total run time even for
+    suites with many fast tests.
+
+    """
+
+    def __init__(self, path, json_data, max_overhead=0.1):
+        self.path = path
+        self.json_data = json_data
+        self.max_overhead = max_overhead
+        self._fragments = []
+        self._score = 0.0
+        self._pending = {}
+        self._start_time = time.time()
+        self._last_flush = None
+        self._last_cost = 0.0
+
+    def add_pending(self, test_id, entry):
+        """Record the entry that will be reported if test_id never finishes."""
+        self._pending[test_id] = json.dumps(entry)
+
+    def mark_finished(self, test_id):
+        """Stop reporting test_id as not run."""
+        self._pending.pop(test_id, None)
+
+    def render(self):
+        """Return the current state of the run as a JSON document."""
+        tests = self.json_data["tests"]
+        for entry in tests[len(self._fragments):]:
+            self._fragments.append(json.dumps(entry))
+            self._score += entry.get("score", 0.0)
+
+        header = {key: value for key, value in self.json_data.items()
+                  if key not in ("tests", "leaderboard")}
+        header["execution_time"] = format(time.time() - self._start_time, "0.2f")
+        header["score"] = self._score
+        header["leaderboard"] = self.json_data["leaderboard"]
+
+        fragments = self._fragments + list(self._pending.values())
+        return (json.dumps(header)[:-1] + ', "tests": [\n' +
+                ",\n".join(fragments) + "\n]}\n")
+
+    def flush(self, force=False):
+        """Write the current state of the run unless writing would be too costly.
+
+        Args:
+            force (bool): Write regardless of the time since the last write.
+
+        """
+        start = time.monotonic()
+        if (not force and self._last_flush is not None and
+                self._last_cost > self.max_overhead * (start - self._last_flush)):
+            return
+        atomic_write(self.path, self.render())
+        self._last_flush = time.monotonic()
+        self._last_cost = self._last_flush - start
+
+
+class IncrementalJSONTestResult(JSONTestResult):
+    """``JSONTestResult`` that reports progress to an ``IncrementalResultsWriter``.
+
+    If a ``TimeBudget`` is attached, each test is given a deadline before it
+    starts, and tests that cannot get enough time are skipped and reported
+    with a score of zero.  Resource usage for each test is recorded in the
+    ``extra_data`` of its entry.
+
+    """
+
+    writer = None
+    budget = None
+    fork_tests = False
+    tests_left = 0
+    _budget_skipped = frozenset()
+    _results_mark = 0
+
+    def buildNotRunResult(self, test, message):
+        """Build a zero-score results entry for a test that did not run."""
+        entry = {"name": self.getDescription(test)}
+        weight = self.getWeight(test)
+        if weight is not None:
+            entry["score"] = 0.0
+            entry["max_score"] = weight
+        entry["status"] = "failed"
+        entry["output"] = message
+        visibility = self.getVisibility(test)
+        if visibility:
+            entry["visibility"] = visibility
+        number = self.getNumber(test)
+        if number:
+            entry["number"] = number
+        entry["extra_data"] = {"test_id": test.id()}
+        return entry
+
+    def registerPending(self, tests):
+        """Report every test in tests as not run until it finishes."""
+        tests = list(tests)
+        self.tests_left = len(tests)
+        self._budget_skipped = set()
+        if self.writer is None:
+            return
+        for test in tests:
+            if not self.getLeaderboardData(test)[0]:
+                self.writer.add_pending(test.id(),
+                                        self.buildNotRunResult(test, NOT_RUN_MESSAGE))
+        self.writer.flush(force=True)
+
+    def _outcome_marks(self):
+        return (len(self.results), len(self.leaderboard), len(self.failures),
+                len(self.errors), len(self.skipped))
+
+    def _forked_outcome(self, test, marks):
+        """Collect what running test added to this (child) result."""
+        results, leaderboard, failures, errors, skipped = marks
+        outcome = {
+            "results": self.results[results:],
+            "leaderboard": self.leaderboard[leaderboard:],
+            "failures": [text for _, text in self.failures[failures:]],
+            "errors": [text for _, text in self.errors[errors:]],
+            "skipped": [reason for _, reason in self.skipped[skipped:]],
+        }
+        # The value is the required test's docstring, which may be None.
+        if hasattr(type(test), '_FAILED_REQUIRED_TEST'):
+            outcome["failed_required"] = type(test)._FAILED_REQUIRED_TEST
+        return outcome
+
+    def _merge_forked_outcome(self, test, outcome):
+        self.results.extend(outcome["results"])
+        self.leaderboard.extend(outcome["leaderboard"])
+        self.failures.extend((test, text) for text in outcome["failures"])
+        self.errors.extend((test, text) for text in outcome["errors"])
+        self.skipped.extend((test, reason) for reason in outcome["skipped"])
+        if "failed_required" in outcome:
+            type(test)._FAILED_REQUIRED_TEST = outcome["failed_required"]
+
+    def _add_forked_failure(self, test, message, timed_out=False):
+        entry = self.buildNotRunResult(test, message)
+        if timed_out:
+            entry["extra_data"]["timed_out"] = True
+        self.results.append(entry)
+        self.failures.append((test, message))
+
+    def runForked(self, test, run):
+        """Run a test in a forked child process and merge its outcome.
+
+        Args:
+            test (unittest.TestCase): The test.
+            run: Function that runs the test against a result object.
+
+        """
+        # The child enforces the test's deadline itself; this is the
+        # backstop for a child that can't be interrupted.
+        timeout = FORK_TIMEOUT
+        if self.budget is not None:
+            timeout = self.budget.test_time(self.tests_left) + 2 * timing_utils.ALARM_GRACE
+        marks = self._outcome_marks()
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            try:
+                # Only the parent writes results.json.
+                self.writer = None
+                run(self)
+                data = pickle.dumps(self._forked_outcome(test, marks))
+            except BaseException:
+                data = pickle.dumps({"crash": traceback.format_exc()})
+            try:
+                with os.fdopen(write_fd, 'wb') as f:
+                    f.write(data)
+            finally:
+                os._exit(0)
+
+        os.close(write_fd)
+        chunks = []
+        end = time.monotonic() + timeout
+        timed_out = False
+        try:
+            while True:
+                wait = max(0.0, end - time.monotonic())
+                ready, _, _ = select.select([read_fd], [], [], wait)
+                if len(ready) == 0:
+                    timed_out = True
+                    os.kill(pid, signal.SIGKILL)
+                    break
+                chunk = os.read(read_fd, 1 << 16)
+                if len(chunk) == 0:
+                    break
+                chunks.append(chunk)
+        finally:
+            os.close(read_fd)
+            _, status = os.waitpid(pid, 0)
+
+        self.testsRun += 1
+        if timed_out:
+            self._add_forked_failure(test, FORK_TIMEOUT_MESSAGE, timed_out=True)
+        elif len(chunks) == 0:
+            self._add_forked_failure(test, CRASH_MESSAGE.format(
+                os.waitstatus_to_exitcode(status)))
+        else:
+            outcome = pickle.loads(b"".join(chunks))
+            if "crash" in outcome:
+                self._add_forked_failure(test, FORK_ERROR_MESSAGE + "\n"
+                                         + outcome["crash"])
+            else:
+                self._merge_forked_outcome(test, outcome)
+        self.tests_left = max(0, self.tests_left - 1)
+        if self.writer is not None:
+            self.writer.mark_finished(test.id())
+            self.writer.flush()
+
+    def startTest(self, test):
+        if self.budget is not None:
+            reason = self.budget.start_test(self.tests_left)
+            if reason is not None:
+                self._budget_skipped.add(test.id())
+                timing_utils.skip_test(test, reason)
+        self._results_mark = len(self.results)
+        perf_utils.start_test()
+        super().startTest(test)
+
+    def addSkip(self, test, reason):
+        super().addSkip(test, reason)
+        # JSONTestResult leaves skipped tests out of the results. Tests
+        # skipped for lack of time still need to show up with zero points.
+        if test.id() in self._budget_skipped:
+            entry = self.buildNotRunResult(test, reason)
+            entry["extra_data"]["skipped"] = "time budget"
+            self.results.append(entry)
+
+    def addFailure(self, test, err):
+        count = len(self.results)
+        super().addFailure(test, err)
+        if (issubclass(err[0], timing_utils.TimeLimitExceeded) and
+                len(self.results) > count):
+            self.results[-1].setdefault("extra_data", {})["timed_out"] = True
+
+    def stopTest(self, test):
+        performance = perf_utils.stop_test()
+        for entry in self.results[self._results_mark:]:
+            extra_data = entry.setdefault("extra_data", {})
+            extra_data["test_id"] = test.id()
+            if performance is not None:
+                extra_data["performance"] = performance
+        if self.budget is not None:
+            self.budget.stop_test()
+        self.tests_left = max(0, self.tests_left - 1)
+        super().stopTest(test)
+        if self.writer is not None:
+            self.writer.mark_finished(test.id())
+            self.writer.flush()
+
+
+def single_failure_results(tests, name, output):
+    """Build a results document that reports one failed test instead of the suite.
+
+    Args:
+        tests: The tests that were not run.  The failed entry is worth as
+            many points as all of them together.
+        name (str): Name of the failed entry.
+        output (str): Message shown for the entry.
+
+    Returns:
+        dict: A complete results document.
+
+    """
+    result = IncrementalJSONTestResult(None, True, 1, [], [], '')
+    max_score = sum(result.getWeight(test) or 0.0 for test in tests)
+    return {
+        "score": 0.0,
+        "tests": [{
+            "name": name,
+            "score": 0.0,
+            "max_score": max_score,
+            "status": "failed",
+            "output": output,
+            "visibility": "visible",
+        }],
+    }
+
+
+class IncrementalJSONTestRunner(JSONTestRunner):
+    """``JSONTestRunner`` that keeps a valid results file on disk at all times.
+
+    Args:
+        path (str): Location of the results file.
+        max_overhead (float): Upper bound on the fraction of the run time
+            spent writing intermediate results.
+        budget (TimeBudget): Optional time budget used to give each test a
+            deadline.
+        fork_tests (bool): Run each ``JmuTestCase`` method in a forked child
+            process.  A child that runs past its share of the budget, or
+            ``FORK_TIMEOUT`` seconds without a budget, is killed.
+
+    Any additional keyword arguments are passed to ``JSONTestRunner``.
+
+    """
+
+    resultclass = IncrementalJSONTestResult
+
+    def __init__(self, path, max_overhead=0.1, budget=None, fork_tests=False,
+                 **kwargs):
+        super().__init__(stream=io.StringIO(), **kwargs)
+        self.path = path
+        self.budget = budget
+        self.fork_tests = fork_tests
+        self.writer = IncrementalResultsWriter(path, self.json_data,
+                                               max_overhead)
+        self._suite = None
+
+    def _makeResult(self):
+        result = super()._makeResult()
+        result.writer = self.writer
+        result.budget = self.budget
+        result.fork_tests = self.fork_tests and hasattr(os, 'fork')
+        result.registerPending(iter_tests(self._suite))
+        return result
+
+    def run(self, test):
+        self._suite = test
+        result = super().run(test)
+        atomic_write(self.path, self.stream.getvalue())
+        return result
@@ -1,5 +1,6 @@
 """Code for actually executing the autograder on the server."""
 
+import json
 import shutil
 import os
 from pathlib import Path
@@ -7,7 +8,18 @@ import configparser
 import logging
 import unittest
 import jmu_gradescope_utils
-from gradescope_utils.autograder_utils.json_test_runner import JSONTestRunner
+from jmu_gradescope_utils.results_utils import (IncrementalJSONTestRunner, iter_tests,
+                                                atomic_write, single_failure_results)
+from jmu_gradescope_utils.timing_utils import TimeBudget, ALARM_GRACE
+from jmu_gradescope_utils import shard_utils
+from jmu_gradescope_utils import compile_utils
+from jmu_gradescope_utils import import_utils
+from jmu_gradescope_utils import utils
+
+# Name of the single results entry reported when submitted files contain
+# syntax errors.
+SYNTAX_CHECK = "Syntax check"
+
 
 def get_gradescope_base():
     if 'JMU_GRADESCOPE_BASE' in os.environ:
@@ -21,13 +33,55 @@ def parse_file_list(config_str):
     files = [x for x in files if len(x) > 0]
     return files
 
+def read_config():
+    config_path = Path(get_gradescope_base()) / 'source' / 'config.ini'
+    config = configparser.ConfigParser()
+    config.read(config_path)
+    return config
+
+
+def get_float_setting(config, section, key, default=None):
+    """Return a numeric config.ini setting, treating blank values as missing."""
+    value = config.get(section, key, fallback='').strip()
+    if len(value) == 0:
+        return default
+    return float(value)
+
+
+def get_time_budget(config):
+    """Build a TimeBudget from the optional [RUN] section of config.ini.
+
+    The budget is measured from the time in JMU_GRADESCOPE_START if it is
+    set (so that all shard workers share a deadline), otherwise from now.
+    Recognized settings (all in seconds)::
+
+        [RUN]
+        time_budget: 600
+        max_test_time: 60
+        min_test_time: 1
+
+    Returns:
+        TimeBudget: None if no time_budget is configured.
+
+    """
+    budget = get_float_setting(config, 'RUN', 'time_budget')
+    if budget is None:
+        return None
+    start = os.environ.get('JMU_GRADESCOPE_START')
+    return TimeBudget(budget,
+                      start=float(start) if start is not None else None,
+                      max_test_time=get_float_setting(config, 'RUN',
+                                                      'max_test_time'),
+                      min_test_time=get_float_setting(config, 'RUN',
+                                                      'min_test_time', 1.0))
+
+
 def setup_autograder():
     gradescope_base = get_gradescope_base()
     logging.info("Configuring autograder...")
     source_base = Path(gradescope_base) / 'source'
     config_path = source_base / 'config.ini'
-    config = configparser.ConfigParser()
-    config.read(config_path)
+    config = read_config()
 
     if not config_path.exists():
         logging.error(f"Missing config file: {config_path}")
@@ -48,14 +102,62 @@ def setup_autograder():
 
     # COPY STUDENT SUBMITTED TESTS
     student_test_dir = source_base / 'student_tests'
-    student_test_dir.mkdir()
+    student_test_dir.mkdir(exist_ok=True)
     (student_test_dir / '__init__.py').touch()
 
     for name in submit_test_files:
         logging.info(f"Copying student submitted test file: {name} to {student_test_dir/name}")
         shutil.copy(submission_base / name,  student_test_dir / name)
 
-def run_tests():
+    # BYTE-COMPILE EVERYTHING ONCE
+    errors = compile_utils.compile_sources(source_base)
+    submitted = {os.path.normpath(name) for name in submit_code_files}
+    submitted.update(os.path.normpath(os.path.join('student_tests', name))
+                     for name in submit_test_files)
+    student_errors = {name: message for name, message in errors.items()
+                      if name in submitted}
+    for name, message in errors.items():
+        if name in student_errors:
+            logging.info(f"Syntax error in student submitted file: {name}")
+        else:
+            logging.warning(f"Syntax error in autograder file {name}:\n{message}")
+    compile_utils.save_syntax_errors(source_base, student_errors)
+
+def preload_submitted_modules(config):
+    """Import the submitted modules so that forked tests start with them.
+
+    Modules that can't be imported are skipped; the tests that use them
+    report the problem.
+    """
+    for name in parse_file_list(config['SUBMIT']['code']):
+        if not name.endswith('.py') or os.path.dirname(name) != '':
+            continue
+        try:
+            with utils.suppress_IO(""):
+                import_utils.guarded_import(name[:-3])
+        except Exception as e:
+            logging.info(f"Not preloading {name}: {type(e).__name__}")
+
+
+def run_tests(test_ids=None):
+    """Run the official tests and write results.json.
+
+    If setup_autograder found syntax errors in the submitted files, a
+    single failed test describing them is reported instead of running the
+    suite.  If config.ini sets ``workers`` in the [RUN] section, the tests are
+    split across that many worker processes (see
+    :mod:`jmu_gradescope_utils.shard_utils`).  If it sets ``fork_tests: yes``,
+    each test method runs in a child forked from the test process, after the
+    submitted modules have been imported.
+
+    Args:
+        test_ids (list): Only run the tests with these ids (used by shard
+            workers).
+
+    Returns:
+        int: The number of errors and failures.
+
+    """
     logging.info("Running autograder...")
     gradescope_base = get_gradescope_base()
     unittest.defaultTestLoader.sortTestMethodsUsing = jmu_gradescope_utils.test_compare
@@ -63,8 +165,42 @@ def run_tests():
     suite = unittest.defaultTestLoader.discover(str(source_base / 'tests'),
                                                 top_level_dir=str(source_base))
     outfile = os.path.join(gradescope_base, 'results', 'results.json')
+    config = read_config()
+    budget = get_time_budget(config)
+
+    syntax_errors = compile_utils.load_syntax_errors(source_base)
+    if test_ids is None and len(syntax_errors) > 0:
+        results = single_failure_results(
+            iter_tests(suite), SYNTAX_CHECK,
+            compile_utils.format_syntax_errors(syntax_errors))
+        atomic_write(outfile, json.dumps(results, indent=4) + '\n')
+        return 1
+
+    if test_ids is not None:
+        wanted = set(test_ids)
+        suite = unittest.TestSuite(test for test in iter_tests(suite)
+                                   if test.id() in wanted)
+    else:
+        workers = int(get_float_setting(config, 'RUN', 'workers', 1))
+        if workers > 1:
+            deadline = None
+            if budget is not None:
+                os.environ['JMU_GRADESCOPE_START'] = str(budget.start)
+                deadline = budget.deadline + 2 * ALARM_GRACE
+            return shard_utils.run_sharded(
+                suite, workers, outfile, source_base,
+                Path(gradescope_base) / 'submission',
+                timings_path=source_base / shard_utils.TIMINGS_FILE,
+                deadline=deadline)
 
-    with open(outfile, 'w') as f:
-        result = JSONTestRunner(visibility='visible', stream=f).run(suite)
+    # results.json is rewritten after every test so that a run killed by
+    # the time limit still reports the tests that finished.
+    fork_tests = config.getboolean('RUN', 'fork_tests', fallback=False)
+    if fork_tests:
+        preload_submitted_modules(config)
+    runner = IncrementalJSONTestRunner(outfile, budget=budget,
+                                       fork_tests=fork_tests,
+                                       visibility='visible')
+    result = runner.run(suite)
 
     return len(result.errors + result.failures)
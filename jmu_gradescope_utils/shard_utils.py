@@ -0,0 +1,272 @@
+"""Split the official tests across several worker processes.
+
+Tests are assigned to workers using the durations recorded when the
+autograder was tested against the sample solution (``test_timings.json``),
+so that slow tests such as coverage and flake8 checks are spread out and the
+wall time approaches the total time divided by the number of workers.  All
+tests of a class that uses ``@required`` are kept together, in order, on a
+single worker.
+
+Each worker runs in its own copy of the source folder so that scripts
+rewritten by ``getScriptOutput`` cannot interfere with each other.  The
+parent merges the workers' partial results into ``results.json`` as they
+progress.
+
+"""
+import heapq
+import json
+import logging
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from .results_utils import (atomic_write, iter_tests, NOT_RUN_MESSAGE,
+                            IncrementalJSONTestResult)
+
+TIMINGS_FILE = 'test_timings.json'
+
+# Duration assumed for tests without a recorded timing when nothing at all
+# has been recorded.
+DEFAULT_DURATION = 1.0
+
+# Seconds between merges of the workers' partial results.
+MERGE_INTERVAL = 0.5
+
+
+def timings_from_results(results):
+    """Extract a test id -> wall time mapping from a results dictionary."""
+    timings = {}
+    for entry in results.get("tests", []):
+        extra_data = entry.get("extra_data", {})
+        if "test_id" in extra_data and "performance" in extra_data:
+            timings[extra_data["test_id"]] = extra_data["performance"]["wall_time"]
+    return timings
+
+
+def load_timings(path):
+    """Load recorded test timings, returning an empty dict if there are none."""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _is_required(test):
+    method = getattr(test, test._testMethodName, None)
+    return getattr(method, '__required__', False)
+
+
+def group_tests(tests):
+    """Group tests into units that must run in order on the same worker.
+
+    Returns:
+        list: Lists of tests, in suite order.  Tests from a class containing
+        a ``@required`` test share a group; every other test is on its own.
+
+    """
+    tests = list(tests)
+    required_classes = {test.__class__ for test in tests if _is_required(test)}
+    groups = []
+    class_groups = {}
+    for test in tests:
+        if test.__class__ in required_classes:
+            if test.__class__ not in class_groups:
+                class_groups[test.__class__] = []
+                groups.append(class_groups[test.__class__])
+            class_groups[test.__class__].append(test)
+        else:
+            groups.append([test])
+    return groups
+
+
+def assign_shards(tests, timings, workers):
+    """Assign tests to workers so that their total durations are balanced.
+
+    Uses the longest-processing-time-first heuristic: groups are handed out
+    from slowest to fastest, each to the worker with the least work so far.
+
+    Args:
+        tests: The tests to run.
+        timings (dict): Recorded durations by test id.  Tests without a
+            timing are assumed to take the median recorded duration.
+        workers (int): Number of workers.
+
+    Returns:
+        list: One list of tests per worker, each in suite order.
+
+    """
+    groups = group_tests(tests)
+    if len(timings) > 0:
+        default = statistics.median(timings.values())
+    else:
+        default = DEFAULT_DURATION
+
+    def duration(group):
+        return sum(timings.get(test.id(), default) for test in group)
+
+    order = sorted(range(len(groups)), key=lambda i: duration(groups[i]),
+                   reverse=True)
+    loads = [(0.0, worker) for worker in range(workers)]
+    assigned = [[] for _ in range(workers)]
+    for index in order:
+        load, worker = heapq.heappop(loads)
+        assigned[worker].append(index)
+        heapq.heappush(loads, (load + duration(groups[index]), worker))
+
+    return [[test for index in sorted(indices) for test in groups[index]]
+            for indices in assigned if len(indices) > 0]
+
+
+def not_run_entries(tests):
+    """Build the results entries reported for tests that never ran."""
+    result = IncrementalJSONTestResult(None, True, 1, [], [], '')
+    return {test.id(): result.buildNotRunResult(test, NOT_RUN_MESSAGE)
+            for test in tests if not result.getLeaderboardData(test)[0]}
+
+
+def merge_results(documents, test_ids, not_run=None):
+    """Combine the results documents written by the workers.
+
+    Args:
+        documents (list): Parsed results documents.
+        test_ids (list): Test ids in suite order; entries are sorted to
+            match.
+        not_run (dict): Entries, by test id, to report for tests that do
+            not appear in any of the documents.
+
+    """
+    position = {test_id: index for index, test_id in enumerate(test_ids)}
+    merged = {"tests": [], "leaderboard": []}
+    execution_time = 0.0
+    for document in documents:
+        for key, value in document.items():
+            if key not in ("tests", "leaderboard", "score", "execution_time"):
+                merged[key] = value
+        merged["tests"].extend(document.get("tests", []))
+        merged["leaderboard"].extend(document.get("leaderboard", []))
+        execution_time = max(execution_time,
+                             float(document.get("execution_time", 0.0)))
+
+    if not_run is not None:
+        seen = {entry.get("extra_data", {}).get("test_id")
+                for entry in merged["tests"]}
+        merged["tests"].extend(entry for test_id, entry in not_run.items()
+                               if test_id not in seen)
+
+    def sort_key(entry):
+        test_id = entry.get("extra_data", {}).get("test_id")
+        return position.get(test_id, len(position))
+
+    merged["tests"].sort(key=sort_key)
+    merged["score"] = sum(entry.get("score", 0.0) for entry in merged["tests"])
+    merged["execution_time"] = format(execution_time, "0.2f")
+    return merged
+
+
+def _read_results(path):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def run_sharded(suite, workers, outfile, source_base, submission_base,
+                timings_path=None, deadline=None):
+    """Run the suite on several worker processes.
+
+    Args:
+        suite: The discovered test suite.
+        workers (int): Number of worker processes.
+        outfile (str): Location of the combined results.json.
+        source_base (Path): The autograder source folder.
+        submission_base (Path): The student submission folder.
+        timings_path (str): Location of recorded test timings.
+        deadline (float): ``time.time()`` after which workers are killed.
+
+    Returns:
+        int: Number of failed tests in the combined results, including
+        tests that a worker did not finish because it crashed or was
+        killed.
+
+    """
+    tests = list(iter_tests(suite))
+    test_ids = [test.id() for test in tests]
+    timings = load_timings(timings_path) if timings_path else {}
+    shards = assign_shards(tests, timings, workers)
+    not_run = not_run_entries(tests)
+    logging.info(f"Running {len(tests)} tests on {len(shards)} workers...")
+
+    workdir = Path(tempfile.mkdtemp(prefix='jmu_shards_'))
+    procs = []
+    result_paths = []
+    try:
+        for index, shard in enumerate(shards):
+            base = workdir / f'worker_{index}'
+            shutil.copytree(source_base, base / 'source', symlinks=True)
+            os.symlink(submission_base, base / 'submission')
+            (base / 'results').mkdir()
+            ids_path = base / 'test_ids.json'
+            with open(ids_path, 'w') as f:
+                json.dump([test.id() for test in shard], f)
+
+            env = os.environ.copy()
+            env['JMU_GRADESCOPE_BASE'] = str(base)
+            env['JMU_GRADESCOPE_START'] = os.environ.get('JMU_GRADESCOPE_START',
+                                                         str(time.time()))
+            procs.append(subprocess.Popen(
+                [sys.executable, '-m', 'jmu_gradescope_utils.shard_utils',
+                 str(ids_path)], cwd=str(base / 'source'), env=env))
+            result_paths.append(base / 'results' / 'results.json')
+
+        last_seen = {}
+        merged = None
+        while True:
+            running = [proc for proc in procs if proc.poll() is None]
+            if deadline is not None and time.time() > deadline:
+                for proc in running:
+                    proc.kill()
+                running = []
+
+            changed = False
+            for path in result_paths:
+                if path.exists() and last_seen.get(path) != path.stat().st_mtime_ns:
+                    last_seen[path] = path.stat().st_mtime_ns
+                    changed = True
+            if changed or len(running) == 0:
+                documents = [_read_results(path) for path in result_paths]
+                merged = merge_results([doc for doc in documents if doc],
+                                       test_ids, not_run)
+                atomic_write(outfile, json.dumps(merged, indent=4) + '\n')
+            if len(running) == 0:
+                break
+            time.sleep(MERGE_INTERVAL)
+
+        for proc in procs:
+            proc.wait()
+        # Exit codes can't be trusted: a killed worker reports none of its
+        # failures, and exit codes wrap around at 256.
+        return sum(1 for entry in merged["tests"]
+                   if entry.get("status") == "failed")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def run_worker(ids_path):
+    """Entry point for a worker process: run the tests listed in ids_path."""
+    from . import run_utils
+    with open(ids_path, 'r') as f:
+        test_ids = json.load(f)
+    return run_utils.run_tests(test_ids=test_ids)
+
+
+if __name__ == "__main__":
+    # The parent counts failures from the results; only report whether
+    # there were any (exit codes wrap around at 256).
+    sys.exit(1 if run_worker(sys.argv[1]) > 0 else 0)
@@ -0,0 +1,179 @@
+"""Time budget for a grading run.
+
+Gradescope kills the autograder when a submission exceeds its time limit,
+and the student loses every test that had not finished.  A ``TimeBudget``
+divides the time available for the run among the remaining tests: each test
+may use its fair share of whatever time is left, so a slow or hanging test
+early in the suite cannot starve the tests that follow it.
+
+While a test is running its deadline is available through
+:func:`remaining`, which ``getScriptOutput``, ``run_flake8`` and the student
+test runners use as a timeout.  As a last resort a ``SIGALRM`` interrupts
+in-process code that runs past the deadline.
+
+"""
+import functools
+import signal
+import threading
+import time
+
+# Seconds between the soft deadline used for subprocess timeouts and the
+# alarm that interrupts in-process code.
+ALARM_GRACE = 1.0
+
+_deadline = None
+
+
+class TimeLimitExceeded(AssertionError):
+    """Raised when a test runs past its deadline."""
+
+
+def set_deadline(deadline):
+    """Set the absolute (``time.time()``) deadline for the current test.
+
+    Args:
+        deadline (float): Time stamp, or None to remove the deadline.
+
+    """
+    global _deadline
+    _deadline = deadline
+
+
+def get_deadline():
+    """Return the deadline for the current test, or None if there is none."""
+    return _deadline
+
+
+def remaining():
+    """Return the number of seconds left for the current test.
+
+    Returns:
+        float: Seconds remaining (never negative), or None if there is no
+        deadline.
+
+    """
+    if _deadline is None:
+        return None
+    return max(0.0, _deadline - time.time())
+
+
+def expired():
+    """Return True if the current test has used up its time."""
+    return _deadline is not None and time.time() >= _deadline
+
+
+def check_deadline(activity="The test"):
+    """Raise ``TimeLimitExceeded`` if the current test is out of time."""
+    if expired():
+        raise TimeLimitExceeded(f"{activity} did not finish within the "
+                                f"autograder time limit.")
+
+
+def _alarm_handler(signum, frame):
+    raise TimeLimitExceeded("The test did not finish within the autograder "
+                            "time limit.")
+
+
+def _can_use_alarm():
+    return (hasattr(signal, 'setitimer') and
+            threading.current_thread() is threading.main_thread())
+
+
+class TimeBudget:
+    """Track the time used by a grading run and hand out per-test deadlines.
+
+    Each test gets an equal share of the time that is left (but at least
+    ``min_test_time``).  Time that fast tests do not use is passed on to the
+    tests that follow them.
+
+    Args:
+        budget (float): Seconds available for the whole run.
+        max_test_time (float): Upper limit on the time given to a single test
+            (None for no limit beyond the fair share).
+        min_test_time (float): Minimum time given to a test.  Tests are not
+            started once less than this much time is left in the run.
+        start (float): ``time.time()`` at which the run started (defaults to
+            now).
+
+    """
+
+    def __init__(self, budget, max_test_time=None, min_test_time=1.0,
+                 start=None):
+        self.start = time.time() if start is None else start
+        self.deadline = self.start + budget
+        self.max_test_time = max_test_time
+        self.min_test_time = min_test_time
+        self._old_handler = None
+        self._alarm_set = False
+
+    def elapsed(self):
+        """Seconds since the run started."""
+        return time.time() - self.start
+
+    def remaining(self):
+        """Seconds left in the run (never negative)."""
+        return max(0.0, self.deadline - time.time())
+
+    def test_time(self, tests_left):
+        """Return the number of seconds the next test may use.
+
+        Args:
+            tests_left (int): Number of tests that have not run yet,
+                including the next one.
+
+        """
+        remaining = self.remaining()
+        share = max(remaining / max(1, tests_left), self.min_test_time)
+        if self.max_test_time is not None:
+            share = min(share, self.max_test_time)
+        return min(share, remaining)
+
+    def start_test(self, tests_left):
+        """Set the deadline for the next test.
+
+        Args:
+            tests_left (int): Number of tests that have not run yet,
+                including the next one.
+
+        Returns:
+            str: None if the test may start, otherwise a message explaining
+            why it was skipped.
+
+        """
+        if self.remaining() < self.min_test_time:
+            return (f"This test was skipped because the autograder ran out of "
+                    f"time ({self.elapsed():.1f} of "
+                    f"{self.deadline - self.start:.0f} seconds used).")
+        seconds = self.test_time(tests_left)
+        set_deadline(time.time() + seconds)
+        if _can_use_alarm():
+            self._old_handler = signal.signal(signal.SIGALRM, _alarm_handler)
+            signal.setitimer(signal.ITIMER_REAL, seconds + ALARM_GRACE)
+            self._alarm_set = True
+        return None
+
+    def stop_test(self):
+        """Clear the deadline set by ``start_test``."""
+        if self._alarm_set:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, self._old_handler)
+            self._alarm_set = False
+        set_deadline(None)
+
+
+def skip_test(test, reason):
+    """Make a not-yet-started test case skip itself with the given reason.
+
+    The replacement method keeps the attributes (weight, visibility, etc.)
+    of the original so that it is still reported correctly.
+
+    """
+    method = getattr(test, test._testMethodName)
+
+    @functools.wraps(method)
+    def skipped(*args, **kwargs):
+        pass
+
+    skipped.__unittest_skip__ = True
+    skipped.__unittest_skip_why__ = reason
+    setattr(test, test._testMethodName, skipped)
@@ -2,6 +2,8 @@ import subprocess
 import os
 import re
 from . import remove_comments
+from . import perf_utils
+from . import timing_utils
 import tempfile
 import io
 import sys
@@ -50,6 +52,7 @@ def count_regex_matches(regex, filename, strip_comments=True):
     return len(matches)
 
 
+@perf_utils.instrumented
 def run_flake8(filename, config='flake8.cfg'):
     """Return the output of executing flake8.  Should be an empty string
     if no formatting issues were found.
@@ -64,8 +67,15 @@ def run_flake8(filename, config='flake8.cfg'):
                              '--config={}'.format(config_path),
                              full_path],
                             stdout=subprocess.PIPE)
-    proc.wait()
-    return proc.stdout.read().decode().strip()
+    perf_utils.count_child_process()
+    try:
+        output, _ = proc.communicate(timeout=timing_utils.remaining())
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.communicate()
+        raise timing_utils.TimeLimitExceeded(
+            "flake8 did not finish within the autograder time limit.")
+    return output.decode().strip()
 
 
 def run_flake8_docstring(filename):
@@ -79,19 +89,58 @@ def replace_variables(filename, variables=None, new_name=None):
     else:
         new_file_name = os.path.join(tmpdir, os.path.basename(filename))
     with open(full_submission_path(filename), 'r') as f:
-        new_file = f.read()
+        new_file = substitute_variables(f.read(), variables)
 
+    with open(os.path.join(new_file_name), 'w') as f:
+        f.write(new_file)
+
+    return (tmpdir, new_file_name)
+
+
+def substitute_variables(source, variables=None):
+    """Return source with the assignments to the given variables replaced.
+
+    Each line assigning to a variable in the dictionary is replaced by an
+    assignment of the dictionary value.
+    """
     if variables is not None:
 
         for var in variables:
             regexp = '(^|\n)( *){}\s*(?=\=)(?!==).*(\n|$)'.format(var)
             replace = "\\1\\2{} = {}\\3".format(var, repr(variables[var]))
-            new_file = re.sub(regexp, replace, new_file)
+            source = re.sub(regexp, replace, source)
 
-    with open(os.path.join(new_file_name), 'w') as f:
-        f.write(new_file)
+    return source
 
-    return (tmpdir, new_file_name)
+
+def script_command(filename):
+    """Return the command that runs a script from the source folder.
+
+    Scripts directly in the source folder are run as modules (``python -m``)
+    so that the bytecode compiled by ``setup_autograder`` is used.  Scripts
+    that can't be imported under their own name, for example because they
+    share it with a standard library module, are run from their path.
+
+    """
+    name, extension = os.path.splitext(filename)
+    shadowed = (name in getattr(sys, 'stdlib_module_names', ())
+                or name in sys.builtin_module_names)
+    if name in sys.modules:
+        module_file = getattr(sys.modules[name], '__file__', None) or ''
+        shadowed = shadowed or not module_file.startswith(SOURCE_BASE)
+    if (extension == '.py' and name.isidentifier()
+            and os.path.dirname(filename) == '' and not shadowed):
+        return [sys.executable, '-m', name]
+    return [sys.executable, full_source_path(filename)]
+
+
+# Traceback frames added by running a script with "python -m".
+_RUNPY_FRAME = re.compile(r'  File "[^"]*runpy[^"]*", line \d+, in \w+\n(?:    .*\n)*')
+
+
+def strip_runpy_frames(stderr_text):
+    """Remove the runpy frames from tracebacks of scripts run with -m."""
+    return _RUNPY_FRAME.sub('', stderr_text)
 
 
 # This is copied directly from:
@@ -129,9 +178,11 @@ def suppress_IO(in_string):
     oldin = sys.stdin
     sys.stdout = text_out
     sys.stdin = text_in
-    yield
-    sys.stdout = oldout
-    sys.stdin = oldin
+    try:
+        yield
+    finally:
+        sys.stdout = oldout
+        sys.stdin = oldin
 
 class IOContext:
     """
@@ -143,21 +194,29 @@ class IOContext:
         with context:
             # my code block
         output = context.output
+
+    The streams are restored, and ``output`` is set, even if the block
+    raises an exception.  ``output`` holds what has been written so far
+    while the block is still running.
     """
     def __init__(self, in_string):
         self.text_in = io.StringIO(in_string)
         self.text_out = io.StringIO()
 
+    @property
+    def output(self):
+        return self.text_out.getvalue()
+
     def __enter__(self):
         self.oldout = sys.stdout
         self.oldin = sys.stdin
         sys.stdout = self.text_out
         sys.stdin = self.text_in
+        return self
 
     def __exit__(self, exc_type, exc_value, traceback):
         sys.stdout = self.oldout
         sys.stdin = self.oldin
-        self.output = self.text_out.getvalue()
 
 if __name__ == "__main__":
 
@@ -0,0 +1,310 @@
+"""Rerun the tests of an autograder whenever its files change.
+
+``AutograderWatcher`` keeps an unpacked copy of the autograder in a
+temporary grading folder.  Each time :meth:`AutograderWatcher.poll` finds
+that files in the autograder folder (``tests/``, ``scaffolding/``,
+``configurations/``, ``config.ini``) or the sample submission have changed,
+only those files are copied into the grading folder and only the test
+modules that could be affected are run again:
+
+* a changed test module is rerun on its own;
+* a changed sample or scaffolding file reruns the test modules that mention
+  its name, or every module if none do;
+* a change to ``config.ini``, ``configurations/`` or the reference solution,
+  or to a test module that uses reference outputs, rebuilds the zip file and
+  reruns everything.
+
+Results from earlier runs are kept for the modules that were not rerun, so
+the summary always covers the whole suite.
+
+"""
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+import zipfile
+from pathlib import Path
+
+from . import build_utils
+from . import reference_utils
+
+# Seconds between checks for changed files.
+POLL_INTERVAL = 0.5
+
+
+def snapshot(autograder_folder, sample_folder):
+    """Record the modification time and size of every watched file.
+
+    Returns:
+        dict: Mapping from (kind, relative path) to (mtime_ns, size), where
+        kind is one of 'tests', 'scaffolding', 'config', 'reference' or
+        'sample'.
+
+    """
+    autograder = Path(autograder_folder)
+    roots = [('tests', autograder / 'tests'),
+             ('scaffolding', autograder / 'scaffolding'),
+             ('config', autograder / 'configurations'),
+             ('reference', autograder / reference_utils.REFERENCE_FOLDER),
+             ('sample', Path(sample_folder))]
+    files = {}
+    for kind, root in roots:
+        if root.is_dir():
+            for path in root.glob('**/*'):
+                if path.is_file() and '__pycache__' not in path.parts:
+                    stat = path.stat()
+                    key = (kind, str(path.relative_to(root)))
+                    files[key] = (stat.st_mtime_ns, stat.st_size)
+    config = autograder / 'config.ini'
+    if config.exists():
+        stat = config.stat()
+        files[('config', 'config.ini')] = (stat.st_mtime_ns, stat.st_size)
+    return files
+
+
+def changed_files(old, new):
+    """Return the keys of the files that were added, removed or modified."""
+    return {key for key in set(old) | set(new) if old.get(key) != new.get(key)}
+
+
+def test_module(test):
+    """Return the name of the test module a test (or failed import) is from."""
+    module = test.__class__.__module__
+    if module == 'unittest.loader':
+        # Modules that fail to import are reported as a _FailedTest whose
+        # method name is the module name.
+        return test._testMethodName
+    return module
+
+
+def module_of_result(entry):
+    """Return the test module of a results.json entry, if it is known."""
+    test_id = entry.get("extra_data", {}).get("test_id")
+    if test_id is None:
+        return None
+    if test_id.startswith('unittest.loader._FailedTest.'):
+        return test_id[len('unittest.loader._FailedTest.'):]
+    return test_id.rsplit('.', 2)[0]
+
+
+def summarize(results, rerun=None, elapsed=None):
+    """Format a compact score summary of a results dictionary."""
+    tests = results.get("tests", [])
+    score = sum(entry.get("score", 0.0) or 0.0 for entry in tests)
+    max_score = sum(entry.get("max_score", 0.0) or 0.0 for entry in tests)
+    failed = [entry for entry in tests if entry.get("status") == "failed"]
+    lines = []
+    if rerun is not None:
+        header = f"[{time.strftime('%H:%M:%S')}] Ran {len(rerun)} module(s)"
+        if elapsed is not None:
+            header += f" in {elapsed:.1f}s"
+        lines.append(header + ": " + ", ".join(sorted(rerun)))
+    lines.append(f"Score: {score:g}/{max_score:g}  "
+                 f"({len(tests) - len(failed)} passed, {len(failed)} failed)")
+    for entry in failed:
+        lines.append(f"  FAILED  {entry.get('name', '?')} "
+                     f"({entry.get('score', 0.0):g}/{entry.get('max_score', 0.0):g})")
+    return "\n".join(lines)
+
+
+class AutograderWatcher:
+    """Incrementally rebuild and retest an autograder folder.
+
+    Args:
+        autograder_folder (str): The autograder folder.
+        sample_folder (str): Folder containing the sample submission.
+
+    """
+
+    def __init__(self, autograder_folder, sample_folder):
+        self.autograder = Path(autograder_folder).resolve()
+        self.sample = Path(sample_folder).resolve()
+        self.base = Path(tempfile.mkdtemp(prefix='jmu_watch_'))
+        self.files = {}
+        self.results = {}  # test module -> list of results entries
+        self.modules = []
+
+    def close(self):
+        """Remove the grading folder."""
+        shutil.rmtree(self.base, ignore_errors=True)
+
+    def rebuild(self):
+        """Lay out the grading folder from a freshly built zip file."""
+        for name in ('source', 'submission', 'results'):
+            shutil.rmtree(self.base / name, ignore_errors=True)
+        zip_location = self.base / 'autograder.zip'
+        build_utils.build_zip(str(self.autograder), str(zip_location))
+        with zipfile.ZipFile(zip_location, 'r') as zip_obj:
+            zip_obj.extractall(path=self.base / 'source')
+        zip_location.unlink()
+        shutil.copytree(self.sample, self.base / 'submission')
+        (self.base / 'results').mkdir()
+        self.results = {}
+
+    def _copy(self, kind, name):
+        """Copy one changed file into the grading folder (or delete it)."""
+        if kind == 'tests':
+            src = self.autograder / 'tests' / name
+            dest = self.base / 'source' / 'tests' / name
+        elif kind == 'scaffolding':
+            src = self.autograder / 'scaffolding' / name
+            dest = self.base / 'source' / name
+        else:
+            src = self.sample / name
+            dest = self.base / 'submission' / name
+        if src.exists():
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy(src, dest)
+        elif dest.exists():
+            dest.unlink()
+
+    def _module_names(self):
+        tests = self.base / 'source' / 'tests'
+        return sorted(f"tests.{path.stem}" for path in tests.glob('*.py')
+                      if path.name != '__init__.py')
+
+    def affected_modules(self, changes):
+        """Return the test modules that need to run again after changes."""
+        modules = set()
+        mentioned = set()
+        for kind, name in changes:
+            if kind == 'tests':
+                if name.endswith('.py') and os.path.dirname(name) == '':
+                    modules.add(f"tests.{name[:-3]}")
+            else:
+                mentioned.add(Path(name).name)
+                mentioned.add(Path(name).stem)
+        if len(mentioned) > 0:
+            matches = set()
+            for module in self.modules:
+                path = self.base / 'source' / 'tests' / (module[6:] + '.py')
+                text = path.read_text(errors='replace')
+                if any(word in text for word in mentioned):
+                    matches.add(module)
+            modules.update(matches if len(matches) > 0 else self.modules)
+        return modules & set(self.modules)
+
+    def _needs_rebuild(self, kind, name):
+        """Return True if a change affects what build_zip generates."""
+        if kind in ('config', 'reference'):
+            return True
+        if kind == 'tests':
+            # The reference outputs are computed from the test files.
+            path = self.autograder / 'tests' / name
+            return (path.exists()
+                    and reference_utils.ASSERTION in path.read_text(errors='replace'))
+        return False
+
+    def poll(self):
+        """Apply any changes and rerun the affected tests.
+
+        Returns:
+            str: A summary of the new results, or None if nothing changed.
+
+        """
+        files = snapshot(self.autograder, self.sample)
+        changes = changed_files(self.files, files)
+        if len(changes) == 0:
+            return None
+        start = time.perf_counter()
+        first_run = len(self.files) == 0
+        self.files = files
+
+        if first_run or any(self._needs_rebuild(kind, name)
+                            for kind, name in changes):
+            self.rebuild()
+            self.modules = self._module_names()
+            rerun = set(self.modules)
+        else:
+            for kind, name in changes:
+                self._copy(kind, name)
+            self.modules = self._module_names()
+            rerun = self.affected_modules(changes)
+            if None in self.results:
+                # The last run stopped at the syntax check.
+                rerun = set(self.modules)
+            for module in list(self.results):
+                if module not in self.modules:
+                    del self.results[module]
+
+        self.run(rerun)
+        return summarize(self.combined_results(), rerun,
+                         time.perf_counter() - start)
+
+    def run(self, modules):
+        """Run the tests in the given modules and store their results."""
+        env = os.environ.copy()
+        env['JMU_GRADESCOPE_BASE'] = str(self.base)
+        proc = subprocess.run(
+            [sys.executable, '-m', 'jmu_gradescope_utils.watch_utils']
+            + sorted(modules), cwd=str(self.base / 'source'), env=env,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if len(proc.stderr) > 0:
+            logging.debug("stderr for the test run:\n" + proc.stderr.decode())
+        try:
+            with open(self.base / 'results' / 'results.json', 'r') as f:
+                results = json.load(f)
+        except (OSError, ValueError):
+            logging.error("The tests did not produce a results file:\n"
+                          + proc.stderr.decode())
+            return
+
+        entries = {}
+        for entry in results.get("tests", []):
+            module = module_of_result(entry)
+            entries.setdefault(module, []).append(entry)
+        if None in entries:
+            # Not a per-test result (e.g. the syntax check), so it replaces
+            # everything.
+            self.results = {None: entries[None]}
+            return
+        self.results.pop(None, None)
+        for module in modules:
+            self.results[module] = entries.get(module, [])
+
+    def combined_results(self):
+        """Return a results dictionary covering every test module."""
+        tests = [entry for module in [None] + self.modules
+                 for entry in self.results.get(module, [])]
+        return {"tests": tests}
+
+    def watch(self, report=print, cancel=None, interval=POLL_INTERVAL):
+        """Poll for changes until cancel is set (or forever).
+
+        Args:
+            report: Called with each summary.
+            cancel (threading.Event): Stop watching when this is set.
+            interval (float): Seconds between polls.
+
+        """
+        while cancel is None or not cancel.is_set():
+            summary = self.poll()
+            if summary is not None:
+                report(summary)
+            time.sleep(interval)
+
+
+def run_modules(modules):
+    """Entry point for a test run: set up, then run the tests in modules."""
+    from . import compile_utils, run_utils
+    run_utils.setup_autograder()
+    source_base = Path(run_utils.get_gradescope_base()) / 'source'
+    if len(compile_utils.load_syntax_errors(source_base)) > 0:
+        return run_utils.run_tests()
+    from .jmu_test_case import test_compare
+    from .results_utils import iter_tests
+    unittest.defaultTestLoader.sortTestMethodsUsing = test_compare
+    suite = unittest.defaultTestLoader.discover(str(source_base / 'tests'),
+                                                top_level_dir=str(source_base))
+    wanted = set(modules)
+    return run_utils.run_tests(test_ids=[test.id() for test in iter_tests(suite)
+                                         if test_module(test) in wanted])
+
+
+if __name__ == "__main__":
+    sys.exit(run_modules(sys.argv[1:]))
@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 """Create an uploadable Gradescope zip file from an autograder folder.
 
-usage: build_autograder.py [-h] [--output OUTPUT] folder
+usage: build_autograder.py [-h] [--output OUTPUT] [--wheelhouse WHEELHOUSE] folder
 
 Command line tool for building Python autograders.
 
@@ -13,6 +13,9 @@ optional arguments:
   --output OUTPUT, -o OUTPUT
                Output zip file location
                (default is to store the file in the autograder folder).
+  --wheelhouse WHEELHOUSE, -w WHEELHOUSE
+               Folder of wheels to bundle so that setup.sh installs
+               packages without network access.
 """
 
 import argparse
@@ -28,6 +31,8 @@ def main():
                         help='Location of the folder containing autograder')
     parser.add_argument('--output', '-o',
                         help="Output zip file location (default is to store the file in the autograder folder).")
+    parser.add_argument('--wheelhouse', '-w',
+                        help="Folder of wheels to bundle so that setup.sh installs packages without network access.")
 
     args = parser.parse_args()
     folder = Path(args.folder)
@@ -37,7 +42,7 @@ def main():
     if args.output is None:
         args.output = str(folder / ('autograder_' + str(folder.name) + ".zip"))
 
-    build_utils.build_zip(folder, args.output)
+    build_utils.build_zip(folder, args.output, wheelhouse=args.wheelhouse)
 
 
 if __name__ == "__main__":
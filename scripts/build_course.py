@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+"""Convert and build every autograder in a course folder.
+
+usage: build_course.py [-h] [--dry-run] [--force] [--workers WORKERS] [--verbose] folder
+
+Autograder folders (folders containing a config.ini, or .1 format folders
+containing an autograder/ subfolder) are found anywhere below folder.  .1
+format autograders are converted first (the original is kept in a
+*_backup folder).  Each autograder is built into
+autograder_<name>.zip inside its folder, unless that zip file is already
+newer than all of its inputs.
+
+positional arguments:
+  folder       Course folder to search for autograders
+
+optional arguments:
+  -h, --help   show this help message and exit
+  --dry-run, -n
+               Print what would be done without doing it.
+  --force, -f  Rebuild zip files that are up to date.
+  --workers WORKERS, -j WORKERS
+               Number of autograders to process at once.
+  --verbose, -v
+               Show the log messages from each build.
+"""
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+from jmu_gradescope_utils import course_utils
+
+
+def main():
+
+    description = "Convert and build every autograder in a course folder."
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('folder',
+                        help='Course folder to search for autograders')
+    parser.add_argument('--dry-run', '-n', action='store_true',
+                        help="Print what would be done without doing it.")
+    parser.add_argument('--force', '-f', action='store_true',
+                        help="Rebuild zip files that are up to date.")
+    parser.add_argument('--workers', '-j', type=int,
+                        help="Number of autograders to process at once.")
+    parser.add_argument('--verbose', '-v', action='store_true',
+                        help="Show the log messages from each build.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    root = Path(args.folder).resolve()
+    plan = course_utils.make_plan(course_utils.discover(root), force=args.force)
+    if len(plan) == 0:
+        print(f"No autograders found in {root}")
+        return
+
+    print(course_utils.format_plan(plan, root))
+    if args.dry_run:
+        return
+
+    print()
+    course_utils.run_plan(plan, workers=args.workers)
+    print(course_utils.format_plan(plan, root, results=True))
+    if any(item.status == 'failed' for item in plan):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,9 @@
 #!/usr/bin/env python3
+import json
 import logging
+import queue
+import threading
+import time
 import tkinter as tk
 from tkinter import ttk
 from tkinter import filedialog as fd
@@ -8,6 +12,8 @@ import subprocess
 import platform
 import os
 import jmu_gradescope_utils.build_utils as build_utils
+from jmu_gradescope_utils import perf_utils
+from jmu_gradescope_utils.watch_utils import AutograderWatcher
 
 if platform.system() == 'Windows':
     from ctypes import windll
@@ -23,32 +29,36 @@ def open_file(file_path):
         subprocess.run(['xdg-open', str(file_path)])
 
 
+# Milliseconds between checks for new log records and finished jobs.
+POLL_INTERVAL = 100
+
+# Most log records added to the widget per poll, so that a burst of
+# records can't make the window unresponsive.
+MAX_BATCH = 1000
+
+# Older lines are dropped once the log has this many.
+MAX_LOG_LINES = 20000
+
+
 class LoggingHandlerFrame(ttk.Frame):
     # https://stackoverflow.com/a/37188648
 
-    class WidgetLogger(logging.Handler):
-        def __init__(self, widget):
+    class QueueLogger(logging.Handler):
+        """Logging handler that can be used from any thread.
+
+        Records are only formatted and queued here; the Tk thread adds them
+        to the widget in batches (see LoggingHandlerFrame.poll).
+        """
+
+        def __init__(self, records):
             logging.Handler.__init__(self)
             self.setLevel(logging.DEBUG)
             formatter = logging.Formatter('%(levelname)s: %(message)s')
             self.setFormatter(formatter)
-            self.widget = widget
-            self.widget.config(state='disabled')
-            self.widget.tag_config("INFO", foreground="black")
-            self.widget.tag_config("DEBUG", foreground="grey")
-            self.widget.tag_config("WARNING", foreground="orange")
-            self.widget.tag_config("ERROR", foreground="red")
-            self.widget.tag_config("CRITICAL", foreground="red", underline=1)
-            self.red = self.widget.tag_configure("red", foreground="red")
+            self.records = records
 
         def emit(self, record):
-            self.widget.config(state='normal')
-            # Append message (record) to the widget
-            self.widget.insert(tk.END, self.format(record) + '\n',
-                               record.levelname)
-            self.widget.see(tk.END)  # Scroll to the bottom
-            self.widget.config(state='disabled')
-            self.widget.update()  # Refresh the widget
+            self.records.put((self.format(record), record.levelname))
 
     def __init__(self, *args, **kwargs):
         ttk.Frame.__init__(self, *args, **kwargs)
@@ -69,7 +79,40 @@ class LoggingHandlerFrame(ttk.Frame):
         self.scrollbar_y.config(command=self.text.yview)
         self.scrollbar_x.config(command=self.text.xview)
 
-        self.logging_handler = LoggingHandlerFrame.WidgetLogger(self.text)
+        self.text.config(state='disabled')
+        self.text.tag_config("INFO", foreground="black")
+        self.text.tag_config("DEBUG", foreground="grey")
+        self.text.tag_config("WARNING", foreground="orange")
+        self.text.tag_config("ERROR", foreground="red")
+        self.text.tag_config("CRITICAL", foreground="red", underline=1)
+
+        self.records = queue.Queue()
+        self.logging_handler = LoggingHandlerFrame.QueueLogger(self.records)
+        self.last_message = ""
+        self.after(POLL_INTERVAL, self.poll)
+
+    def poll(self):
+        """Move queued log records into the text widget."""
+        batch = []
+        try:
+            while len(batch) < MAX_BATCH:
+                batch.append(self.records.get_nowait())
+        except queue.Empty:
+            pass
+
+        if len(batch) > 0:
+            self.text.config(state='normal')
+            for message, level in batch:
+                self.text.insert(tk.END, message + '\n', level)
+            lines = int(self.text.index('end-1c').split('.')[0])
+            if lines > MAX_LOG_LINES:
+                self.text.delete('1.0', f'{lines - MAX_LOG_LINES}.0')
+            self.text.see(tk.END)  # Scroll to the bottom
+            self.text.config(state='disabled')
+            self.last_message = (batch[-1][0].splitlines() or [""])[0]
+
+        # Come back sooner if records are piling up.
+        self.after(1 if len(batch) == MAX_BATCH else POLL_INTERVAL, self.poll)
 
 
 class App(tk.Tk):
@@ -129,11 +172,37 @@ class App(tk.Tk):
 #       self.build_button["state"] = "disabled"
         self.build_button.pack(side=tk.LEFT, padx=4, pady=10)
 
+        self.watch_button = ttk.Button(button_frame, text='Watch',
+                                       command=self.watch)
+        self.watch_button.pack(side=tk.LEFT, padx=4, pady=10)
+
+        self.cancel_button = ttk.Button(button_frame, text='Cancel',
+                                        command=self.cancel)
+        self.cancel_button["state"] = "disabled"
+        self.cancel_button.pack(side=tk.LEFT, padx=4, pady=10)
+
         button_frame.pack(side=tk.TOP)
 
+        progress_frame = ttk.Frame(self)
+        progress_frame.columnconfigure(1, weight=1)
+        self.progress = ttk.Progressbar(progress_frame, mode='indeterminate',
+                                        length=160)
+        self.progress.grid(row=0, column=0, padx=4)
+        self.status_label = ttk.Label(progress_frame, text='Ready.')
+        self.status_label.grid(row=0, column=1, padx=4, sticky="w")
+        progress_frame.pack(side=tk.TOP, fill=tk.X)
+
+        # The job currently running in the background, if any.
+        self.job = None
+        self.job_name = None
+        self.job_result = None
+        self.job_started = None
+        self.cancel_event = threading.Event()
+
         log_frame = tk.LabelFrame(self, text="Log Data")
 
         logwidget = LoggingHandlerFrame(log_frame, width=80, height=24)
+        self.logwidget = logwidget
         logger = logging.getLogger()
         logging.basicConfig(level=logging.INFO)
         logger.addHandler(logwidget.logging_handler)
@@ -141,17 +210,97 @@ class App(tk.Tk):
         log_frame.pack(side=tk.TOP, expand=tk.YES, fill=tk.BOTH,
                        padx=4, pady=10)
 
+    def start_job(self, name, func, on_done):
+        """Run func(cancel_event) on a background thread.
+
+        on_done is called on the Tk thread with func's return value once it
+        finishes.  Only one job runs at a time.
+        """
+        if self.job is not None:
+            logging.warning(f"{self.job_name} is still running.")
+            return
+        self.cancel_event = threading.Event()
+        self.job_name = name
+        self.job_result = None
+        self.job_started = time.time()
+
+        def run():
+            try:
+                self.job_result = func(self.cancel_event)
+            except Exception:
+                logging.exception(f"{name} failed.")
+
+        self.job = threading.Thread(target=run, daemon=True)
+        self.job.start()
+        self.test_button["state"] = "disabled"
+        self.build_button["state"] = "disabled"
+        self.watch_button["state"] = "disabled"
+        self.cancel_button["state"] = "normal"
+        self.progress.start()
+        self.after(POLL_INTERVAL, self.check_job, on_done)
+
+    def check_job(self, on_done):
+        if self.job.is_alive():
+            elapsed = time.time() - self.job_started
+            self.status_label.config(
+                text=f"{self.job_name} ({elapsed:.0f}s): "
+                     f"{self.logwidget.last_message}")
+            self.after(POLL_INTERVAL, self.check_job, on_done)
+            return
+
+        self.job = None
+        self.progress.stop()
+        self.test_button["state"] = "normal"
+        self.build_button["state"] = "normal"
+        self.watch_button["state"] = "normal"
+        self.cancel_button["state"] = "disabled"
+        if self.cancel_event.is_set():
+            self.status_label.config(text=f"{self.job_name} cancelled.")
+        else:
+            elapsed = time.time() - self.job_started
+            self.status_label.config(
+                text=f"{self.job_name} finished in {elapsed:.1f}s.")
+            if self.job_result is not None:
+                on_done(self.job_result)
+
+    def cancel(self):
+        if self.job is not None:
+            logging.info(f"Cancelling {self.job_name.lower()}...")
+            self.cancel_event.set()
+            self.cancel_button["state"] = "disabled"
+
     def test(self):
         autograder_folder = self.grader_path_text.get("1.0", 'end-1c')
         sample_folder = self.sample_path_text.get("1.0", 'end-1c')
         os.chdir(autograder_folder)
-        result_json_loc, code = build_utils.test_autograder(autograder_folder,
-                                                            sample_folder)
-        if code == 0:
-            open_file(result_json_loc)
-        else:
-            logging.error(f"Return code {code} from run_tests.py.")
-            open_file(result_json_loc)
+
+        def on_done(result):
+            result_json_loc, code = result
+            if code != 0:
+                logging.error(f"Return code {code} from run_tests.py.")
+            if result_json_loc is not None:
+                with open(result_json_loc, 'r') as f:
+                    report = perf_utils.format_report(json.load(f))
+                if len(report) > 0:
+                    logging.info("Test timing (slowest first):\n" + report)
+                open_file(result_json_loc)
+
+        self.start_job("Testing", lambda cancel: build_utils.test_autograder(
+            autograder_folder, sample_folder, cancel=cancel), on_done)
+
+    def watch(self):
+        autograder_folder = self.grader_path_text.get("1.0", 'end-1c')
+        sample_folder = self.sample_path_text.get("1.0", 'end-1c')
+
+        def run(cancel):
+            watcher = AutograderWatcher(autograder_folder, sample_folder)
+            logging.info("Watching for changes (Cancel to stop)...")
+            try:
+                watcher.watch(report=logging.info, cancel=cancel)
+            finally:
+                watcher.close()
+
+        self.start_job("Watching", run, lambda result: None)
 
     def build(self):
         autograder_folder = self.grader_path_text.get("1.0", 'end-1c')
@@ -162,7 +311,8 @@ class App(tk.Tk):
                                        initialdir=autograder_folder,
                                        initialfile=name)
         if len(zipfile) > 0:
-            build_utils.build_zip(autograder_folder, zipfile)
+            self.start_job("Building", lambda cancel: build_utils.build_zip(
+                autograder_folder, zipfile, cancel=cancel), lambda created: None)
 
     def select_autograder(self):
         folder = fd.askdirectory(title='Select Autograder Folder')
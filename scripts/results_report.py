@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+"""Summarize the results.json files of many autograder runs.
+
+usage: results_report.py [-h] [--csv CSV] [--summary-csv SUMMARY_CSV] [--limit LIMIT] paths [paths ...]
+
+Prints each test's pass rate, mean score, running time percentiles and
+number of timeouts, the slowest tests and the tests that timed out most
+often.  Folders are searched recursively for results.json files.
+
+positional arguments:
+  paths                 Results files, or folders containing them
+
+optional arguments:
+  -h, --help            show this help message and exit
+  --csv CSV             Write one line per test result to this CSV file.
+  --summary-csv SUMMARY_CSV
+                        Write one line per test to this CSV file.
+  --limit LIMIT, -l LIMIT
+                        Number of tests in the slowest and timeout lists.
+"""
+
+import argparse
+import sys
+from jmu_gradescope_utils import analytics_utils
+
+
+def main():
+
+    description = "Summarize the results.json files of many autograder runs."
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('paths', nargs='+',
+                        help='Results files, or folders containing them')
+    parser.add_argument('--csv',
+                        help="Write one line per test result to this CSV file.")
+    parser.add_argument('--summary-csv',
+                        help="Write one line per test to this CSV file.")
+    parser.add_argument('--limit', '-l', type=int, default=10,
+                        help="Number of tests in the slowest and timeout lists.")
+    args = parser.parse_args()
+
+    table = analytics_utils.ResultsTable.from_files(args.paths)
+    if len(table.sources) == 0:
+        print("No results files found.")
+        sys.exit(1)
+    summaries = analytics_utils.summarize(table)
+    print(analytics_utils.format_report(table, summaries, limit=args.limit))
+    if args.csv:
+        table.write_csv(args.csv)
+    if args.summary_csv:
+        analytics_utils.write_summary_csv(summaries, args.summary_csv)
+
+
+if __name__ == "__main__":
+    main()
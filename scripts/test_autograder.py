@@ -8,23 +8,53 @@ Run it as follows::
 python test_autograder.py /path/to/sample/submission/
 
 If all goes well it will produce an output file named
-test_results.json containing the autograder output.
+test_results.json containing the autograder output, and print a table
+showing how much time and memory each test used.
+
+With ``--watch`` the script keeps running, reruns the affected tests
+whenever a file in the autograder folder or the submission changes, and
+prints a short score summary after each run::
+
+python test_autograder.py --watch /path/to/sample/submission/
 
 """
 
 import sys
 import shutil
+import json
 import jmu_gradescope_utils.build_utils as build_utils
+from jmu_gradescope_utils import perf_utils
+from jmu_gradescope_utils.watch_utils import AutograderWatcher
+
+def watch(submission):
+    watcher = AutograderWatcher('./', submission)
+    print("Watching for changes (Ctrl-C to stop)...")
+    try:
+        watcher.watch(report=lambda summary: print(summary + "\n"))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+
 
 def main():
 
-    if len(sys.argv) < 2:
+    args = [arg for arg in sys.argv[1:] if arg != '--watch']
+    if len(args) < 1:
         print("Usage:")
-        print("test_autograder.py /path/to/submission/folder/")
+        print("test_autograder.py [--watch] /path/to/submission/folder/")
         print("\nScript must be run from within the autograder folder.")
         return
 
-    result_json_loc, code = build_utils.test_autograder('./', sys.argv[1])
+    if len(args) < len(sys.argv) - 1:
+        watch(args[0])
+        return
+
+    result_json_loc, code = build_utils.test_autograder('./', args[0])
+    with open(result_json_loc, 'r') as f:
+        report = perf_utils.format_report(json.load(f))
+    if len(report) > 0:
+        print(report)
     shutil.move(result_json_loc, './test_results.json')
     sys.exit(code)
 